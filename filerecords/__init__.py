@@ -1,2 +1,9 @@
-from .api import *
+import filerecords.api as api
 import filerecords.api.settings as settings
+
+__all__ = api.__all__
+
+def __getattr__( name ):
+    if name in api.__all__:
+        return getattr( api, name )
+    raise AttributeError( f"module {__name__!r} has no attribute {name!r}" )
@@ -2,5 +2,15 @@
 This is the core package of `filerecords`.
 """
 
-from .registry import Registry
-from .file_record import FileRecord
\ No newline at end of file
+__all__ = [ "Registry", "FileRecord" ]
+
+def __getattr__( name ):
+    # the API classes are only imported once they are actually used 
+    # so that importing filerecords (e.g. by the CLI) stays cheap.
+    if name == "Registry":
+        from .registry import Registry
+        return Registry
+    elif name == "FileRecord":
+        from .file_record import FileRecord
+        return FileRecord
+    raise AttributeError( f"module {__name__!r} has no attribute {name!r}" )
@@ -0,0 +1,728 @@
+"""
+Storage backends define how a registry's index, its own metadata, and the metadata of its file records are stored on disk.
+The `Registry` and `FileRecord` classes never touch the files of a registry directly but go through the backend of the registry.
+
+Available backends
+==================
+
+`yaml` (default)
+    The registry stores a tab-separated `INDEXFILE`, a yaml `METAFILE` for the registry's own metadata,
+    and one yaml entry file per recorded file (named by the record's id).
+
+`sqlite`
+    The registry stores everything in a single SQLite database file. Records, comments, flags and flag groups
+    are kept in separate (indexed) tables, any further record metadata is stored as json. This is much faster for large registries since no individual files
+    need to be opened and parsed when many records are accessed.
+
+`journal`
+    The registry stores the same files as the `yaml` backend, but every save only appends a single line to a `JOURNAL` file
+    (see `filerecords.api.journal`) instead of writing the index, metadata, and records anew. The journal is folded into the other files
+    once it grew large enough (or using `records compact`). This makes frequent small changes to large registries cheap.
+
+The backend is chosen when a registry is created and is detected automatically afterward.
+
+.. code-block:: python
+
+    from filerecords.api import Registry
+
+    # create a new registry using the SQLite backend
+    reg = Registry()
+    reg.init( backend = "sqlite" )
+
+
+Or on the command line using:
+
+    >>> records init --backend sqlite
+
+"""
+
+from datetime import datetime
+import contextlib
+import functools
+import hashlib
+import sqlite3
+import json
+import copy
+import os
+
+import filerecords.api.index as index
+import filerecords.api.journal as journal
+import filerecords.api.utils as utils
+import filerecords.api.settings as settings
+
+logger = utils.log()
+
+
+class Backend:
+    """
+    The base class of registry storage backends.
+
+    .. note::
+
+        This is not intended to be used directly.
+
+    Parameters
+    ----------
+    registry_dir : str
+        The registry directory.
+    """
+    name = None
+
+    journaled = False
+    """Whether the backend writes all changes to a journal (see `append()`) rather than writing the registry anew."""
+
+    def __init__( self, registry_dir : str ):
+        self.registry_dir = registry_dir
+        self.journalfile = None
+
+    @classmethod
+    def create( cls, registry_dir : str ):
+        """
+        Create the basic files of a new registry.
+
+        Parameters
+        ----------
+        registry_dir : str
+            The (already existing) registry directory.
+        """
+        raise NotImplementedError
+
+    def load_index( self ) -> index.Index:
+        """
+        Load the registry index.
+
+        Returns
+        -------
+        Index
+            The registry index.
+        """
+        raise NotImplementedError
+
+    def save_index( self, index : index.Index, changes : list = None ):
+        """
+        Save the registry index.
+
+        Parameters
+        ----------
+        index : Index
+            The registry index.
+        changes : list
+            The changes made to the index since it was loaded from this backend (see `Index.changes`).
+            Backends that support it only write the changed rows. If None, the entire index is written.
+        """
+        raise NotImplementedError
+
+    def load_metadata( self ) -> dict:
+        """
+        Load the registry's own metadata.
+
+        Returns
+        -------
+        dict
+            The registry metadata with `comments`, `flags`, and `groups`.
+        """
+        raise NotImplementedError
+
+    def save_metadata( self, metadata : dict ):
+        """
+        Save the registry's own metadata.
+
+        Parameters
+        ----------
+        metadata : dict
+            The registry metadata.
+        """
+        raise NotImplementedError
+
+    def entryfile( self, id : str ) -> str:
+        """
+        Get the file in which the metadata of a record is stored.
+
+        Parameters
+        ----------
+        id : str
+            The id of the record.
+        """
+        raise NotImplementedError
+
+    def init_entry( self, id : str, metadata : dict = None ):
+        """
+        Initialize the metadata storage of a new record.
+
+        Parameters
+        ----------
+        id : str
+            The id of the record.
+        metadata : dict
+            The initial metadata of the record. By default `settings.entryfile_template` is used.
+        """
+        raise NotImplementedError
+
+    def load_entry( self, id : str ) -> dict:
+        """
+        Load the metadata of a record.
+
+        Parameters
+        ----------
+        id : str
+            The id of the record.
+
+        Returns
+        -------
+        dict
+            The record metadata with `comments` and `flags`.
+        """
+        raise NotImplementedError
+
+    def load_entries( self, ids : list ) -> dict:
+        """
+        Load the metadata of multiple records at once.
+
+        Parameters
+        ----------
+        ids : list
+            The ids of the records.
+
+        Returns
+        -------
+        dict
+            The record metadata dictionaries by record id.
+        """
+        return { str(id) : self.load_entry( id ) for id in ids }
+
+    def entry_signatures( self, ids : list ) -> dict:
+        """
+        Get signatures of the stored metadata of multiple records, 
+        which change whenever the metadata of a record is saved with different contents.
+
+        Parameters
+        ----------
+        ids : list
+            The ids of the records.
+
+        Returns
+        -------
+        dict
+            The signatures by record id.
+        """
+        return { id : hashlib.blake2b( repr( entry ).encode() ).hexdigest() for id, entry in self.load_entries( ids ).items() }
+
+    def entry_version( self, id : str ):
+        """
+        Get the version of the stored metadata of a record, which changes whenever the record is saved
+        (to check whether it was changed by another process since it was loaded).
+
+        Parameters
+        ----------
+        id : str
+            The id of the record.
+
+        Returns
+        -------
+        object or None
+            The version of the record, or None if the backend cannot tell it apart cheaply (or the record does not exist).
+        """
+        return None
+
+    def save_entry( self, id : str, metadata : dict ):
+        """
+        Save the metadata of a record.
+
+        Parameters
+        ----------
+        id : str
+            The id of the record.
+        metadata : dict
+            The record metadata.
+        """
+        raise NotImplementedError
+
+    def remove_entry( self, id : str ):
+        """
+        Remove the metadata of a record.
+
+        Parameters
+        ----------
+        id : str
+            The id of the record.
+        """
+        raise NotImplementedError
+
+    def append( self, changes : list, entries : dict, metadata : dict ):
+        """
+        Write the changes of a save to the journal of the registry (only for journaled backends).
+        Within `batch()` the changes are only written once all other writes of the batch succeeded.
+
+        Parameters
+        ----------
+        changes : list
+            The changes made to the index (see `Index.changes`).
+        entries : dict
+            The changes made to each record (see `utils._diff_metadata`) by record id, or None for removed records.
+        metadata : dict
+            The changes made to the registry metadata.
+        """
+        raise NotImplementedError
+
+    def compact( self ) -> bool:
+        """
+        Fold the journal of the registry into the other files of the registry (only for journaled backends).
+
+        Returns
+        -------
+        bool
+            True if there was anything to compact.
+        """
+        return False
+
+    def batch( self ):
+        """
+        Group multiple writes so they are performed together.
+        Backends that support it apply all writes of the batch at once or not at all.
+
+        Returns
+        -------
+        context manager
+            The context within which writes are batched.
+        """
+        return contextlib.nullcontext()
+
+
+class YamlBackend( Backend ):
+    """
+    The default backend storing the registry index in a tab-separated `INDEXFILE`,
+    the registry metadata in a yaml `METAFILE`, and each record in its own yaml entry file.
+
+    Parameters
+    ----------
+    registry_dir : str
+        The registry directory.
+    """
+    name = "yaml"
+
+    def __init__( self, registry_dir : str ):
+        super().__init__( registry_dir )
+        self.indexfile = utils.get_indexfile( registry_dir )
+        self.metafile = utils.get_metafile( registry_dir )
+
+    @classmethod
+    def create( cls, registry_dir : str ):
+        indexfile = os.path.join( registry_dir, settings.indexfile )
+        with utils.atomic_write( indexfile ) as f:
+            f.write( settings.indexfile_header )
+        utils._init_metafile( registry_dir )
+
+    def load_index( self ):
+        return utils.load_indexfile( self.indexfile )
+
+    def save_index( self, index, changes = None ):
+        utils.save_indexfile( self.indexfile, index )
+
+    def load_metadata( self ):
+        return utils.load_yamlfile( self.metafile )
+
+    def save_metadata( self, metadata ):
+        utils.save_yamlfile( self.metafile, metadata )
+
+    def entryfile( self, id ):
+        return os.path.join( self.registry_dir, str(id) )
+
+    def init_entry( self, id, metadata = None ):
+        utils._init_entryfile( self.registry_dir, str(id), metadata )
+
+    def load_entry( self, id ):
+        return utils.load_yamlfile( self.entryfile( id ) )
+
+    def save_entry( self, id, metadata ):
+        utils.save_yamlfile( self.entryfile( id ), metadata )
+
+    def entry_signatures( self, ids ):
+        # hashing the raw entry files is much cheaper than parsing them
+        # (and unlike their modification times it is not affected by the timestamp resolution)
+        signatures = {}
+        for id in ids:
+            with open( self.entryfile( id ), "rb" ) as f:
+                signatures[ str(id) ] = hashlib.blake2b( f.read() ).hexdigest()
+        return signatures
+
+    def entry_version( self, id ):
+        # entry files are always replaced when they are saved (see utils.atomic_write), so their inode changes
+        try:
+            info = os.stat( self.entryfile( id ) )
+        except FileNotFoundError:
+            return None
+        return ( info.st_ino, info.st_size, info.st_mtime_ns )
+
+    def remove_entry( self, id ):
+        utils.remove_file( self.entryfile( id ) )
+
+    def batch( self ):
+        # the files only replace the stored files once all of them were written, 
+        # so the registry is left as it was if any write fails
+        return utils.staged_writes()
+
+
+class JournalBackend( YamlBackend ):
+    """
+    A backend storing the registry in the same files as the `yaml` backend, 
+    but writing all changes to an append-only journal (see `filerecords.api.journal`).
+
+    The changes in the journal are applied whenever the registry (or a record) is loaded,
+    and are folded into the other files once the journal is larger than `settings.journal_size` 
+    (or a quarter of the indexfile, if that is larger).
+
+    Parameters
+    ----------
+    registry_dir : str
+        The registry directory.
+    """
+    name = "journal"
+
+    journaled = True
+
+    def __init__( self, registry_dir : str ):
+        super().__init__( registry_dir )
+        self.journalfile = os.path.join( registry_dir, settings.journal_file )
+        self.journal = journal.Journal( self.journalfile )
+
+    @classmethod
+    def create( cls, registry_dir : str ):
+        super().create( registry_dir )
+        open( os.path.join( registry_dir, settings.journal_file ), "a" ).close()
+
+    # the journal is always read before the other files, so changes written in between
+    # are not missed (since the changes only add or remove entries, applying them again changes nothing)
+
+    def load_index( self ):
+        self.journal.refresh()
+        loaded = super().load_index()
+        loaded.replay( self.journal.index_changes() )
+        loaded.changes = []
+        return loaded
+
+    def load_metadata( self ):
+        self.journal.refresh()
+        metadata = super().load_metadata()
+        for delta in self.journal.metadata_changes():
+            metadata = utils._patch_metadata( metadata, delta )
+        return metadata
+
+    def init_entry( self, id, metadata = None ):
+        # records are stored by their first line in the journal
+        pass
+
+    def load_entry( self, id ):
+        self.journal.refresh()
+        return self._load_entry( id )
+
+    def load_entries( self, ids ):
+        self.journal.refresh()
+        return { str(id) : self._load_entry( id ) for id in ids }
+
+    def entry_version( self, id ):
+        self.journal.refresh()
+        return ( super().entry_version( id ), len( self.journal.entry_changes( id ) or () ) )
+
+    def entry_signatures( self, ids ):
+        self.journal.refresh()
+        signatures = {}
+        for id in ids:
+            digest = hashlib.blake2b()
+            with contextlib.suppress( FileNotFoundError ):
+                with open( self.entryfile( id ), "rb" ) as f:
+                    digest.update( f.read() )
+            changes = self.journal.entry_changes( id )
+            if changes:
+                digest.update( repr( changes ).encode() )
+            signatures[ str(id) ] = digest.hexdigest()
+        return signatures
+
+    def append( self, changes, entries, metadata ):
+        # within a batch the changes are only appended once everything else was written,
+        # so the journal never holds the changes of a failed batch
+        utils.staged_call( functools.partial( self._append, changes, entries, metadata ) )
+
+    def _append( self, changes, entries, metadata ):
+        """
+        Append the changes to the journal and compact it once it grew large enough.
+        """
+        self.journal.append( changes, entries, metadata )
+        if self.journal.size > max( settings.journal_size, os.path.getsize( self.indexfile ) // 4 ):
+            with utils.staged_writes():
+                self.compact()
+
+    def compact( self ):
+        self.journal.refresh()
+        if not len( self.journal ):
+            return False
+
+        for id in self.journal.entries:
+            if self.journal.entry_changes( id )[-1] is None:
+                with contextlib.suppress( FileNotFoundError ):
+                    utils.remove_file( self.entryfile( id ) )
+            else:
+                utils._init_entryfile( self.registry_dir, id, self._load_entry( id ) )
+
+        utils.save_indexfile( self.indexfile, self.load_index() )
+        utils.save_yamlfile( self.metafile, self.load_metadata() )
+        self.journal.clear()
+        return True
+
+    def _load_entry( self, id : str ) -> dict:
+        """
+        Load the metadata of a record and apply its changes from the journal (which must be read already).
+        """
+        changes = self.journal.entry_changes( id )
+        if changes is None:
+            return super().load_entry( id )
+        if changes[-1] is None:
+            raise FileNotFoundError( f"The record {id} was removed from the registry." )
+
+        try:
+            metadata = super().load_entry( id )
+        except FileNotFoundError:
+            # the record was added after the last compaction
+            metadata = copy.deepcopy( settings.entryfile_template )
+        for delta in changes:
+            metadata = utils._patch_metadata( metadata, delta )
+        return metadata
+
+
+class SQLiteBackend( Backend ):
+    """
+    A backend storing the entire registry in a single SQLite database file.
+
+    Parameters
+    ----------
+    registry_dir : str
+        The registry directory.
+    dbfile : str
+        The database file. By default `settings.sqlite_file` within the registry directory is used.
+    """
+    name = "sqlite"
+
+    _schema = """
+    CREATE TABLE IF NOT EXISTS registry ( key TEXT PRIMARY KEY, value TEXT );
+    CREATE TABLE IF NOT EXISTS records ( id TEXT PRIMARY KEY, filename TEXT NOT NULL, relpath TEXT NOT NULL, latest TEXT );
+    CREATE INDEX IF NOT EXISTS records_relpath ON records ( relpath );
+    CREATE TABLE IF NOT EXISTS comments ( record TEXT NOT NULL, timestamp TEXT NOT NULL, user TEXT, comment TEXT );
+    CREATE INDEX IF NOT EXISTS comments_record ON comments ( record, timestamp );
+    CREATE TABLE IF NOT EXISTS flags ( record TEXT NOT NULL, flag TEXT NOT NULL, PRIMARY KEY ( record, flag ) );
+    CREATE INDEX IF NOT EXISTS flags_flag ON flags ( flag );
+    CREATE TABLE IF NOT EXISTS groups ( label TEXT NOT NULL, flag TEXT NOT NULL );
+    CREATE INDEX IF NOT EXISTS groups_label ON groups ( label );
+    CREATE TABLE IF NOT EXISTS attributes ( record TEXT NOT NULL, key TEXT NOT NULL, value TEXT, PRIMARY KEY ( record, key ) );
+    """
+
+    # the metadata stored in dedicated tables, 
+    # any other metadata is stored as json in the attributes table
+    _entry_keys = ( "comments", "flags", "directory", "groups" )
+
+    # the registry's own comments and flags are stored
+    # in the same tables as the records' under this key
+    _registry_key = ""
+
+    def __init__( self, registry_dir : str, dbfile : str = None ):
+        super().__init__( registry_dir )
+        self.dbfile = dbfile if dbfile else os.path.join( registry_dir, settings.sqlite_file )
+        self.indexfile = self.dbfile
+        self.metafile = self.dbfile
+        # registries may be loaded in another thread than they are used in (e.g. by a federated search),
+        # but are never used by multiple threads at the same time
+        self.connection = sqlite3.connect( self.dbfile, check_same_thread = False )
+        self._batch = False
+
+        # registries created by older versions may lack some of the tables
+        self.connection.executescript( self._schema )
+        self._migrate()
+
+    @classmethod
+    def create( cls, registry_dir : str ):
+        dbfile = os.path.join( registry_dir, settings.sqlite_file )
+        with sqlite3.connect( dbfile ) as connection:
+            connection.executescript( cls._schema )
+            connection.execute( "INSERT OR REPLACE INTO registry VALUES ( 'directory', ? )", ( registry_dir, ) )
+        connection.close()
+
+    def load_index( self ):
+        rows = self.connection.execute( "SELECT id, filename, relpath, latest FROM records ORDER BY rowid" ).fetchall()
+        if not rows:
+            return index.Index()
+
+        ids, filenames, relpaths, latest = zip( *rows )
+        flags = { id : [] for id in ids }
+        for record, flag in self.connection.execute( "SELECT record, flag FROM flags WHERE record != ? ORDER BY rowid", ( self._registry_key, ) ):
+            if record in flags:
+                flags[record].append( flag )
+
+        return index.Index( ids, filenames, relpaths, [ flags[id] for id in ids ], [ utils._decode_latest( i ) for i in latest ] )
+
+    def save_index( self, index, changes = None ):
+        # the record flags are stored together with 
+        # the record entries in the flags table.
+        if changes is None:
+            rows = ( ( id, filename, relpath, utils._encode_latest( latest ) ) for id, filename, relpath, flags, latest in index.rows() )
+            with self._writing():
+                self.connection.execute( "DELETE FROM records" )
+                self.connection.executemany( "INSERT INTO records VALUES ( ?, ?, ?, ? )", rows )
+            return
+
+        # only the rows of the changed records are written (in their current state)
+        changed = {}
+        for kind, id, *values in changes:
+            if kind == "flags":
+                continue
+            for i in ( id if kind == "extend" else ( id, ) ):
+                changed[i] = None
+        rows, removed = [], []
+        for id in changed:
+            if id in index:
+                row = index.row( id )
+                rows.append( ( id, row["filename"], row["relpath"], utils._encode_latest( row["latest"] ) ) )
+            else:
+                removed.append( ( id, ) )
+
+        with self._writing():
+            self.connection.executemany( "DELETE FROM records WHERE id = ?", removed )
+            # existing rows are updated in place, so they keep their position
+            self.connection.executemany( """INSERT INTO records VALUES ( ?, ?, ?, ? ) 
+                                            ON CONFLICT ( id ) DO UPDATE SET filename = excluded.filename, relpath = excluded.relpath, latest = excluded.latest""", rows )
+
+    def load_metadata( self ):
+        metadata = self.load_entry( self._registry_key )
+
+        directory = self.connection.execute( "SELECT value FROM registry WHERE key = 'directory'" ).fetchone()
+        metadata["directory"] = directory[0] if directory else self.registry_dir
+
+        metadata["groups"] = {}
+        for label, flag in self.connection.execute( "SELECT label, flag FROM groups ORDER BY rowid" ):
+            metadata["groups"].setdefault( label, [] ).append( flag )
+
+        return metadata
+
+    def save_metadata( self, metadata ):
+        groups = [ ( label, flag ) for label, flags in metadata["groups"].items() for flag in flags ]
+        with self._writing():
+            self._write_entry( self._registry_key, metadata )
+            self.connection.execute( "DELETE FROM groups" )
+            self.connection.executemany( "INSERT INTO groups VALUES ( ?, ? )", groups )
+
+    def entryfile( self, id ):
+        return self.dbfile
+
+    def init_entry( self, id, metadata = None ):
+        if metadata is not None:
+            self.save_entry( id, metadata )
+
+    def load_entry( self, id ):
+        return self.load_entries( [id] )[ str(id) ]
+
+    def load_entries( self, ids ):
+        ids = [ str(id) for id in ids ]
+        entries = { id : { "comments" : {}, "flags" : [] } for id in ids }
+
+        # for smaller numbers of records (e.g. the chunks of an export) we query them
+        # directly, otherwise it is faster to scan the entire tables once.
+        # (older SQLite versions allow at most 999 parameters per query)
+        if len( ids ) <= 900:
+            marks = ", ".join( "?" * len(ids) )
+            comments = self.connection.execute( f"SELECT record, timestamp, user, comment FROM comments WHERE record IN ({marks}) ORDER BY rowid", ids )
+            flags = self.connection.execute( f"SELECT record, flag FROM flags WHERE record IN ({marks}) ORDER BY rowid", ids )
+            attributes = self.connection.execute( f"SELECT record, key, value FROM attributes WHERE record IN ({marks})", ids )
+        else:
+            comments = self.connection.execute( "SELECT record, timestamp, user, comment FROM comments ORDER BY rowid" )
+            flags = self.connection.execute( "SELECT record, flag FROM flags ORDER BY rowid" )
+            attributes = self.connection.execute( "SELECT record, key, value FROM attributes" )
+
+        for record, timestamp, user, comment in comments:
+            if record in entries:
+                entries[record]["comments"][ datetime.fromisoformat( timestamp ) ] = { "comment" : comment, "user" : user }
+
+        for record, flag in flags:
+            if record in entries:
+                entries[record]["flags"].append( flag )
+
+        for record, key, value in attributes:
+            if record in entries:
+                entries[record][key] = json.loads( value )
+
+        return entries
+
+    def save_entry( self, id, metadata ):
+        with self._writing():
+            self._write_entry( str(id), metadata )
+
+    def remove_entry( self, id ):
+        with self._writing():
+            self.connection.execute( "DELETE FROM comments WHERE record = ?", ( str(id), ) )
+            self.connection.execute( "DELETE FROM flags WHERE record = ?", ( str(id), ) )
+            self.connection.execute( "DELETE FROM attributes WHERE record = ?", ( str(id), ) )
+
+    @contextlib.contextmanager
+    def batch( self ):
+        self._batch = True
+        try:
+            with self.connection:
+                yield
+        finally:
+            self._batch = False
+
+    def _migrate( self ):
+        """
+        Add the columns that registries created by older versions lack.
+        """
+        columns = [ i[1] for i in self.connection.execute( "PRAGMA table_info( records )" ) ]
+        if "latest" in columns:
+            return
+
+        # the latest comments are collected from the comments table once
+        latest = self.connection.execute( "SELECT record, MAX( timestamp ), user, comment FROM comments GROUP BY record" ).fetchall()
+        latest = [ ( utils._encode_latest( { datetime.fromisoformat( timestamp ) : { "comment" : comment, "user" : user } } ), record ) for record, timestamp, user, comment in latest ]
+        with self.connection:
+            self.connection.execute( "ALTER TABLE records ADD COLUMN latest TEXT" )
+            self.connection.executemany( "UPDATE records SET latest = ? WHERE id = ?", latest )
+
+    def _writing( self ):
+        """
+        The context of a single write, which is committed right away unless it is part of a batch.
+        """
+        return contextlib.nullcontext() if self._batch else self.connection
+
+    def _write_entry( self, id : str, metadata : dict ):
+        """
+        Replace the comments, flags and other metadata of a record (without committing).
+        """
+        comments = [ ( id, timestamp.isoformat(), entry["user"], entry["comment"] ) for timestamp, entry in sorted( metadata["comments"].items() ) ]
+        flags = [ ( id, flag ) for flag in metadata["flags"] ]
+        attributes = [ ( id, key, json.dumps( value ) ) for key, value in metadata.items() if key not in self._entry_keys ]
+
+        self.connection.execute( "DELETE FROM comments WHERE record = ?", ( id, ) )
+        self.connection.execute( "DELETE FROM flags WHERE record = ?", ( id, ) )
+        self.connection.execute( "DELETE FROM attributes WHERE record = ?", ( id, ) )
+        self.connection.executemany( "INSERT INTO comments VALUES ( ?, ?, ?, ? )", comments )
+        self.connection.executemany( "INSERT OR IGNORE INTO flags VALUES ( ?, ? )", flags )
+        self.connection.executemany( "INSERT INTO attributes VALUES ( ?, ?, ? )", attributes )
+
+
+backends = { i.name : i for i in ( YamlBackend, SQLiteBackend, JournalBackend ) }
+"""The available storage backends by name."""
+
+def get_backend( registry_dir : str ) -> Backend:
+    """
+    Get the storage backend of an existing registry.
+
+    Parameters
+    ----------
+    registry_dir : str
+        The registry directory.
+
+    Returns
+    -------
+    Backend
+        The backend used by the registry.
+    """
+    if os.path.exists( os.path.join( registry_dir, settings.sqlite_file ) ):
+        return SQLiteBackend( registry_dir )
+    if os.path.exists( os.path.join( registry_dir, settings.journal_file ) ):
+        return JournalBackend( registry_dir )
+    return YamlBackend( registry_dir )
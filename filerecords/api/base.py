@@ -1,6 +1,10 @@
 """
 This is the base class for the `filerecords` API classes.
 
+The comments of a record are kept in the order of their timestamps (which is also the order in which they are stored), 
+so the latest comment is always the last one and comments within a time range can be found by bisection.
+The sorted timestamps are kept next to the comments once they were first needed, and are updated when comments are added or undone.
+
 .. note::
 
     This is not intended to be used directly.
@@ -8,6 +12,7 @@ This is the base class for the `filerecords` API classes.
 """
 
 from datetime import datetime
+import bisect
 import os
 
 import filerecords.api.utils as utils
@@ -64,9 +69,31 @@ class BaseRecord:
             logger.info("No comments found.")
             return None
 
-        last = sorted( list( self.comments.keys() ) )[-1]
+        # the comments are in time order
+        last = next( reversed( self.comments ) )
         return { last : self.metadata["comments"].get( last ) }
 
+    def comments_between( self, since : datetime = None, until : datetime = None ) -> dict:
+        """
+        Get the comments within a time range.
+
+        Parameters
+        ----------
+        since : datetime
+            The earliest timestamp to include. By default all comments up to `until` are included.
+        until : datetime
+            The latest timestamp to include. By default all comments from `since` on are included.
+
+        Returns
+        -------
+        dict
+            The comments within the time range (in time order) with timestamps as keys, user and comment as values.
+        """
+        timestamps = self._timestamps()
+        start = bisect.bisect_left( timestamps, since ) if since is not None else 0
+        end = bisect.bisect_right( timestamps, until ) if until is not None else len( timestamps )
+        return { i : self.comments[i] for i in timestamps[ start : end ] }
+
     def undo_comment( self ):
         """
         Undo the last comment.
@@ -76,8 +103,12 @@ class BaseRecord:
         This will not automatically save the metadata,
         use the save() method to do so.
         """
-        last = sorted( list( self.comments.keys() ) )[-1]
-        self.metadata["comments"].pop( last )
+        if len( self.metadata["comments"] ) == 0:
+            logger.info("No comments found.")
+            return
+        timestamps = self._timestamps()
+        self.metadata["comments"].popitem()
+        timestamps.pop()
 
 
     def add_comment( self, comment : str ):
@@ -95,12 +126,26 @@ class BaseRecord:
             The comment to add.
         """
         user = os.environ["USER"] 
-        self.metadata["comments"].update(  { datetime.now() : {
+        timestamp = datetime.now()
+        timestamps = self._timestamps()
+        if timestamp not in self.comments:
+            # the comments are stored in time order, so a comment is usually just appended
+            # (unless the clock was set back since the last comment)
+            if timestamps and timestamps[-1] > timestamp:
+                bisect.insort( timestamps, timestamp )
+            else:
+                timestamps.append( timestamp )
+
+        self.metadata["comments"].update(  { timestamp : {
                                                                  "comment" : comment, 
                                                                  "user" : user 
                                                             } 
                                             }  )
 
+        if timestamps[-1] != timestamp:
+            self.metadata["comments"] = { i : self.comments[i] for i in timestamps }
+            self._sorted = ( self.metadata["comments"], timestamps )
+
     def remove_flags( self, flag : (str or list) ):
         """
         Remove one or more flags from the registry.
@@ -147,6 +192,18 @@ class BaseRecord:
         logger.debug( "(after set) metadata['flags']: {}".format( self.metadata["flags"] ) )
 
 
+    def _timestamps( self ) -> list:
+        """
+        Get the timestamps of the comments (in time order). 
+        They are collected once for the loaded comments, and kept until the comments are replaced (e.g. by loading them again).
+        """
+        comments = self.metadata["comments"]
+        cached = getattr( self, "_sorted", None )
+        if cached is None or cached[0] is not comments or len( cached[1] ) != len( comments ):
+            cached = ( comments, list( comments ) )
+            self._sorted = cached
+        return cached[1]
+
     @property
     def comments( self ) -> dict:
         """
@@ -160,3 +217,4 @@ class BaseRecord:
         Get the flags.
         """
         return self.metadata["flags"]
+
@@ -0,0 +1,127 @@
+"""
+The `RenderCache` keeps the rendered markdown and yaml fragments of the records of a registry,
+so that exporting a registry only has to render the records that changed since the last export.
+
+Each fragment is stored together with a signature of the record (based on its stored metadata and its relpath).
+When exporting, the signatures of all records are compared to the cached ones, only the records whose signature
+differs are rendered again, and the cached fragments of all other records are reused.
+
+The cache is stored as an SQLite database (`settings.render_cache`) within the registry directory, and is only created once
+a registry is exported using the cache. It can be deleted at any time, in which case the next export simply renders all records again.
+
+.. note::
+
+    This is not intended to be used directly, the cache is used by `Registry.write_markdown()` and `Registry.write_yaml()`.
+
+"""
+
+import sqlite3
+import os
+
+import filerecords.api.settings as settings
+
+
+class RenderCache:
+    """
+    The cache of rendered record fragments of a registry.
+
+    Parameters
+    ----------
+    registry_dir : str
+        The registry directory.
+    """
+
+    _schema = """
+    CREATE TABLE IF NOT EXISTS fragments ( id TEXT NOT NULL, format TEXT NOT NULL, signature TEXT NOT NULL, fragment TEXT NOT NULL, PRIMARY KEY ( format, id ) );
+    """
+
+    _batch_size = 900
+    """The number of ids that are queried at a time."""
+
+    def __init__( self, registry_dir : str ):
+        self.filename = os.path.join( registry_dir, settings.render_cache )
+        self.connection = sqlite3.connect( self.filename )
+        self.connection.executescript( self._schema )
+
+    def signatures( self, format : str ) -> dict:
+        """
+        Get the signatures of all cached fragments of a format.
+
+        Parameters
+        ----------
+        format : str
+            The format of the fragments (e.g. `md` or `yaml`).
+
+        Returns
+        -------
+        dict
+            The signatures by record id.
+        """
+        return dict( self.connection.execute( "SELECT id, signature FROM fragments WHERE format = ?", ( format, ) ) )
+
+    def get( self, ids : list, format : str ) -> list:
+        """
+        Get the cached fragments of multiple records.
+
+        Parameters
+        ----------
+        ids : list
+            The ids of the records.
+        format : str
+            The format of the fragments.
+
+        Returns
+        -------
+        list
+            The fragments in the order of the ids.
+        """
+        ids = [ str(i) for i in ids ]
+        fragments = {}
+
+        # the ids are queried in batches since older SQLite versions allow at most 999 parameters per query
+        for start in range( 0, len( ids ), self._batch_size ):
+            batch = ids[ start : start + self._batch_size ]
+            marks = ", ".join( "?" * len( batch ) )
+            fragments.update( self.connection.execute( f"SELECT id, fragment FROM fragments WHERE format = ? AND id IN ({marks})", [ format, *batch ] ) )
+        return [ fragments[id] for id in ids ]
+
+    def put( self, fragments, format : str ):
+        """
+        Store rendered fragments.
+
+        Parameters
+        ----------
+        fragments : iterable
+            The `( id, signature, fragment )` of each record.
+        format : str
+            The format of the fragments.
+        """
+        with self.connection:
+            self.connection.executemany( "INSERT OR REPLACE INTO fragments VALUES ( ?, ?, ?, ? )", ( ( str(id), format, signature, fragment ) for id, signature, fragment in fragments ) )
+
+    def prune( self, ids : list ):
+        """
+        Remove the fragments of all records that are no longer in the registry.
+
+        Parameters
+        ----------
+        ids : list
+            The ids of all records in the registry.
+        """
+        with self.connection:
+            self.connection.execute( "CREATE TEMPORARY TABLE IF NOT EXISTS current ( id TEXT PRIMARY KEY )" )
+            self.connection.execute( "DELETE FROM current" )
+            self.connection.executemany( "INSERT OR IGNORE INTO current VALUES ( ? )", ( ( str(i), ) for i in ids ) )
+            self.connection.execute( "DELETE FROM fragments WHERE id NOT IN ( SELECT id FROM current )" )
+
+    def close( self ):
+        """
+        Close the cache.
+        """
+        self.connection.close()
+
+    def __enter__( self ):
+        return self
+
+    def __exit__( self, *args ):
+        self.close()
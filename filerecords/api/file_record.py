@@ -12,6 +12,8 @@ searched for in the registry. It is suggested to access the records directly via
 
 
 Once a `FileRecord` has been obtained from the registry its comments and flags can be accessed using the `comments` and `flags` attributes.
+The metadata of a record is only loaded when it is first accessed, so records whose paths are all that is needed
+are cheap to obtain. The flags and the latest comment are available from the registry index and do not require loading the record either.
 
 .. code-block:: python
 
@@ -27,8 +29,26 @@ Once a `FileRecord` has been obtained from the registry its comments and flags c
 
     # Access the flags
     flags = record.flags
+
+    # Load the metadata right away (e.g. before handing the record on)
+    record.preload()
     
 
+Each record also keeps the size, modification time and inode of its file from when it was last commented (unless `settings.record_stats` is disabled). 
+The `check()` method compares them to the file at its recorded location. In addition, a content hash of the file can be 
+recorded using the `fingerprint()` method (or automatically whenever a file is commented by setting `settings.hash_files`).
+The stats and hash are only kept in the registry and are not part of the yaml or jsonl exports.
+
+.. code-block:: python
+
+    # "missing", "changed", or None if the file is unchanged
+    status = record.check()
+
+    # record the content hash of the file
+    record.fingerprint()
+    record.save()
+
+
 The `FileRecord` object can also be used to add new comments and flags to the record.
 
 .. code-block:: python
@@ -50,6 +70,8 @@ This will automatically also save the parent registry.
 
 from datetime import datetime
 import uuid
+import copy
+import stat
 import os
 
 import filerecords.api.base as base
@@ -72,8 +94,13 @@ class FileRecord(base.BaseRecord):
         If none is provided, a new id is created.
     filename : str 
         The filename of the file to record (if a new record is being created).
+    metadata : dict
+        The already loaded metadata of the record. 
+        If none is provided, the metadata is loaded from the registry when it is first accessed.
     """
-    def __init__( self, registry, id : str = None, filename : str = None ):
+    def __init__( self, registry, id : str = None, filename : str = None, metadata : dict = None ):
+        self._metadata = None
+        self._version = None
         super().__init__()
         self.registry = registry
         self.filename = os.path.join( os.path.join( self.registry.directory, filename ) ) if filename else None
@@ -96,11 +123,15 @@ class FileRecord(base.BaseRecord):
         self.relpath = self._get_relpath()
         self.filename = self._get_filename()
 
-        self.metafile = os.path.join( self.registry.registry_dir, str(self.id) )
+        self.metafile = self.registry.backend.entryfile( self.id )
         if _init_new:
-            utils._init_entryfile( self.registry.registry_dir, str(self.id) )
+            self.registry._init_record( self )
+            metadata = copy.deepcopy( settings.entryfile_template )
         
-        self.load()
+        self.metadata = metadata
+
+        if _init_new:
+            self._update_stat()
 
         logger.debug( f"filename: {self.filename}" )
 
@@ -111,9 +142,24 @@ class FileRecord(base.BaseRecord):
 
         Note
         ----
-        This is done automatically during init if an existing file is specified.
+        This is done automatically when the metadata is first accessed.
+        """
+        # the version is taken first, so changes made while loading are not missed
+        self._version = self.registry.backend.entry_version( self.id )
+        self.metadata = self.registry.backend.load_entry( self.id )
+
+    def preload( self ):
         """
-        super().load( self.metafile )
+        Load the file records right away if they are not loaded yet.
+
+        Returns
+        -------
+        FileRecord
+            The record itself.
+        """
+        if not self.loaded:
+            self.load()
+        return self
 
     def save( self ):
         """
@@ -121,8 +167,81 @@ class FileRecord(base.BaseRecord):
         This will also save the the 
         registry state at the same time.
         """
-        super().save()
-        self.registry.save()
+        self.registry._save_record( self )
+
+    def add_comment( self, comment : str ):
+        """
+        Add a new comment to the metadata.
+        This also records the current size and modification time of the file if `settings.record_stats` is set (see `check()`).
+
+        Note
+        ----
+        This will not automatically save the metadata,
+        use the save() method to do so.
+
+        Parameters
+        ----------
+        comment : str
+            The comment to add.
+        """
+        super().add_comment( comment )
+        self._update_stat()
+
+    def lookup_last( self ) -> dict:
+        """
+        Get the last comment.
+        This is taken from the registry index as long as the metadata is not loaded.
+
+        Returns
+        -------
+        dict
+            The last comment dictionary with timestamp as key, 
+            user and comment as values.
+        """
+        if not self.loaded and self.id in self.registry.index:
+            return self.registry.index.get_latest( self.id )
+        return super().lookup_last()
+
+    def fingerprint( self ) -> str:
+        """
+        Record the current stats and content hash of the recorded file.
+
+        Note
+        ----
+        This will not automatically save the metadata,
+        use the save() method to do so.
+
+        Returns
+        -------
+        str or None
+            The content hash of the file, or None if the file does not exist or is a directory.
+        """
+        current = self._get_stat()
+        if current is None:
+            return None
+        self.metadata["stat"] = current
+        self.metadata["hash"] = utils.hash_file( self.path )
+        return self.metadata["hash"]
+
+    def check( self ) -> str:
+        """
+        Check the recorded file at its recorded location.
+
+        Returns
+        -------
+        str or None
+            `"missing"` if the file does not exist, `"changed"` if its size or modification time 
+            differ from when it was last commented, or None if neither is the case.
+        """
+        try:
+            info = os.stat( self.path )
+        except FileNotFoundError:
+            return "missing"
+
+        recorded = self.metadata.get( "stat" )
+        if recorded and ( recorded["size"] != info.st_size or recorded["mtime"] != info.st_mtime ):
+            return "changed"
+        return None
 
     def add_flags( self, flags : str or list ):
         """
@@ -150,6 +269,24 @@ class FileRecord(base.BaseRecord):
             flags = get_group_flags( flags )
         super().add_flags( flags )
         self.registry.add_flags( flags )
+        self._update_index()
+
+    def remove_flags( self, flags : str or list ):
+        """
+        Remove flags from the metadata.
+
+        Note
+        ----
+        This will not automatically save the metadata,
+        use the save() method to do so.
+
+        Parameters
+        ----------
+        flags : str or list
+            The flag(s) to remove.
+        """
+        super().remove_flags( flags )
+        self._update_index()
 
 
     def to_markdown( self, comments_header : bool = True ):
@@ -207,7 +344,8 @@ class FileRecord(base.BaseRecord):
             The assembled dictionary of the registry.
         """
         
-        _dict = dict( self.metadata )
+        # the stats and hash of the file describe the local copy only and are left out of exports
+        _dict = { key : value for key, value in self.metadata.items() if key not in ( "stat", "hash" ) }
         _dict["filename"] = self.filename
         _dict["relpath"] = self.relpath[3:] # the [3:] is to remove the ../ in front of every relpath
         if timestamp:
@@ -219,25 +357,103 @@ class FileRecord(base.BaseRecord):
         return _dict
 
 
-    def _get_relpath(self):
+    @property
+    def metadata( self ) -> dict:
         """
-        Make the path of the recorded file relative to the registry.
+        Get the metadata (loaded on first access).
+        """
+        if self._metadata is None:
+            self.load()
+        return self._metadata
+
+    @metadata.setter
+    def metadata( self, metadata : dict ):
+        self._metadata = metadata
+        # the metadata as loaded, to merge our changes with those of other processes when saving
+        self._stored = utils._snapshot_metadata( metadata ) if metadata is not None else None
+
+    @property
+    def path( self ) -> str:
+        """
+        Get the absolute path of the recorded file.
         """
+        return os.path.normpath( os.path.join( self.registry.registry_dir, self.relpath ) )
 
-        # logger.debug( f"Registry index: {self.registry.index}" ) 
-        ids = self.registry.index.id.astype(str)
+    @property
+    def loaded( self ) -> bool:
+        """
+        Whether the metadata has already been loaded.
+        """
+        return self._metadata is not None
+
+    @property
+    def flags( self ) -> list:
+        """
+        Get the flags. 
+        These are taken from the registry index as long as the metadata is not loaded.
+        """
+        if not self.loaded and self.id in self.registry.index:
+            return self.registry.index.get_flags( self.id )
+        return self.metadata["flags"]
+
+    def _get_stat( self ) -> dict:
+        """
+        Get the current size, modification time and inode of the recorded file.
+
+        Returns
+        -------
+        dict or None
+            The stats of the file, or None if the file does not exist or is a directory
+            (whose stats change with their contents).
+        """
+        try:
+            info = os.stat( self.path )
+        except FileNotFoundError:
+            return None
+        if stat.S_ISDIR( info.st_mode ):
+            return None
+        return { "size" : info.st_size, "mtime" : info.st_mtime, "inode" : info.st_ino }
+
+    def _update_stat( self ):
+        """
+        Record the current stats of the recorded file if `settings.record_stats` is set 
+        (and its content hash if `settings.hash_files` is set).
+        """
+        if not ( settings.record_stats or settings.hash_files ):
+            return
+        current = self._get_stat()
+        if current is None:
+            return
+
+        if settings.hash_files:
+            self.metadata["hash"] = utils.hash_file( self.path )
+        elif self.metadata.get( "stat" ) != current:
+            # the hash no longer belongs to the current file contents 
+            self.metadata.pop( "hash", None )
+        self.metadata["stat"] = current
+
+    def _update_index( self ):
+        """
+        Update the record's flags in the registry index.
+        New records are not yet part of the index, they are added by the registry together with their flags.
+        """
+        if self.id in self.registry.index:
+            self.registry.index.set_flags( self.id, self.flags )
 
-        # logger.debug( f"ids={ids}" )
+    def _get_relpath(self):
+        """
+        Make the path of the recorded file relative to the registry.
+        """
         logger.debug( f"str(self.id)={str(self.id)}" )
 
-        if str(self.id) in ids:
-            return self.registry.index.loc[ids == str(self.id), "relpath"].values[0]
+        if self.id in self.registry.index:
+            return self.registry.index.get_relpath( self.id )
         
         else:
 
             relpath = os.path.relpath( self.filename, self.registry.registry_dir )
 
-            if relpath in self.registry.index.relpath.values:
+            if self.registry.index.get_id( relpath ) is not None:
                 directory = os.path.relpath( os.path.dirname(relpath), self.registry.directory ) 
                 raise FileExistsError( f"File {self.filename} within {directory} already exists in the registry." )
         
@@ -247,18 +463,10 @@ class FileRecord(base.BaseRecord):
         """
         Get the filename of the file record.
         """
-        ids = self.registry.index.id.astype(str)
-
-        # logger.debug( f"ids={ids}" )
         logger.debug( f"self.id={self.id}" )
 
-        if str(self.id) in ids:
-
-            logger.debug( self.registry.index )
-            logger.debug( ids == str(self.id) )
-            logger.debug( self.registry.index.loc[ids == str(self.id), "filename"].values[0] )
-
-            return self.registry.index.loc[ids == str(self.id), "filename"].values[0]
+        if self.id in self.registry.index:
+            return self.registry.index.get_filename( self.id )
         return os.path.basename( self.filename )
 
     def __repr__( self ):
@@ -0,0 +1,140 @@
+"""
+Flag queries are boolean expressions over the flags of records, such as ``results AND NOT tmp OR group:final``.
+
+The expressions consist of flags, the operators ``NOT``, ``AND``, and ``OR`` (in the order of their precedence),
+and parentheses to group sub-expressions, e.g. ``results AND ( NOT tmp OR group:final )``. The operators must be written in capitals,
+any other word is a flag.
+
+A query is evaluated over bitmaps of the records carrying each flag (see `Index.find_query()`),
+where the bit at each position of a bitmap stands for the record in the same row of the index.
+The operators are then bitwise operations over the entire registry at once.
+
+.. note::
+
+    This is not intended to be used directly, queries are evaluated by `Registry.search()` and `Registry.list_dir()`.
+
+"""
+
+import re
+
+_tokens = re.compile( r"\s*(?:(\()|(\))|([^\s()]+))" )
+"""The tokens of an expression: parentheses and words (flags and operators)."""
+
+_operators = ( "NOT", "AND", "OR" )
+
+
+def parse( expression : str ) -> tuple:
+    """
+    Parse a flag query.
+
+    Parameters
+    ----------
+    expression : str
+        The query expression.
+
+    Returns
+    -------
+    tuple
+        The parsed query as nested tuples of `( "flag", name )`, `( "not", query )`,
+        `( "and", query, query, ... )`, and `( "or", query, query, ... )`.
+    """
+    tokens = _tokenize( expression )
+    if not tokens:
+        raise ValueError( "The query is empty." )
+
+    tree, position = _parse_or( tokens, 0 )
+    if position < len( tokens ):
+        raise ValueError( f"Unexpected '{tokens[position]}' in query '{expression}'." )
+    return tree
+
+def evaluate( tree : tuple, bitmap, everything : int ) -> int:
+    """
+    Evaluate a parsed query over bitmaps.
+
+    Parameters
+    ----------
+    tree : tuple
+        The parsed query.
+    bitmap : callable
+        The function returning the bitmap of the records carrying a flag.
+    everything : int
+        The bitmap of all records.
+
+    Returns
+    -------
+    int
+        The bitmap of the records matching the query.
+    """
+    kind = tree[0]
+    if kind == "flag":
+        return bitmap( tree[1] )
+    if kind == "not":
+        return everything & ~evaluate( tree[1], bitmap, everything )
+
+    bits = evaluate( tree[1], bitmap, everything )
+    for i in tree[2:]:
+        if kind == "and":
+            bits &= evaluate( i, bitmap, everything )
+        else:
+            bits |= evaluate( i, bitmap, everything )
+    return bits
+
+def _tokenize( expression : str ) -> list:
+    """
+    Split a query expression into its tokens.
+    """
+    tokens = []
+    for match in _tokens.finditer( expression.strip() ):
+        tokens.append( match.group( match.lastindex ) )
+    return tokens
+
+def _parse_or( tokens : list, position : int ):
+    """
+    Parse a sequence of sub-expressions joined by OR.
+    """
+    operands = []
+    while True:
+        operand, position = _parse_and( tokens, position )
+        operands.append( operand )
+        if position < len( tokens ) and tokens[position] == "OR":
+            position += 1
+            continue
+        break
+    return ( operands[0] if len( operands ) == 1 else ( "or", *operands ) ), position
+
+def _parse_and( tokens : list, position : int ):
+    """
+    Parse a sequence of sub-expressions joined by AND.
+    """
+    operands = []
+    while True:
+        operand, position = _parse_not( tokens, position )
+        operands.append( operand )
+        if position < len( tokens ) and tokens[position] == "AND":
+            position += 1
+            continue
+        break
+    return ( operands[0] if len( operands ) == 1 else ( "and", *operands ) ), position
+
+def _parse_not( tokens : list, position : int ):
+    """
+    Parse a (possibly negated) flag or parenthesized sub-expression.
+    """
+    if position >= len( tokens ):
+        raise ValueError( "The query ends unexpectedly." )
+
+    token = tokens[position]
+    if token == "NOT":
+        operand, position = _parse_not( tokens, position + 1 )
+        return ( "not", operand ), position
+
+    if token == "(":
+        operand, position = _parse_or( tokens, position + 1 )
+        if position >= len( tokens ) or tokens[position] != ")":
+            raise ValueError( "A parenthesis in the query is not closed." )
+        return operand, position + 1
+
+    if token == ")" or token in _operators:
+        raise ValueError( f"Unexpected '{token}' in the query, a flag was expected." )
+
+    return ( "flag", token ), position + 1
@@ -0,0 +1,199 @@
+"""
+The `CommentIndex` is a full-text index of the comments of all records in a registry,
+which allows finding records by the words used in their comments without loading the records themselves.
+
+The index is stored as an SQLite database (`settings.comment_index`) within the registry directory,
+using the FTS5 extension of SQLite (which is part of the `sqlite3` module of Python). It is only created once the comments
+of a registry are first searched. From then on the registry updates it whenever records are saved or removed,
+which only touches the comments that were added or removed since.
+It can be deleted at any time, in which case it is simply built anew by the next search.
+
+.. note::
+
+    This is not intended to be used directly, the index is used by `Registry.search_comments()`.
+
+"""
+
+from datetime import datetime
+import sqlite3
+import os
+
+import filerecords.api.settings as settings
+
+
+class CommentIndex:
+    """
+    The full-text index of the comments of a registry.
+
+    Parameters
+    ----------
+    registry_dir : str
+        The registry directory.
+    filename : str
+        The database file. By default `settings.comment_index` within the registry directory is used.
+    """
+
+    _schema = """
+    CREATE TABLE IF NOT EXISTS comments ( id INTEGER PRIMARY KEY, record TEXT NOT NULL, timestamp TEXT NOT NULL, user TEXT, comment TEXT );
+    CREATE INDEX IF NOT EXISTS comments_record ON comments ( record, timestamp );
+    CREATE VIRTUAL TABLE IF NOT EXISTS comments_fts USING fts5 ( comment, content = 'comments', content_rowid = 'id' );
+    CREATE TRIGGER IF NOT EXISTS comments_insert AFTER INSERT ON comments BEGIN
+        INSERT INTO comments_fts ( rowid, comment ) VALUES ( new.id, new.comment );
+    END;
+    CREATE TRIGGER IF NOT EXISTS comments_delete AFTER DELETE ON comments BEGIN
+        INSERT INTO comments_fts ( comments_fts, rowid, comment ) VALUES ( 'delete', old.id, old.comment );
+    END;
+    """
+
+    def __init__( self, registry_dir : str, filename : str = None ):
+        self.filename = filename if filename else os.path.join( registry_dir, settings.comment_index )
+        self.connection = sqlite3.connect( self.filename )
+        self.connection.executescript( self._schema )
+
+    @staticmethod
+    def exists( registry_dir : str ) -> bool:
+        """
+        Check whether the comment index of a registry was already built.
+
+        Parameters
+        ----------
+        registry_dir : str
+            The registry directory.
+        """
+        return os.path.exists( os.path.join( registry_dir, settings.comment_index ) )
+
+    @classmethod
+    def build( cls, registry_dir : str, entries ):
+        """
+        Build the comment index of a registry from scratch.
+
+        The index is built in a separate file which only replaces the index once it is complete.
+
+        Parameters
+        ----------
+        registry_dir : str
+            The registry directory.
+        entries : iterable
+            The `( id, metadata )` of all records.
+
+        Returns
+        -------
+        CommentIndex
+            The new index.
+        """
+        filename = os.path.join( registry_dir, settings.comment_index )
+        partial = filename + ".partial"
+        if os.path.exists( partial ):
+            os.remove( partial )
+
+        # the full-text index is built once all comments are inserted which is much faster than 
+        # updating it with every comment (which the triggers do when comments are added later on)
+        new = cls( registry_dir, filename = partial )
+        with new.connection:
+            new.connection.execute( "DROP TRIGGER comments_insert" )
+            for id, metadata in entries:
+                new.connection.executemany( "INSERT INTO comments ( record, timestamp, user, comment ) VALUES ( ?, ?, ?, ? )", 
+                                            ( ( str(id), timestamp.isoformat(), entry["user"], entry["comment"] ) for timestamp, entry in metadata["comments"].items() ) )
+            new.connection.execute( "INSERT INTO comments_fts ( comments_fts ) VALUES ( 'rebuild' )" )
+        new.close()
+        os.replace( partial, filename )
+        return cls( registry_dir )
+
+    def update( self, entries ):
+        """
+        Update the indexed comments of records.
+        Only the comments that were added, edited, or removed since the last update are changed.
+
+        Parameters
+        ----------
+        entries : iterable
+            The `( id, metadata )` of each record.
+        """
+        with self.connection:
+            for id, metadata in entries:
+                self._update_record( str(id), metadata["comments"] )
+
+    def remove( self, ids : list ):
+        """
+        Remove the comments of records from the index.
+
+        Parameters
+        ----------
+        ids : list
+            The ids of the records.
+        """
+        with self.connection:
+            self.connection.executemany( "DELETE FROM comments WHERE record = ?", ( ( str(i), ) for i in ids ) )
+
+    def search( self, terms : list, limit : int = None ) -> list:
+        """
+        Search for records whose comments contain all of the given terms.
+
+        Parameters
+        ----------
+        terms : list
+            The terms to search for. Terms ending with a `*` match all words starting with them.
+        limit : int
+            The maximal number of records to return. By default all matching records are returned.
+
+        Returns
+        -------
+        list
+            The `( id, comments )` of the matching records, where `comments` are the matching comments
+            with timestamps as keys, user and comment as values. The records are ranked by their best matching comment.
+        """
+        query = " ".join( _quote( i ) for i in terms )
+        matches = """
+                  SELECT comments.record, comments.timestamp, comments.user, comments.comment, comments_fts.rank AS rank
+                  FROM comments_fts JOIN comments ON comments.id = comments_fts.rowid
+                  WHERE comments_fts MATCH ?
+                  """
+
+        if limit is None:
+            matches = self.connection.execute( f"{matches} ORDER BY rank, comments.record", ( query, ) )
+        else:
+            # only the matches of the best ranking records are fetched
+            matches = self.connection.execute( f"""
+                                                WITH matches AS ( {matches} ),
+                                                best AS ( SELECT record, MIN( rank ) AS best FROM matches GROUP BY record ORDER BY best, record LIMIT ? )
+                                                SELECT matches.record, timestamp, user, comment, rank FROM matches JOIN best ON best.record = matches.record 
+                                                ORDER BY best.best, matches.record, rank
+                                                """, ( query, limit ) )
+
+        records = {}
+        for record, timestamp, user, comment, rank in matches:
+            records.setdefault( record, {} )[ datetime.fromisoformat( timestamp ) ] = { "comment" : comment, "user" : user }
+
+        return list( records.items() )
+
+    def close( self ):
+        """
+        Close the index.
+        """
+        self.connection.close()
+
+    def __enter__( self ):
+        return self
+
+    def __exit__( self, *args ):
+        self.close()
+
+    def _update_record( self, id : str, comments : dict ):
+        """
+        Bring the indexed comments of a record in line with its current comments (without committing).
+        """
+        indexed = { ( timestamp, user, comment ) : rowid for rowid, timestamp, user, comment in self.connection.execute( "SELECT id, timestamp, user, comment FROM comments WHERE record = ?", ( id, ) ) }
+        current = [ ( timestamp.isoformat(), entry["user"], entry["comment"] ) for timestamp, entry in comments.items() ]
+
+        added = [ ( id, *i ) for i in current if indexed.pop( i, None ) is None ]
+        self.connection.executemany( "DELETE FROM comments WHERE id = ?", ( ( i, ) for i in indexed.values() ) )
+        self.connection.executemany( "INSERT INTO comments ( record, timestamp, user, comment ) VALUES ( ?, ?, ?, ? )", added )
+
+
+def _quote( term : str ) -> str:
+    """
+    Quote a search term for an FTS5 query, so any special characters are matched literally.
+    """
+    prefix = term.endswith( "*" )
+    term = term.rstrip( "*" ).replace( '"', '""' )
+    return f'"{term}"*' if prefix else f'"{term}"'
@@ -0,0 +1,621 @@
+"""
+The `Index` is the in-memory lookup table of a registry which maps record ids to the recorded files.
+
+Each recorded file is stored as a row of five columns: its `id`, its `filename` (basename), its `relpath`
+(the path relative to the registry directory), its `flags`, and its `latest` comment. The latest comment is kept in the index 
+so looking up the latest comments of records does not require loading their entire comment histories.
+Next to the columns, the index keeps hash maps from ids to rows
+and from relpaths to ids, so looking up a record by either its id or its path does not require scanning the entire index.
+It also keeps an inverted index from each flag to the ids of the records carrying it, so searching for a flag never requires 
+loading the records themselves. Flag queries (see `filerecords.api.flag_query`) are evaluated over bitmaps of the records 
+carrying each flag, which are derived from the inverted index when they are first needed. The index also keeps a map from each directory to the ids of the records directly within it. The directories are
+additionally kept in sorted order, so all directories within a directory (i.e. starting with its path) are found by bisection.
+When a record is removed, the last record of the index takes its row, so no other rows change 
+(and only the bits of these two rows are updated within the bitmaps).
+
+Every change made to the index is also kept in its `changes`. When a registry is saved while other processes saved it as well,
+the index is loaded again and the changes are replayed onto it (see `replay()`), so no changes of either side are lost.
+
+.. note::
+
+    This is not intended to be used directly, the index of a registry is accessible via `Registry.index`.
+
+"""
+
+import itertools
+import bisect
+import os
+import re
+
+import filerecords.api.flag_query as flag_query
+
+_selectors = bytes.maketrans( b"01", b"\x00\x01" )
+"""Translates a bitmap in binary text form into selectors for `itertools.compress`."""
+
+
+class Index:
+    """
+    The index of a registry's records.
+
+    Parameters
+    ----------
+    ids : list
+        The record ids.
+    filenames : list
+        The filenames (basenames) of the recorded files.
+    relpaths : list
+        The paths of the recorded files relative to the registry directory.
+    flags : list
+        The flags of each record as lists.
+    latest : list
+        The latest comment of each record as dictionary with the timestamp as key, user and comment as values 
+        (or None if a record has no comments).
+    """
+
+    columns = ( "id", "filename", "relpath", "flags", "latest" )
+    """The columns of the index"""
+
+    def __init__( self, ids : list = None, filenames : list = None, relpaths : list = None, flags : list = None, latest : list = None ):
+        self.ids = [ str(i) for i in ids ] if ids is not None else []
+        self.filenames = [ str(i) for i in filenames ] if filenames is not None else []
+        self.relpaths = [ str(i) for i in relpaths ] if relpaths is not None else []
+        self.flags = [ list(i) for i in flags ] if flags is not None else [ [] for i in self.ids ]
+        self.latest = list( latest ) if latest is not None else [ None for i in self.ids ]
+
+        if not len( self.ids ) == len( self.filenames ) == len( self.relpaths ) == len( self.flags ) == len( self.latest ):
+            raise ValueError( "All index columns must have the same length." )
+
+        self._rows = {}
+        self._relpaths = {}
+        self._flags = {}
+        self._dirs = {}
+        self._sorted_dirs = None
+        self._bitmaps = {}
+        self._reindex()
+
+        self.changes = []
+        """The changes made to the index since it was loaded (see `replay()`)."""
+
+    def get_id( self, relpath : str ) -> str:
+        """
+        Get the id of a recorded file.
+
+        Parameters
+        ----------
+        relpath : str
+            The path of the file relative to the registry directory.
+
+        Returns
+        -------
+        str or None
+            The id of the record or None if the file is not recorded.
+        """
+        return self._relpaths.get( relpath )
+
+    def get_relpath( self, id : str ) -> str:
+        """
+        Get the relpath of a record.
+
+        Parameters
+        ----------
+        id : str
+            The id of the record.
+
+        Returns
+        -------
+        str
+            The path of the recorded file relative to the registry directory.
+        """
+        return self.relpaths[ self._rows[ str(id) ] ]
+
+    def get_filename( self, id : str ) -> str:
+        """
+        Get the filename (basename) of a record.
+
+        Parameters
+        ----------
+        id : str
+            The id of the record.
+
+        Returns
+        -------
+        str
+            The filename of the recorded file.
+        """
+        return self.filenames[ self._rows[ str(id) ] ]
+
+    def get_flags( self, id : str ) -> list:
+        """
+        Get the flags of a record.
+
+        Parameters
+        ----------
+        id : str
+            The id of the record.
+
+        Returns
+        -------
+        list
+            The flags of the record.
+        """
+        return self.flags[ self._rows[ str(id) ] ]
+
+    def set_flags( self, id : str, flags : list ):
+        """
+        Set the flags of a record.
+
+        Parameters
+        ----------
+        id : str
+            The id of the record.
+        flags : list
+            The (complete) flags of the record.
+        """
+        id = str(id)
+        row = self._rows[id]
+        self._unflag( id, self.flags[row] )
+        self.flags[row] = list( flags )
+        self._flag( id, self.flags[row] )
+        self.changes.append( ( "flags", id, self.flags[row] ) )
+
+    def get_latest( self, id : str ) -> dict:
+        """
+        Get the latest comment of a record.
+
+        Parameters
+        ----------
+        id : str
+            The id of the record.
+
+        Returns
+        -------
+        dict or None
+            The latest comment with the timestamp as key, user and comment as values,
+            or None if the record has no comments.
+        """
+        return self.latest[ self._rows[ str(id) ] ]
+
+    def set_latest( self, id : str, latest : dict ):
+        """
+        Set the latest comment of a record.
+
+        Parameters
+        ----------
+        id : str
+            The id of the record.
+        latest : dict
+            The latest comment with the timestamp as key, user and comment as values (or None).
+        """
+        self.latest[ self._rows[ str(id) ] ] = latest
+        self.changes.append( ( "latest", str(id), latest ) )
+
+    def find_flag( self, flag : str ) -> list:
+        """
+        Find all records carrying a flag.
+
+        Parameters
+        ----------
+        flag : str
+            The flag to search for.
+
+        Returns
+        -------
+        list
+            The ids of all flagged records in index order.
+        """
+        return sorted( self._flags.get( flag, () ), key = self._rows.get )
+
+    def find_query( self, expression : str ) -> list:
+        """
+        Find all records matching a flag query such as `results AND NOT tmp OR group:final`.
+
+        Parameters
+        ----------
+        expression : str
+            The query expression (see `filerecords.api.flag_query`).
+
+        Returns
+        -------
+        list
+            The ids of all matching records in index order.
+        """
+        tree = flag_query.parse( expression )
+        bits = flag_query.evaluate( tree, self.bitmap, ( 1 << len( self.ids ) ) - 1 )
+
+        # the bits (in reverse order) select the rows of the matching records
+        selectors = format( bits, f"0{len( self.ids )}b" )[::-1].encode().translate( _selectors )
+        return list( itertools.compress( self.ids, selectors ) )
+
+    def bitmap( self, flag : str ) -> int:
+        """
+        Get the bitmap of the records carrying a flag.
+
+        Parameters
+        ----------
+        flag : str
+            The flag.
+
+        Returns
+        -------
+        int
+            The bitmap where the n-th bit is set if the record in the n-th row of the index carries the flag.
+        """
+        bits = self._bitmaps.get( flag )
+        if bits is None:
+            # the bitmap is assembled in binary text form (with the first row as last digit)
+            digits = bytearray( b"0" ) * len( self.ids )
+            for id in self._flags.get( flag, () ):
+                digits[ -1 - self._rows[id] ] = ord( "1" )
+            bits = self._bitmaps[flag] = int( digits, 2 ) if digits else 0
+        return bits
+
+    def find_dir( self, directory : str, recursive : bool = False ) -> list:
+        """
+        Find all records within a directory.
+
+        Parameters
+        ----------
+        directory : str
+            The path of the directory relative to the registry directory.
+        recursive : bool
+            If True, the records within all sub-directories are included as well.
+
+        Returns
+        -------
+        list
+            The ids of all records within the directory in index order.
+        """
+        directory = os.path.normpath( directory )
+        if not recursive:
+            return sorted( self._dirs.get( directory, () ), key = self._rows.get )
+
+        if self._sorted_dirs is None:
+            self._sorted_dirs = sorted( self._dirs )
+
+        # all sub-directories start with the directory's path and are therefore
+        # sorted right after it (directly or after other directories starting with the same name)
+        prefix = os.path.join( directory, "" )
+        ids = list( self._dirs.get( directory, () ) )
+        for i in range( bisect.bisect_left( self._sorted_dirs, prefix ), len( self._sorted_dirs ) ):
+            if not self._sorted_dirs[i].startswith( prefix ):
+                break
+            ids.extend( self._dirs[ self._sorted_dirs[i] ] )
+
+        return sorted( ids, key = self._rows.get )
+
+    def row( self, id : str ) -> dict:
+        """
+        Get the entire index row of a record.
+
+        Parameters
+        ----------
+        id : str
+            The id of the record.
+
+        Returns
+        -------
+        dict
+            The index entry as dictionary with `id`, `filename`, `relpath`, `flags` and `latest`.
+        """
+        row = self._rows[ str(id) ]
+        return dict( zip( self.columns, ( self.ids[row], self.filenames[row], self.relpaths[row], self.flags[row], self.latest[row] ) ) )
+
+    def rows( self ):
+        """
+        Iterate over all index rows.
+
+        Yields
+        ------
+        tuple
+            The `( id, filename, relpath, flags, latest )` of each record in index order.
+        """
+        return zip( self.ids, self.filenames, self.relpaths, self.flags, self.latest )
+
+    def add( self, id : str, relpath : str, flags : list = None, latest : dict = None ):
+        """
+        Add a new record to the index.
+
+        Parameters
+        ----------
+        id : str
+            The id of the new record.
+        relpath : str
+            The path of the recorded file relative to the registry directory.
+        flags : list
+            The flags of the new record.
+        latest : dict
+            The latest comment of the new record.
+        """
+        id = str(id)
+        if id in self._rows:
+            raise KeyError( f"A record with id {id} already exists in the index." )
+        if relpath in self._relpaths:
+            raise FileExistsError( f"{relpath} already exists in the index." )
+
+        self._rows[id] = len( self.ids )
+        self._relpaths[relpath] = id
+        self.ids.append( id )
+        self.filenames.append( os.path.basename( relpath ) )
+        self.relpaths.append( relpath )
+        self.flags.append( list( flags ) if flags else [] )
+        self.latest.append( latest )
+        self._flag( id, self.flags[-1] )
+        self._add_dir( id, relpath )
+        self.changes.append( ( "add", id, relpath, self.flags[-1], latest ) )
+
+    def extend( self, ids : list, relpaths : list, flags : list = None, latest : list = None ):
+        """
+        Add multiple new records to the index at once.
+
+        Parameters
+        ----------
+        ids : list
+            The ids of the new records.
+        relpaths : list
+            The paths of the recorded files relative to the registry directory.
+        flags : list
+            The flags of each new record as lists.
+        latest : list
+            The latest comment of each new record.
+        """
+        ids = [ str(i) for i in ids ]
+        relpaths = list( relpaths )
+        flags = [ list(i) for i in flags ] if flags is not None else [ [] for i in ids ]
+        latest = list( latest ) if latest is not None else [ None for i in ids ]
+        if not len( ids ) == len( relpaths ) == len( flags ) == len( latest ):
+            raise ValueError( "All index columns must have the same length." )
+
+        # check everything first so the index is not left half-extended
+        new_ids = set()
+        for id in ids:
+            if id in self._rows or id in new_ids:
+                raise KeyError( f"A record with id {id} already exists in the index." )
+            new_ids.add( id )
+        new_relpaths = set()
+        for relpath in relpaths:
+            if relpath in self._relpaths or relpath in new_relpaths:
+                raise FileExistsError( f"{relpath} already exists in the index." )
+            new_relpaths.add( relpath )
+
+        start = len( self.ids )
+        self.ids.extend( ids )
+        self.filenames.extend( os.path.basename( i ) for i in relpaths )
+        self.relpaths.extend( relpaths )
+        self.flags.extend( flags )
+        self.latest.extend( latest )
+
+        for row, ( id, relpath, _flags ) in enumerate( zip( ids, relpaths, flags ), start ):
+            self._rows[id] = row
+            self._relpaths[relpath] = id
+            self._flag( id, _flags )
+            self._add_dir( id, relpath )
+        self.changes.append( ( "extend", ids, relpaths, flags, latest ) )
+
+    def move( self, id : str, relpath : str ):
+        """
+        Change the path of a record.
+
+        Parameters
+        ----------
+        id : str
+            The id of the record.
+        relpath : str
+            The new path of the recorded file relative to the registry directory.
+        """
+        id = str(id)
+        if self._relpaths.get( relpath, id ) != id:
+            raise FileExistsError( f"{relpath} already exists in the index." )
+
+        row = self._rows[id]
+        self._relpaths.pop( self.relpaths[row] )
+        self._remove_dir( id, self.relpaths[row] )
+        self._relpaths[relpath] = id
+        self._add_dir( id, relpath )
+        self.relpaths[row] = relpath
+        self.filenames[row] = os.path.basename( relpath )
+        self.changes.append( ( "move", id, relpath ) )
+
+    def remove( self, id : str ):
+        """
+        Remove a record from the index.
+
+        Parameters
+        ----------
+        id : str
+            The id of the record.
+        """
+        id = str(id)
+        row = self._rows.pop( id )
+        self._relpaths.pop( self.relpaths[row] )
+        self._remove_dir( id, self.relpaths[row] )
+        for flag in self.flags[row]:
+            self._clear_bit( flag, row )
+        self._unflag( id, self.flags[row], keep_bitmaps = True )
+
+        # the last record takes the row of the removed one, so no other rows change
+        last = len( self.ids ) - 1
+        columns = ( self.ids, self.filenames, self.relpaths, self.flags, self.latest )
+        if row != last:
+            moved = self.ids[last]
+            for column in columns:
+                column[row] = column[last]
+            self._rows[moved] = row
+            for flag in self.flags[row]:
+                self._clear_bit( flag, last )
+                if flag in self._bitmaps:
+                    self._bitmaps[flag] |= 1 << row
+        for column in columns:
+            column.pop()
+
+        self.changes.append( ( "remove", id ) )
+
+    def replay( self, changes : list ) -> dict:
+        """
+        Apply the changes made to another copy of the index (e.g. by a process which loaded the registry before this index was saved).
+
+        Changes of records that no longer exist are skipped. Neither are new records added 
+        nor records moved if their path was recorded (by another record) in the meantime.
+
+        Parameters
+        ----------
+        changes : list
+            The changes of the other copy (see `changes`).
+
+        Returns
+        -------
+        dict
+            The ids of the records whose changes were skipped because their path was recorded in the meantime,
+            mapped to the ids of the records recorded at their paths.
+        """
+        conflicts = {}
+        for kind, id, *values in changes:
+
+            if kind == "extend":
+                rows = [ row for row in zip( id, *values ) if self._is_new( row[0], row[1], conflicts ) ]
+                if rows:
+                    self.extend( *zip( *rows ) )
+
+            elif kind == "add":
+                if self._is_new( id, values[0], conflicts ):
+                    self.add( id, *values )
+
+            elif id not in self._rows:
+                continue
+
+            elif kind == "move":
+                other = self._relpaths.get( values[0], id )
+                if other != id:
+                    conflicts[id] = other
+                else:
+                    self.move( id, values[0] )
+
+            elif kind == "remove":
+                self.remove( id )
+            elif kind == "flags":
+                self.set_flags( id, values[0] )
+            elif kind == "latest":
+                self.set_latest( id, values[0] )
+
+        return conflicts
+
+    def copy( self ):
+        """
+        Get an independent copy of the index.
+
+        Returns
+        -------
+        Index
+            The copied index.
+        """
+        copied = Index( self.ids, self.filenames, self.relpaths, self.flags, self.latest )
+        copied.changes = list( self.changes )
+        return copied
+
+    def find( self, pattern : str ) -> list:
+        """
+        Find records whose filename matches a regular expression.
+
+        Parameters
+        ----------
+        pattern : str
+            The regular expression to search for in the filenames.
+
+        Returns
+        -------
+        list
+            The ids of all matching records in index order.
+        """
+        pattern = re.compile( pattern )
+        return [ id for id, filename in zip( self.ids, self.filenames ) if pattern.search( filename ) ]
+
+    def _is_new( self, id : str, relpath : str, conflicts : dict ) -> bool:
+        """
+        Check whether a record can be added when replaying changes (see `replay()`).
+        """
+        if id in self._rows:
+            return False
+        other = self._relpaths.get( relpath )
+        if other is not None:
+            conflicts[id] = other
+            return False
+        return True
+
+    def _flag( self, id : str, flags : list ):
+        """
+        Add a record to the inverted flag index.
+        """
+        for flag in flags:
+            self._flags.setdefault( flag, set() ).add( id )
+            self._bitmaps.pop( flag, None )
+
+    def _unflag( self, id : str, flags : list, keep_bitmaps : bool = False ):
+        """
+        Remove a record from the inverted flag index. 
+        Unless `keep_bitmaps` is set (i.e. the bits of the record were already cleared), the bitmaps of the flags are derived anew when they are needed next.
+        """
+        for flag in flags:
+            if not keep_bitmaps:
+                self._bitmaps.pop( flag, None )
+            ids = self._flags.get( flag )
+            if ids is None:
+                continue
+            ids.discard( id )
+            if not ids:
+                self._flags.pop( flag )
+
+    def _clear_bit( self, flag : str, row : int ):
+        """
+        Clear the bit of a row within the bitmap of a flag (if the bitmap was derived already).
+        """
+        if flag in self._bitmaps:
+            self._bitmaps[flag] &= ~( 1 << row )
+
+    def _add_dir( self, id : str, relpath : str ):
+        """
+        Add a record to the directory map.
+        """
+        directory = os.path.dirname( os.path.normpath( relpath ) )
+        if directory not in self._dirs:
+            self._dirs[directory] = set()
+            self._sorted_dirs = None
+        self._dirs[directory].add( id )
+
+    def _remove_dir( self, id : str, relpath : str ):
+        """
+        Remove a record from the directory map.
+        """
+        directory = os.path.dirname( os.path.normpath( relpath ) )
+        ids = self._dirs.get( directory )
+        if ids is None:
+            return
+        ids.discard( id )
+        if not ids:
+            self._dirs.pop( directory )
+            self._sorted_dirs = None
+
+    def _reindex( self ):
+        """
+        Rebuild the id, relpath, flag and directory lookup maps from the index columns.
+        """
+        self._rows = { id : row for row, id in enumerate( self.ids ) }
+        self._relpaths = { relpath : id for id, relpath in zip( self.ids, self.relpaths ) }
+        self._flags = {}
+        self._bitmaps = {}
+        for id, flags in zip( self.ids, self.flags ):
+            self._flag( id, flags )
+        self._dirs = {}
+        self._sorted_dirs = None
+        for id, relpath in zip( self.ids, self.relpaths ):
+            self._add_dir( id, relpath )
+
+    def __contains__( self, id ):
+        return str(id) in self._rows
+
+    def __iter__( self ):
+        return iter( self.ids )
+
+    def __len__( self ):
+        return len( self.ids )
+
+    def __repr__( self ):
+        return f"{self.__class__.__name__}(records = {len(self)})"
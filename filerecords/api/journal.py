@@ -0,0 +1,240 @@
+"""
+The `Journal` of a registry is an append-only file in which every save of a registry is written as a single line,
+instead of writing the registry index, metadata, and records anew (see the `journal` storage backend).
+
+Each line is a json object holding the changes made to the index (see `Index.changes`), the changes made to each record
+and to the registry metadata (see `utils._diff_metadata`), and the ids of removed records (whose changes are null).
+When the registry is loaded, the lines are applied to the index, metadata, and record files in the order they were written.
+
+A line is only written entirely or not at all, so a process that is killed while saving does not leave a broken registry
+(a partially written last line is ignored and overwritten by the next save). Within a batch (e.g. a transaction) the line is 
+only written once all other writes of the batch succeeded, so a failed batch leaves no changes in the journal. 
+Once the journal grew large enough it is compacted, i.e. the changes are written to the index, metadata, and record files and the journal is emptied (see `JournalBackend.compact()`).
+Since the changes only add or remove entries, applying them again after an interrupted compaction does not change the registry.
+
+.. note::
+
+    This is not intended to be used directly, the journal is written and read by the `journal` storage backend.
+
+"""
+
+from datetime import datetime
+import json
+import os
+
+import filerecords.api.utils as utils
+
+logger = utils.log()
+
+
+class Journal:
+    """
+    The journal of a registry.
+
+    Parameters
+    ----------
+    filename : str
+        The journal file.
+    """
+    def __init__( self, filename : str ):
+        self.filename = filename
+        self._reset()
+
+    def refresh( self ):
+        """
+        Read the lines written (by any process) since the journal was last read.
+        """
+        try:
+            info = os.stat( self.filename )
+        except FileNotFoundError:
+            self._reset()
+            return
+
+        # the journal was emptied by a compaction in the meantime
+        if info.st_ino != self._inode or info.st_size < self.size:
+            self._reset()
+            self._inode = info.st_ino
+
+        if info.st_size == self.size:
+            return
+
+        with open( self.filename, "rb" ) as f:
+            f.seek( self.size )
+            contents = f.read()
+
+        # only complete lines are read, the last line may still be written (or its writer was killed)
+        end = contents.rfind( b"\n" ) + 1
+        for line in contents[ :end ].splitlines():
+            try:
+                self._add( json.loads( line ) )
+            except ( ValueError, KeyError, TypeError ):
+                logger.warning( f"Skipping a broken line in the journal {self.filename}" )
+        self.size += end
+
+    def append( self, changes : list, entries : dict, metadata : dict ):
+        """
+        Append the changes of a save to the journal.
+
+        Note
+        ----
+        The index lock of the registry must be held (see `filerecords.api.locks`).
+
+        Parameters
+        ----------
+        changes : list
+            The changes made to the index (see `Index.changes`).
+        entries : dict
+            The changes made to each record (see `utils._diff_metadata`), or None for removed records.
+        metadata : dict
+            The changes made to the registry metadata.
+        """
+        line = {}
+        if changes:
+            line["index"] = [ _encode_change( i ) for i in changes ]
+        if entries:
+            line["entries"] = { str(id) : _encode_delta( delta ) if delta is not None else None for id, delta in entries.items() }
+        if metadata:
+            line["metadata"] = _encode_delta( metadata )
+        if not line:
+            return
+
+        self.refresh()
+        with open( self.filename, "ab" ) as f:
+            # the remains of a line whose writer was killed
+            if f.tell() > self.size:
+                f.truncate( self.size )
+            f.write( json.dumps( line, separators = ( ",", ":" ) ).encode() + b"\n" )
+        self.refresh()
+
+    def clear( self ):
+        """
+        Empty the journal.
+
+        Note
+        ----
+        The index lock of the registry must be held (see `filerecords.api.locks`).
+        """
+        with utils.atomic_write( self.filename ):
+            pass
+        self._reset()
+
+    def index_changes( self ) -> list:
+        """
+        Get all changes made to the index (in the order they were made).
+
+        Returns
+        -------
+        list
+            The changes (see `Index.changes`).
+        """
+        return self._index
+
+    def metadata_changes( self ) -> list:
+        """
+        Get all changes made to the registry metadata (in the order they were made).
+
+        Returns
+        -------
+        list
+            The changes (see `utils._diff_metadata`).
+        """
+        return self._metadata
+
+    def entry_changes( self, id : str ) -> list:
+        """
+        Get all changes made to a record (in the order they were made).
+
+        Parameters
+        ----------
+        id : str
+            The id of the record.
+
+        Returns
+        -------
+        list or None
+            The changes (see `utils._diff_metadata`), which end with None if the record was removed.
+            None if the record was not changed.
+        """
+        return self._entries.get( str(id) )
+
+    @property
+    def entries( self ) -> list:
+        """
+        Get the ids of all records changed in the journal.
+        """
+        return list( self._entries )
+
+    def __len__( self ):
+        return self._lines
+
+    def _add( self, line : dict ):
+        """
+        Add a line of the journal to the changes read so far.
+        """
+        self._index.extend( _decode_change( i ) for i in line.get( "index", () ) )
+        for id, delta in line.get( "entries", {} ).items():
+            self._entries.setdefault( id, [] ).append( _decode_delta( delta ) if delta is not None else None )
+        if "metadata" in line:
+            self._metadata.append( _decode_delta( line["metadata"] ) )
+        self._lines += 1
+
+    def _reset( self ):
+        """
+        Forget all changes read so far.
+        """
+        self.size = 0
+        """The size (in bytes) of the complete lines read so far."""
+        self._inode = None
+        self._lines = 0
+        self._index = []
+        self._entries = {}
+        self._metadata = []
+
+
+def _encode_change( change : tuple ) -> list:
+    """
+    Encode a change of the index for the journal (the latest comments contain timestamps).
+    """
+    kind = change[0]
+    if kind == "add":
+        return [ *change[:4], utils._encode_latest( change[4] ) ]
+    if kind == "extend":
+        return [ *change[:4], [ utils._encode_latest( i ) for i in change[4] ] ]
+    if kind == "latest":
+        return [ kind, change[1], utils._encode_latest( change[2] ) ]
+    return list( change )
+
+def _decode_change( change : list ) -> tuple:
+    """
+    Decode a change of the index as written to the journal.
+    """
+    kind = change[0]
+    if kind == "add":
+        return ( *change[:4], utils._decode_latest( change[4] ) )
+    if kind == "extend":
+        return ( *change[:4], [ utils._decode_latest( i ) for i in change[4] ] )
+    if kind == "latest":
+        return ( kind, change[1], utils._decode_latest( change[2] ) )
+    return tuple( change )
+
+def _encode_delta( delta : dict ) -> dict:
+    """
+    Encode the changes of a record (or the registry metadata) for the journal (the comments are stored by their timestamps).
+    """
+    encoded = dict( delta )
+    if "comments" in delta:
+        encoded["comments"] = { timestamp.isoformat() : entry for timestamp, entry in delta["comments"].items() }
+    if "uncomment" in delta:
+        encoded["uncomment"] = [ timestamp.isoformat() for timestamp in delta["uncomment"] ]
+    return encoded
+
+def _decode_delta( delta : dict ) -> dict:
+    """
+    Decode the changes of a record (or the registry metadata) as written to the journal.
+    """
+    decoded = dict( delta )
+    if "comments" in delta:
+        decoded["comments"] = { datetime.fromisoformat( timestamp ) : entry for timestamp, entry in delta["comments"].items() }
+    if "uncomment" in delta:
+        decoded["uncomment"] = [ datetime.fromisoformat( timestamp ) for timestamp in delta["uncomment"] ]
+    return decoded
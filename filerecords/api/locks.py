@@ -0,0 +1,135 @@
+"""
+Registries may be changed by many processes at the same time (e.g. parallel jobs commenting their outputs).
+The writers coordinate using advisory `fcntl` locks on the `LOCK` file of a registry, which are only held while writing:
+
+- The *index lock* is held (exclusively) while the registry index and metadata are loaded again,
+  merged with the changes of a writer, and written.
+- The *entry locks* are held while records are loaded again, merged with the changes of a writer, and written.
+  Each record is locked on one of `settings.lock_slots` bytes of the lock file (chosen by a hash of its id),
+  so writers of different records rarely have to wait for each other.
+
+Entry locks are always acquired (in ascending order) before the index lock, so writers cannot deadlock each other.
+Readers never lock, since all files of a registry are written to temporary files which then replace
+the previous files at once (see `utils.atomic_write()`).
+
+.. note::
+
+    This is not intended to be used directly, the registry acquires the locks whenever it writes (see `Registry.save()`).
+
+"""
+
+import contextlib
+import threading
+import fcntl
+import zlib
+import os
+
+import filerecords.api.settings as settings
+
+_files = {}
+"""
+The open lock files by path, together with a lock for the threads of this process.
+POSIX locks belong to the process and are released as soon as any of its descriptors of the file is closed,
+so each lock file is only opened once per process.
+"""
+
+_files_lock = threading.Lock()
+
+
+class RegistryLock:
+    """
+    The write locks of a registry.
+
+    Parameters
+    ----------
+    registry_dir : str
+        The registry directory.
+    """
+    def __init__( self, registry_dir : str ):
+        self.filename = os.path.join( registry_dir, settings.lockfile )
+
+    def index( self ):
+        """
+        Lock the registry index and metadata.
+
+        Returns
+        -------
+        context manager
+            The context within which the lock is held.
+        """
+        return self._locked( [ ( 0, 1 ) ] )
+
+    def entries( self, ids ):
+        """
+        Lock the entries of records.
+
+        Parameters
+        ----------
+        ids : iterable
+            The ids of the records.
+
+        Returns
+        -------
+        context manager
+            The context within which the locks are held.
+        """
+        slots = sorted( { 1 + zlib.crc32( str(id).encode() ) % settings.lock_slots for id in ids } )
+        return self._locked( _ranges( slots ) )
+
+    @contextlib.contextmanager
+    def _locked( self, ranges : list ):
+        """
+        Hold exclusive locks on byte ranges of the lock file.
+        """
+        descriptor, thread_lock = self._open()
+        locked = []
+        with thread_lock:
+            try:
+                for start, length in ranges:
+                    fcntl.lockf( descriptor, fcntl.LOCK_EX, length, start )
+                    locked.append( ( start, length ) )
+                yield
+            finally:
+                for start, length in reversed( locked ):
+                    fcntl.lockf( descriptor, fcntl.LOCK_UN, length, start )
+
+    def _open( self ) -> tuple:
+        """
+        Get the descriptor of the lock file (which is created if it does not exist yet).
+        """
+        with _files_lock:
+            opened = _files.get( self.filename )
+
+            # the registry may have been cleared (and its lock file replaced) since
+            if opened is not None and not _is_same_file( opened[0], self.filename ):
+                if opened[1].acquire( blocking = False ):
+                    os.close( opened[0] )
+                    opened[1].release()
+                    opened = None
+
+            if opened is None:
+                opened = ( os.open( self.filename, os.O_RDWR | os.O_CREAT, 0o666 ), threading.RLock() )
+                _files[ self.filename ] = opened
+            return opened
+
+
+def _ranges( slots : list ) -> list:
+    """
+    Join sorted byte offsets into `( start, length )` ranges, so adjacent bytes are locked at once.
+    """
+    ranges = []
+    for slot in slots:
+        if ranges and ranges[-1][0] + ranges[-1][1] == slot:
+            ranges[-1] = ( ranges[-1][0], ranges[-1][1] + 1 )
+        else:
+            ranges.append( ( slot, 1 ) )
+    return ranges
+
+def _is_same_file( descriptor : int, filename : str ) -> bool:
+    """
+    Check whether a descriptor still refers to the file at a path.
+    """
+    try:
+        return os.path.samestat( os.fstat( descriptor ), os.stat( filename ) )
+    except FileNotFoundError:
+        return False
@@ -0,0 +1,105 @@
+"""
+The `RegistryPool` keeps registries loaded in memory, so that a long-running process
+(such as the `records serve` daemon) does not have to read the registry index and metadata anew for every access.
+
+A pooled registry is only loaded again once its index, metadata, or journal files changed on disk
+(which is checked by their modification time, size, and inode before each access),
+so changes made by other processes are always picked up. The records themselves are always read from the storage backend.
+
+.. note::
+
+    The registries of a pool are shared by everyone getting them from the pool,
+    and should therefore only be read. Changes should be made through separately loaded registries.
+
+"""
+
+import copy
+import os
+
+import filerecords.api.registry as registry
+import filerecords.api.utils as utils
+import filerecords.api.settings as settings
+
+logger = utils.log()
+
+
+class RegistryPool:
+    """
+    A pool of registries kept in memory.
+    """
+    def __init__( self ):
+        self._registries = {}
+
+    def get( self, directory : str = "." ):
+        """
+        Get the registry associated with a directory.
+
+        Just like `Registry( directory )` this finds the closest registry, and initializes a new registry if none is found.
+
+        Parameters
+        ----------
+        directory : str
+            The directory to get the registry for. By default the current working directory is used.
+
+        Returns
+        -------
+        Registry
+            The registry for the directory.
+        """
+        # registries may have been created or removed since the last 
+        # access, so the registries found before are not trusted.
+        utils._registry_cache.clear()
+
+        directory = utils.get_logical_path( directory )
+        registry_dir = utils.find_registry( directory )
+        if registry_dir is None:
+            return registry.Registry( directory )
+
+        signature = self._signature( registry_dir )
+        cached = self._registries.get( registry_dir )
+        if cached is None or cached[0] != signature:
+            logger.debug( f"Loading the registry in {registry_dir}" )
+            cached = ( signature, registry.Registry( os.path.dirname( registry_dir ) ) )
+            self._registries[ registry_dir ] = cached
+
+        # the pooled registry is shared, so only the directory it
+        # is accessed from is set on a (shallow) copy of it.
+        view = copy.copy( cached[1] )
+        view.directory = directory
+        return view
+
+    def load( self, directory : str = "." ) -> bool:
+        """
+        Load the registry associated with a directory into the pool (if there is one).
+
+        Parameters
+        ----------
+        directory : str
+            The directory of the registry.
+
+        Returns
+        -------
+        bool
+            True if a registry was found and loaded.
+        """
+        if utils.find_registry( utils.get_logical_path( directory ) ) is None:
+            return False
+        self.get( directory )
+        return True
+
+    def __len__( self ):
+        return len( self._registries )
+
+    @staticmethod
+    def _signature( registry_dir : str ) -> tuple:
+        """
+        Get the modification times, sizes, and inodes of the index, metadata, and journal files of a registry (of any backend).
+        """
+        signature = []
+        for name in ( settings.indexfile, settings.registry_metafile, settings.sqlite_file, settings.journal_file ):
+            try:
+                info = os.stat( os.path.join( registry_dir, name ) )
+                signature.append( ( info.st_mtime_ns, info.st_size, info.st_ino ) )
+            except FileNotFoundError:
+                signature.append( None )
+        return tuple( signature )
@@ -33,6 +33,15 @@ by calling `reg.init()`.
     reg.init()
 
 
+By default a new registry stores its records as yaml files. Alternatively, the `sqlite` storage backend keeps the entire
+registry in a single database file which is much faster for large registries (see `filerecords.api.backends`).
+
+.. code-block:: python
+
+    # Initialize a new registry using the SQLite backend
+    reg.init( backend = "sqlite" )
+
+
 Accessing the registry
 ----------------------
 
@@ -82,6 +91,13 @@ To access records from the registry the `get_record()` method can be used.
 
 This will return a `FileRecord` object which now allows to access the metadata of the file.
 
+The records of all files within a directory (and optionally its sub-directories) can be listed using the `list_dir()` method.
+
+.. code-block:: python
+
+    # List the records of all files within "results/" and its sub-directories.
+    records = reg.list_dir( "results", recursive = True )
+
 Alternatively, if the precise filename is not known or a number of files shall be found, the `search()` 
 method can be used to find records based on their flags or on regex patterns in their filenames.
 
@@ -94,14 +110,37 @@ method can be used to find records based on their flags or on regex patterns in
     records = reg.search( flag = "important", pattern = ".*\.bam" )
 
 
+Projects may consist of sub-projects with registries of their own. To search all registries nested below a registry at once,
+use a federated search. The nested registries are searched concurrently, and their records are returned after the records of the registry itself.
+The paths of all records relative to the registry are available through the `get_relpath()` method.
+
+.. code-block:: python
+
+    for record in reg.search( flag = "results", federated = True ):
+        print( reg.get_relpath( record ) )
+
+Records can also be found by the words used in their comments using the `search_comments()` method,
+which returns the best matching records first together with their matching comments.
+
+.. code-block:: python
+
+    for record, comments in reg.search_comments( ["rna", "seq*"] ):
+        print( record.relpath, comments )
+
 .. note::
 
-    Search always applies *and* logic to to the pattern and flag. Only a single flag is supported for searching.
-    To include multiple flags in a search, first define a flag group and then search for the group's label flag.
+    Search always applies *and* logic to the pattern, flag, and query. The `flag` argument searches for a single flag
+    (or a flag group using `group:<label>`). To include multiple flags in a search, use a flag `query` instead, which combines
+    flags using `NOT`, `AND`, `OR`, and parentheses (see `filerecords.api.flag_query`).
+
+    For instance, to search for records flagged "important" and "results" that are not flagged "tmp":
+
+    .. code-block:: python
+
+        records = reg.search( query = "important AND results AND NOT tmp" )
 
-    For instance, assume we wish to search for flags "important" and "results" at the same time.
-    We first create a group (see below) containing these flags and then search for the group. Then we need to flag our files of interest
-    with the group. This is not an ideal system yet and may be updated in the future.
+        # parentheses group sub-expressions
+        records = reg.search( query = "a AND ( b OR NOT c )" )
 
 
 Flags and flag groups
@@ -138,6 +177,40 @@ If a file is already recorded, the `update()` method must be used instead.
     reg.update( "results/", comment = "an additional comment about the results", flags = ["perhaps_another_flag"] )
 
 
+Many files can be added or updated at once using the `add_many()` and `update_many()` methods,
+which write all records together instead of saving the registry after each file.
+
+.. code-block:: python
+
+    reg.add_many( ["results/a.tsv", "results/b.tsv"], comment = "the main results", flags = "results" )
+    reg.update_many( ["results/a.tsv", "results/b.tsv"], flags = "important" )
+
+
+Whether the recorded files still exist at their recorded locations, and whether they have changed since they were last commented,
+can be checked using the `screen()` method. The files are checked concurrently which is much faster on network file systems.
+
+.. code-block:: python
+
+    for record, status in reg.screen():
+        print( record.relpath, status )
+
+The content hashes of the recorded files can be recorded using the `fingerprint()` method. This only hashes files 
+that were not hashed yet, or whose stats changed since, so it can be repeated cheaply.
+
+.. code-block:: python
+
+    for record, status in reg.fingerprint():
+        print( record.relpath, status )
+
+Files that were moved without updating the registry can be found again using the `relink()` method, which matches
+the missing records to unrecorded files by their inode, size, modification time, and content hash.
+
+.. code-block:: python
+
+    for record, previous, new in reg.relink():
+        print( f"{previous} -> {new}" )
+
+
 Records (i.e. files or directories) can be `moved` and/or `removed` from the registry. By default these actions also affect the files in the filesystem.
 I.e. a file is by default also deleted if it is removed from the registry - this can be controlled, however.
 
@@ -171,16 +244,94 @@ or in yaml format using the `to_yaml()` method.
     # Export the registry to a yaml file.
     reg.to_yaml( timestamp = True, filename = "registry.yaml" )
 
+
+Both methods assemble the entire export in memory. Large registries should rather be streamed record by record
+to an open file (or `sys.stdout`) using the `write_markdown()` and `write_yaml()` methods.
+
+.. code-block:: python
+
+    with open( "registry.yaml", "w" ) as f:
+        reg.write_yaml( f, timestamp = True )
+
+When a registry is exported repeatedly, the rendered records can be kept in a render cache within the registry directory 
+by passing `cache = True`. Subsequent exports then only render the records that changed since the last export (see `filerecords.api.cache`).
+
+.. code-block:: python
+
+    with open( "registry.md", "w" ) as f:
+        reg.write_markdown( f, cache = True )
+
+
+For further processing by other tools, the records can also be exported to JSON Lines (one record per line) 
+using `write_jsonl()`, or to a self-contained SQLite database using `to_sqlite()`. Both are much faster to read than yaml.
+
+.. code-block:: python
+
+    with open( "registry.jsonl", "w" ) as f:
+        reg.write_jsonl( f )
+
+    reg.to_sqlite( "registry.sqlite" )
+
+
+The registry index can also be obtained as a `pandas.DataFrame` for further analysis using the `to_dataframe()` method
+(this requires `pandas` to be installed, e.g. via `pip install filerecords[pandas]`).
+
+.. code-block:: python
+
+    df = reg.to_dataframe()
+
+
+Transactions
+------------
+
+Every `save()` writes the entire registry index and metadata. When many records are added or edited at once
+the changes should therefore be grouped in a `transaction()`. Within a transaction nothing is written until the
+transaction ends, at which point every changed record is written once, together with the registry index and metadata.
+If an exception is raised within the transaction, the registry is rolled back to its state before the transaction.
+
+.. code-block:: python
+
+    with reg.transaction():
+        for filename in many_filenames:
+            reg.add( filename, comment = "produced by step 3", flags = "step3" )
+
+.. note::
+
+    Only the registry records are rolled back. Files that were moved or removed in the filesystem
+    during a failed transaction are not restored.
+
+
+Concurrent writers
+------------------
+
+A registry may be written by many processes at the same time (e.g. parallel jobs commenting their outputs).
+When saving, the changed records are merged with their stored versions, and the registry index and metadata
+are loaded again and merged with the changes made since the registry was loaded. New comments, flags, and records 
+of all processes are therefore kept. The processes only wait for each other while merging and writing (see `filerecords.api.locks`),
+and every file is written to a temporary file first, so readers never see partially written files.
+
 """
 
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from collections.abc import Iterator
 from datetime import datetime
+import collections
+import contextlib
+import functools
+import itertools
 import shutil
+import re
+import json
+import io
+import copy
 import os
-import subprocess
-import pandas as pd
-
 
 import filerecords.api.base as base
+import filerecords.api.backends as backends
+import filerecords.api.index as index
+import filerecords.api.cache as render_cache
+import filerecords.api.fulltext as fulltext
+import filerecords.api.locks as locks
 import filerecords.api.file_record as file
 import filerecords.api.utils as utils
 import filerecords.api.settings as settings
@@ -203,14 +354,21 @@ class Registry(base.BaseRecord):
     directory : str
         The directory to load the registry from. 
         By default the current working directory is used. 
+    backend : str
+        The storage backend to use if a new registry has to be initialized (`yaml` or `sqlite`).
+        By default `settings.backend` is used. Existing registries always use their own backend.
     """
-    def __init__(self, directory : str = "." ):
+    def __init__(self, directory : str = ".", backend : str = None ):
         super().__init__()
 
-        # self.directory = os.path.abspath( directory ) 
-        self.directory = subprocess.check_output( f"cd {directory} ; pwd", shell = True ).decode().strip()
+        # the symbolic links in the path are kept (just like the shell's pwd does)
+        self.directory = utils.get_logical_path( directory )
         
         self.index = None
+        self.backend = None
+        self._backend = backend
+
+        self._transaction = None
 
         self._initialized = False
         self._find_registry()
@@ -218,7 +376,7 @@ class Registry(base.BaseRecord):
         if not self._initialized:
             self._load_registry()
 
-    def init( self, permissions : (int or str) = None ):
+    def init( self, permissions : (int or str) = None, backend : str = None ):
         """
         Initialize a new registry in the given directory.
 
@@ -227,9 +385,12 @@ class Registry(base.BaseRecord):
         permissions : int or str
             The permissions to use for the registry directory. 
             By default the permissions of the parent directory are used.
+        backend : str
+            The storage backend to use for the registry (`yaml` or `sqlite`).
+            By default `settings.backend` is used.
         """
         self._initialized = True
-        utils.make_new_registry( self.directory, perms = permissions )
+        utils.make_new_registry( self.directory, perms = permissions, backend = backend if backend else self._backend )
 
         self.registry_dir = os.path.join( self.directory, settings.registry_dir ) 
         self._load_registry()
@@ -237,9 +398,49 @@ class Registry(base.BaseRecord):
     def save( self ):
         """
         Save the registry state and updated metadata.
+        Changes other processes saved in the meantime are merged rather than overwritten.
+
+        Note
+        ----
+        Within a `transaction()` the registry is only saved once the transaction ends.
         """
-        self.index.to_csv( self.indexfile, index = False, sep = "\t" )
-        super().save()
+        if self._transaction is not None:
+            self._transaction.dirty = True
+            return
+        self._write()
+
+    @contextlib.contextmanager
+    def transaction( self ):
+        """
+        Group multiple changes to the registry so they are written together.
+
+        Within the transaction saving records or the registry itself only marks them as changed.
+        When the transaction ends each changed record is written once, followed by the registry index and metadata.
+        If an exception occurs within the transaction, or while its changes are written, the registry is rolled back 
+        (none of the changes are stored, see `Backend.batch()`) and the exception is re-raised.
+        Transactions can be nested, in which case the inner transactions are simply part of the outermost one.
+
+        Yields
+        ------
+        Registry
+            The registry itself.
+        """
+        if self._transaction is not None:
+            yield self
+            return
+
+        self._transaction = _Transaction( self )
+        try:
+            yield self
+        except BaseException:
+            self._rollback()
+            raise
+
+        try:
+            self._commit()
+        except BaseException:
+            self._rollback()
+            raise
 
     
     def get_record( self, filename : str ):
@@ -253,8 +454,8 @@ class Registry(base.BaseRecord):
 
         Returns
         -------
-        FileRecord or list
-            The record of the file or a list of records.
+        FileRecord or None
+            The record of the file or None if the file is not recorded.
         """
         logger.debug( f"directory={self.directory}")
         logger.debug( f"registry_dir={self.registry_dir}")
@@ -263,19 +464,15 @@ class Registry(base.BaseRecord):
         match = os.path.relpath( filename, self.registry_dir )
         logger.debug( f"match={match}" )
 
-        match = self.index.relpath == match 
-        logger.debug( f"match={match}" )
-
-        if match.any():
+        id = self.index.get_id( match )
+        if id is None:
+            return None
 
-            if match.sum() > 1:
-                logger.warning( f"More than one record found for {filename}." )
-                return [ file.FileRecord( registry = self, id = i ) for i in self.index.loc[match, "id"].values ] 
-            
-            id = self.index.loc[match, "id"].values[0]
-            return file.FileRecord( registry = self, id = id )
+        # within a transaction the same record may be edited multiple times
+        if self._transaction is not None and id in self._transaction.records:
+            return self._transaction.records[id]
 
-        return None
+        return file.FileRecord( registry = self, id = id )
 
     def add_group( self, label : str, flags : list ):
         """
@@ -332,13 +529,96 @@ class Registry(base.BaseRecord):
         if flags:
             record.add_flags( flags )
         
-        index_entry = pd.DataFrame( { "id" : [new_id], "filename" : [os.path.basename(record.relpath)], "relpath" : [record.relpath] } )
-        self.index = pd.concat( [self.index, index_entry], ignore_index = True )
+        self.index.add( new_id, record.relpath, record.flags )
 
         record.save()
         # logger.info( f"Added {filename} to the registry." )
 
 
+    def add_many( self, filenames : list, comment : str = None, flags : list = None ) -> list:
+        """
+        Add multiple new files to the registry at once.
+
+        All files receive the same comment and flags. The files are checked before anything is added,
+        and the records are written together (see `transaction()`).
+
+        Parameters
+        ----------
+        filenames : list
+            The filenames of the files to add.
+        comment : str
+            The comment to add to the files.
+        flags : list
+            Any flags to add. This can also be a defined flag-group label.
+
+        Returns
+        -------
+        list
+            The FileRecords of the new files.
+        """
+        if not comment and not flags:
+            raise ValueError( "No flags or comment given. At least one must be given." )
+
+        filenames = list( dict.fromkeys( filenames ) )
+        missing = [ i for i in filenames if not os.path.exists( i ) ]
+        if missing:
+            raise FileNotFoundError( f"Files {', '.join( missing )} do not exist. Can only comment existing files..." )
+
+        with self.transaction():
+
+            records = [ file.FileRecord( registry = self, filename = i ) for i in filenames ]
+            for record in records:
+                if comment:
+                    record.add_comment( comment )
+                if flags:
+                    record.add_flags( flags )
+
+            self.index.extend( [ i.id for i in records ], [ i.relpath for i in records ], [ i.flags for i in records ] )
+
+            for record in records:
+                record.save()
+
+        return records
+
+    def update_many( self, filenames : list, comment : str = None, flags : (str or list) = None ) -> list:
+        """
+        Update multiple existing file records at once. 
+
+        All records receive the same comment and flags and are written together (see `transaction()`).
+
+        Parameters
+        ----------
+        filenames : list
+            The filenames of the files to update.
+        comment : str
+            The new comment to add to the files.
+        flags : str or list
+            The new flags to add to the files.
+
+        Returns
+        -------
+        list
+            The updated FileRecords.
+        """
+        records = []
+        with self.transaction():
+            for filename in dict.fromkeys( filenames ):
+
+                record = self.get_record( filename )
+                if record is None:
+                    logger.warning( f"No record found for {filename}." )
+                    continue
+
+                if comment:
+                    record.add_comment( comment )
+                if flags:
+                    record.add_flags( flags )
+
+                record.save()
+                records.append( record )
+
+        return records
+
     def update( self, filename : str, comment : str = None, flags : (str or list) = None ):
         """
         Update an existing file record.
@@ -358,9 +638,6 @@ class Registry(base.BaseRecord):
             logger.warning( f"No record found for {filename}." )
             return
 
-        elif isinstance( record, list ):
-            logger.warning( f"More than one record found for {filename}, can only edit one record at a time." )
-            return
 
         if comment:
             record.add_comment( comment )
@@ -370,44 +647,347 @@ class Registry(base.BaseRecord):
         record.save()
         # logger.info( f"Updated {filename} in the registry." )
 
-    def search( self, pattern: str = None, flag : str = None ):
+    def search( self, pattern: str = None, flag : str = None, preload : bool = False, query : str = None, federated : bool = False ):
         """
-        Search for records in the registry either through a filename pattern or by a flag.
+        Search for records in the registry either through a filename pattern, by a flag, or by a flag query.
 
         Parameters
         ----------
         pattern : str
             The filename pattern to search for.
         flag : str
-            The flag to search for. Note, this can only be a single flag!
-            To search for multiple flags, first define a flag-group and then search
-            for the group label using `group:yourgroup`. 
+            The flag to search for (or `group:<label>` to search for a flag group).
+            To search for multiple flags use a `query` instead.
+        preload : bool
+            If True, the metadata of all found records is loaded right away.
+        query : str
+            A flag query such as `results AND NOT tmp OR group:final` (see `filerecords.api.flag_query`).
+        federated : bool
+            If True, all registries nested below this one are searched as well (see `nested_registries()`).
+            The records of nested registries belong to their own registry, use `get_relpath()` to get their paths relative to this one.
         
         Returns
         -------
         list
             A list of FileRecord objects of record entries matching the search criteria.
+            The records of this registry come first, followed by those of the nested registries.
+        """
+        if not pattern and not flag and not query:
+            logger.warning( "No search criteria specified, returning all records." )
+
+        if federated:
+            found = self._federate( lambda registry: registry._get_records( registry._search_ids( pattern, flag, query ), preload = preload ) )
+            records = list( itertools.chain.from_iterable( found ) )
+        else:
+            records = self._get_records( self._search_ids( pattern, flag, query ), preload = preload )
+
+        if pattern and len( records ) == 0:
+            logger.warning( f"No records found for pattern {pattern}." )
+
+        return records
+
+    def nested_registries( self ) -> list:
+        """
+        Find all registries nested below this one, i.e. within the sub-directories of its base directory.
+
+        Returns
+        -------
+        list
+            The base directories of the nested registries (in alphabetical order).
         """
-        records = None
+        return [ os.path.dirname( i ) for i in utils.find_nested_registries( os.path.dirname( self.registry_dir ) ) ]
+
+    def get_relpath( self, record ) -> str:
+        """
+        Get the relpath of a record relative to this registry. 
+        Unlike `FileRecord.relpath` this also works for the records of nested registries (e.g. from a federated `search()`).
+
+        Parameters
+        ----------
+        record : FileRecord
+            The record of this or a nested registry.
+
+        Returns
+        -------
+        str
+            The relpath in the same form as `FileRecord.relpath` (i.e. relative to the registry directory).
+        """
+        # the [3:] is to remove the ../ in front of every relpath
+        return os.path.join( "..", self._rebase( record.registry, record.relpath[3:] ) )
+
+    def list_dir( self, path : str = ".", recursive : bool = False, pattern : str = None, flag : str = None, preload : bool = False, query : str = None ) -> list:
+        """
+        List the records of the files within a directory.
+
+        The records are found using the directory map of the registry index, 
+        so no records outside of the directory are loaded.
+
+        Parameters
+        ----------
+        path : str
+            The directory to list. By default the current directory is listed.
+        recursive : bool
+            If True, the records of files within all sub-directories are listed as well.
+        pattern : str
+            Only list records whose filenames match this regular expression.
+        flag : str
+            Only list records carrying this flag.
+        preload : bool
+            If True, the metadata of all listed records is loaded right away.
+        query : str
+            Only list records matching this flag query (see `search()`).
+
+        Returns
+        -------
+        list
+            A list of FileRecord objects of the records within the directory.
+        """
+        directory = os.path.relpath( os.path.join( self.directory, path ), self.registry_dir )
+        ids = self.index.find_dir( directory, recursive = recursive )
 
         if pattern:
-            records = self.index["filename"].str.contains( pattern, regex = True )
-            if records.sum() == 0:
-                logger.warning( f"No records found for pattern {pattern}." )
-            else:
-                records = self.index.loc[records, "id"].values
-                records = [ file.FileRecord( self, id = id ) for id in records ]
-        
+            pattern = re.compile( pattern )
+            ids = [ i for i in ids if pattern.search( self.index.get_filename( i ) ) ]
+
         if flag:
-            if not records:
-                records = [ file.FileRecord( self, id = id ) for id in self.index.id ]
-            records = [ i for i in records if flag in i.flags ]
-        
-        if not pattern and not flag:
-            logger.warning( "No search criteria specified, returning all records." )
-            records = [ file.FileRecord( self, id = id ) for id in self.index.id ]
+            flagged = set( self.index.find_flag( flag ) )
+            ids = [ i for i in ids if i in flagged ]
 
-        return records
+        if query:
+            matching = set( self.index.find_query( query ) )
+            ids = [ i for i in ids if i in matching ]
+
+        return self._get_records( ids, preload = preload )
+
+    def search_comments( self, terms : (str or list), limit : int = None ) -> list:
+        """
+        Search for records whose comments contain all of the given terms.
+
+        The search uses a full-text index of the comments which is built when the comments are first searched,
+        and is kept up to date whenever records are saved from then on.
+
+        Parameters
+        ----------
+        terms : str or list
+            The term(s) to search for. Terms ending with a `*` match all words starting with them (e.g. `seq*`).
+        limit : int
+            The maximal number of records to return. By default all matching records are returned.
+
+        Returns
+        -------
+        list
+            The `( record, comments )` of all matching records as FileRecord objects together with their matching comments 
+            (with timestamps as keys, user and comment as values). The best matching records come first.
+        """
+        if not isinstance( terms, list ):
+            terms = [ terms ]
+
+        if fulltext.CommentIndex.exists( self.registry_dir ):
+            comments = fulltext.CommentIndex( self.registry_dir )
+        else:
+            logger.info( "Indexing the comments of all records..." )
+            comments = fulltext.CommentIndex.build( self.registry_dir, self._iter_entries( self.index.ids ) )
+
+        with comments:
+            matches = [ ( id, matched ) for id, matched in comments.search( terms, limit ) if id in self.index ]
+
+        records = self._get_records( [ id for id, matched in matches ] )
+        return [ ( record, matched ) for record, ( id, matched ) in zip( records, matches ) ]
+
+    def screen( self, pattern : str = None, flag : str = None, jobs : int = None, query : str = None, federated : bool = False ):
+        """
+        Screen the recorded files at their recorded locations. 
+
+        The files are checked concurrently, and the records with missing or changed files 
+        are yielded as soon as they are checked (in the order of the registry).
+
+        Parameters
+        ----------
+        pattern : str
+            The filename pattern of the records to screen.
+        flag : str
+            The flag of the records to screen.
+        jobs : int
+            The number of files to check at the same time. 
+            By default `settings.screen_jobs` is used.
+        query : str
+            The flag query of the records to screen (see `search()`).
+        federated : bool
+            Also screen the records of all registries nested below this one (see `search()`).
+
+        Yields
+        ------
+        tuple
+            The FileRecord and its status (`"missing"` or `"changed"`, see `FileRecord.check()`).
+        """
+        # the metadata is loaded beforehand since the
+        # backends should only be accessed from this thread.
+        records = self.search( pattern = pattern, flag = flag, preload = True, query = query, federated = federated )
+
+        with ThreadPoolExecutor( max_workers = jobs if jobs else settings.screen_jobs ) as executor:
+            for record, status in zip( records, executor.map( file.FileRecord.check, records ) ):
+                if status is not None:
+                    yield record, status
+
+    def fingerprint( self, pattern : str = None, flag : str = None, jobs : int = None, force : bool = False, query : str = None ) -> list:
+        """
+        Record the content hashes of the recorded files.
+
+        This is done incrementally: only files without a hash, or whose size, modification time, or inode
+        changed since they were last hashed are hashed again. The files are hashed in parallel processes.
+
+        Parameters
+        ----------
+        pattern : str
+            The filename pattern of the records to fingerprint.
+        flag : str
+            The flag of the records to fingerprint.
+        jobs : int
+            The number of processes to hash files with. By default `settings.hash_jobs` is used.
+        force : bool
+            If True, all files are hashed again regardless of their stats.
+        query : str
+            The flag query of the records to fingerprint (see `search()`).
+
+        Returns
+        -------
+        list
+            The FileRecords that were hashed or whose file is missing (in the order of the registry), 
+            each together with its status: `"new"` if the file had no hash before, `"changed"` or `"unchanged"` 
+            depending on whether the contents changed, or `"missing"` if the file does not exist.
+        """
+        records = self.search( pattern = pattern, flag = flag, preload = True, query = query )
+
+        with ThreadPoolExecutor( max_workers = settings.screen_jobs ) as executor:
+            stats = list( executor.map( file.FileRecord._get_stat, records ) )
+
+        statuses = [ None ] * len( records )
+        pending = []
+        for i, ( record, current ) in enumerate( zip( records, stats ) ):
+            if current is None:
+                # directories are not hashed
+                if not os.path.exists( record.path ):
+                    statuses[i] = "missing"
+                continue
+            if force or "hash" not in record.metadata or record.metadata.get( "stat" ) != current:
+                pending.append( i )
+
+        paths = [ records[i].path for i in pending ]
+        if len( paths ) < 2 or jobs == 1:
+            hashes = [ utils.hash_file( i ) for i in paths ]
+        else:
+            with ProcessPoolExecutor( max_workers = jobs if jobs else settings.hash_jobs ) as executor:
+                hashes = list( executor.map( utils.hash_file, paths ) )
+
+        with self.transaction():
+            for i, digest in zip( pending, hashes ):
+                record = records[i]
+                previous = record.metadata.get( "hash" )
+                if previous is None:
+                    statuses[i] = "new"
+                else:
+                    statuses[i] = "unchanged" if previous == digest else "changed"
+
+                record.metadata["stat"] = stats[i]
+                record.metadata["hash"] = digest
+                record.save()
+
+        return [ ( record, status ) for record, status in zip( records, statuses ) if status is not None ]
+
+    def relink( self, dry_run : bool = False ) -> list:
+        """
+        Find the new locations of recorded files that were moved without updating the registry.
+
+        All records whose file is missing are matched against the unrecorded files within the project 
+        (the directory containing the registry) in a single pass over the directory tree. A file matches a record
+        if it has the recorded inode and size, or the recorded size and content hash (see `fingerprint()`), 
+        or, for records without a hash, the recorded size and modification time. 
+        The records are then moved to the new locations all at once.
+
+        Parameters
+        ----------
+        dry_run : bool
+            If True, the matches are only returned but the records are not moved.
+
+        Returns
+        -------
+        list
+            The relinked FileRecords each together with its previous and its new relpath.
+        """
+        missing = [ record for record, status in self.screen() if status == "missing" ]
+        if not missing:
+            return []
+
+        # the lookup tables for the missing records
+        by_inode, by_hash, by_mtime = {}, {}, {}
+        for record in missing:
+            recorded = record.metadata.get( "stat" )
+            if not recorded:
+                continue
+            if recorded.get( "inode" ) is not None:
+                by_inode.setdefault( ( recorded["inode"], recorded["size"] ), [] ).append( record )
+            if record.metadata.get( "hash" ):
+                by_hash.setdefault( recorded["size"], [] ).append( record )
+            else:
+                by_mtime.setdefault( ( recorded["size"], recorded["mtime"] ), [] ).append( record )
+
+        sizes = set( by_hash )
+        matches = {}
+        for path in utils.walk_files( os.path.dirname( self.registry_dir ) ):
+
+            relpath = os.path.relpath( path, self.registry_dir )
+            if self.index.get_id( relpath ) is not None:
+                continue
+            try:
+                info = os.stat( path )
+            except OSError:
+                continue
+
+            candidates = by_inode.get( ( info.st_ino, info.st_size ), [] ) + by_mtime.get( ( info.st_size, info.st_mtime ), [] )
+            if info.st_size in sizes:
+                # the file is only hashed if a record of the same size has a hash
+                digest = utils.hash_file( path )
+                candidates += [ i for i in by_hash[ info.st_size ] if i.metadata["hash"] == digest ]
+
+            for record in candidates:
+                if record.id not in matches:
+                    matches[ record.id ] = ( record, relpath )
+                    break
+
+            if len( matches ) == len( missing ):
+                break
+
+        relinked = []
+        with self.transaction():
+            for record, relpath in matches.values():
+                relinked.append( ( record, record.relpath, relpath ) )
+                if not dry_run:
+                    self.index.move( record.id, relpath )
+                    record.relpath = relpath
+                    record.filename = os.path.basename( relpath )
+            if not dry_run:
+                self.save()
+
+        return relinked
+
+    def compact( self ) -> bool:
+        """
+        Fold the journal of the registry into its index, metadata, and record files 
+        (only for registries using the `journal` storage backend).
+        This also happens automatically once the journal grew larger than `settings.journal_size`.
+
+        Returns
+        -------
+        bool
+            True if there was anything to compact.
+        """
+        with self._locks.index():
+            # compacting does not change the contents of the registry, so it does not have to be loaded again
+            unchanged = self._index_signature() == self._signature
+            compacted = self.backend.compact()
+            if unchanged:
+                self._signature = self._index_signature()
+        return compacted
 
     def move( self, current : str, new : str, keep_file : bool = False ):
         """
@@ -429,20 +1009,17 @@ class Registry(base.BaseRecord):
             logger.warning( f"No record found for {current}." )
             return
 
-        elif isinstance( record, list ):
-            logger.warning( f"More than one record found for {current}, can only edit one record at a time." )
-            return
 
-        # Note: the {}_path are relative to the registry dir and therefore
+        # Note: the new_path is relative to the registry dir and therefore
         # registry internal, while the actual current and new are relative to the users
         # current working directory and must not be altered for file moving...
 
-        current_path = os.path.relpath( current, self.registry_dir )
-        new_path = os.path.relpath( new, self.registry_dir )
-        mask = self.index.relpath == current_path
-        
-        self.index.loc[ mask, "relpath" ] = new_path
-        self.index.loc[ mask, "filename" ] = os.path.basename( new )
+        new_path = os.path.relpath( os.path.join( self.directory, new ), self.registry_dir )
+        if self.index.get_id( new_path ) not in ( None, record.id ):
+            logger.warning( f"{new} is already recorded in the registry. Cannot move {current} there." )
+            return
+
+        self.index.move( record.id, new_path )
 
         if not keep_file:
             os.rename( current, new )
@@ -473,17 +1050,46 @@ class Registry(base.BaseRecord):
             else:
                 logger.warning( f"{filename} is not a file or directory. Cannot remove." )
 
-        os.remove( record.metafile )
-        self.index = self.index[ self.index.id != record.id ]
-        
-        self.save()
+        self.index.remove( record.id )
+        if self._transaction is not None:
+            self._transaction.remove( record.id )
+            self.save()
+        else:
+            self._write( removed = [ record.id ] )
         # logger.info( f"Removed {filename} from the registry." )
 
 
-    def to_yaml( self, include_records : bool = True, timestamp : bool = False, filename : str = None ):
+    def to_dataframe( self ):
+        """
+        Get the registry index as a pandas DataFrame.
+
+        Note
+        ----
+        This requires `pandas` to be installed, which is otherwise not needed by `filerecords`.
+
+        Returns
+        -------
+        pandas.DataFrame
+            The registry index with columns `id`, `filename`, `relpath` and `flags`, indexed by the record ids.
+        """
+        try:
+            import pandas as pd
+        except ImportError as e:
+            raise ImportError( "Registry.to_dataframe() requires pandas, which can be installed via `pip install filerecords[pandas]`." ) from e
+
+        df = pd.DataFrame( dict( zip( self.index.columns, ( self.index.ids, self.index.filenames, self.index.relpaths, self.index.flags ) ) ) )
+        df.index = df["id"].values
+        return df
+
+    def to_yaml( self, include_records : bool = True, timestamp : bool = False, filename : str = None, jobs : int = None, query : str = None, federated : bool = False ):
         """
         Convert the source registry to a single YAML file.
 
+        Note
+        ----
+        This assembles the entire registry in memory. Use `write_yaml()` to
+        stream large registries to a file instead.
+
         Parameters
         ----------
         include_records : bool
@@ -493,32 +1099,145 @@ class Registry(base.BaseRecord):
         filename : str (optional)
             The filename of the yaml file to create.
             If none is provided, no file is created.
+        jobs : int
+            The number of processes to load the records with. 
+            By default the records are loaded in this process.
+        query : str
+            Only export the records matching this flag query (see `search()`).
+        federated : bool
+            Also export the records of all registries nested below this one (see `search()`), with their paths relative to this registry.
 
         Returns
         -------
         dict
             The assembled dictionary of the registry.
         """
-
-        _dict = dict( self.metadata )
-        _dict["directory"] = self.directory
-        if timestamp:
-            _dict["timestamp"] = datetime.now().strftime( "%Y-%m-%d %H:%M:%S" )
-
-        if include_records:
-            records = [ file.FileRecord( self, id = id ) for id in self.index.id ]
-            records = { record.relpath[3:] : record.to_yaml() for record in records }
-            _dict[ "records" ] = records
+        _dict = { key : dict( value ) if isinstance( value, Iterator ) else value for key, value in self._yaml_items( include_records, timestamp, jobs, self._export_selection( query, federated ) ) }
 
         if filename is not None:
             utils.save_yamlfile( filename, _dict )
 
         return _dict
 
-    def to_markdown( self, include_records : bool = True, timestamp : bool = False, filename : str = None ):
+    def write_yaml( self, stream, include_records : bool = True, timestamp : bool = False, jobs : int = None, cache : bool = False, query : str = None, federated : bool = False ):
+        """
+        Write the registry to a YAML stream record by record.
+        Only a few records are kept in memory at a time. 
+
+        Parameters
+        ----------
+        stream : file-like
+            The stream (e.g. an open file or `sys.stdout`) to write to.
+        include_records : bool
+            Include the records in the yaml.
+        timestamp : bool
+            Add a timestamp in the yaml.
+        jobs : int
+            The number of processes to load and render the records with. 
+            By default the records are rendered in this process. The output is the same either way.
+        cache : bool
+            Use the render cache of the registry, so only records that changed since the last export are rendered.
+        query : str
+            Only export the records matching this flag query (see `search()`).
+        federated : bool
+            Also export the records of all registries nested below this one (see `search()`), with their paths relative to this registry.
+        """
+        selection = self._export_selection( query, federated )
+        parallel = jobs and jobs > 1
+        if not include_records or not ( parallel or cache ) or all( len( ids ) == 0 for registry, ids in selection ):
+            utils.stream_yaml( stream, self._yaml_items( include_records, timestamp, jobs, selection ) )
+            return
+
+        # the records are rendered to yaml text separately (in parallel or from the cache) 
+        # and are written in between the other (sorted) top-level entries.
+        items = list( self._yaml_items( include_records = False, timestamp = timestamp ) )
+        utils.stream_yaml( stream, [ i for i in items if i[0] < "records" ] )
+        stream.write( "records:\n" )
+        for registry, ids in selection:
+            if len( ids ) > 0:
+                stream.writelines( registry._iter_fragments( registry._yaml_ids( ids ), "yaml", jobs, cache, self._rebase( registry, "" ) ) )
+        tail = [ i for i in items if i[0] > "records" ]
+        if tail:
+            utils.stream_yaml( stream, tail )
+
+    def write_jsonl( self, stream, jobs : int = None, query : str = None, federated : bool = False ):
+        """
+        Write the records to a JSON Lines stream, one record per line.
+
+        Each line holds the same contents as the record's entry of the yaml representation 
+        (sorted by relpath), except that the comments are a list sorted by their `timestamp`.
+
+        Parameters
+        ----------
+        stream : file-like
+            The stream (e.g. an open file or `sys.stdout`) to write to.
+        jobs : int
+            The number of processes to load the records with. 
+            By default the records are loaded in this process.
+        query : str
+            Only export the records matching this flag query (see `search()`).
+        federated : bool
+            Also export the records of all registries nested below this one (see `search()`), with their paths relative to this registry.
+        """
+        for relpath, entry in self._iter_selected_yaml_records( self._export_selection( query, federated ), jobs ):
+            entry["comments"] = [ { "timestamp" : timestamp.isoformat(), **comment } for timestamp, comment in sorted( entry["comments"].items() ) ]
+            stream.write( json.dumps( entry, sort_keys = True ) + "\n" )
+
+    def to_sqlite( self, filename : str, timestamp : bool = False, jobs : int = None, query : str = None, federated : bool = False ):
+        """
+        Export the registry to a self-contained SQLite database file.
+
+        The database has the same `records`, `comments`, `flags`, and `groups` tables as registries using 
+        the `sqlite` backend (see `filerecords.api.backends`), the registry's own comments and flags are stored 
+        under the empty record id. The relpaths are relative to the registry's base directory. 
+
+        Parameters
+        ----------
+        filename : str
+            The database file to create. An existing file is replaced.
+        timestamp : bool
+            Add a timestamp (to the `registry` table).
+        jobs : int
+            The number of processes to load the records with. 
+            By default the records are loaded in this process.
+        query : str
+            Only export the records matching this flag query (see `search()`).
+        federated : bool
+            Also export the records of all registries nested below this one (see `search()`), with their paths relative to this registry.
+        """
+        if os.path.exists( filename ):
+            os.remove( filename )
+
+        # the [3:] is to remove the ../ in front of every relpath
+        selection = self._export_selection( query, federated )
+        rows = [ ( registry, registry.index.row( id ) ) for registry, ids in selection for id in ids ]
+        exported = index.Index( [ i["id"] for registry, i in rows ], [ i["filename"] for registry, i in rows ], [ self._rebase( registry, i["relpath"][3:] ) for registry, i in rows ], 
+                                [ i["flags"] for registry, i in rows ], [ i["latest"] for registry, i in rows ] )
+        
+        database = backends.SQLiteBackend( self.registry_dir, dbfile = filename )
+        try:
+            with database.batch():
+                database.save_index( exported )
+                database.save_metadata( self.metadata )
+                database.connection.execute( "INSERT OR REPLACE INTO registry VALUES ( 'directory', ? )", ( self.directory, ) )
+                if timestamp:
+                    database.connection.execute( "INSERT OR REPLACE INTO registry VALUES ( 'timestamp', ? )", ( datetime.now().strftime( "%Y-%m-%d %H:%M:%S" ), ) )
+
+                for registry, ids in selection:
+                    for id, metadata in registry._iter_entries( ids, jobs ):
+                        database.save_entry( id, metadata )
+        finally:
+            database.connection.close()
+
+    def to_markdown( self, include_records : bool = True, timestamp : bool = False, filename : str = None, jobs : int = None, query : str = None, federated : bool = False ):
         """
         Convert the metadata to a markdown representation.
 
+        Note
+        ----
+        This assembles the entire markdown in memory. Use `write_markdown()` to
+        stream large registries to a file instead.
+
         Parameters
         ----------
         include_records : bool
@@ -528,50 +1247,111 @@ class Registry(base.BaseRecord):
         filename : str (optional)
             The filename of the markdown file to create.
             If none is provided, no file is created.
+        jobs : int
+            The number of processes to load and render the records with. 
+            By default the records are rendered in this process.
+        query : str
+            Only export the records matching this flag query (see `search()`).
+        federated : bool
+            Also export the records of all registries nested below this one (see `search()`), with their paths relative to this registry.
 
         Returns
         -------
         str
             The markdown representation of the registry.
         """
+        text = "".join( self.iter_markdown( include_records, timestamp, jobs, query = query, federated = federated ) )
+
+        if filename is not None:
+            with open( filename, "w" ) as f:
+                f.write( text )
+
+        return text
+
+    def write_markdown( self, stream, include_records : bool = True, timestamp : bool = False, jobs : int = None, cache : bool = False, query : str = None, federated : bool = False ):
+        """
+        Write the markdown representation of the registry to a stream record by record.
+        Only a few records are kept in memory at a time. 
+
+        Parameters
+        ----------
+        stream : file-like
+            The stream (e.g. an open file or `sys.stdout`) to write to.
+        include_records : bool
+            Include the records in the markdown.
+        timestamp : bool
+            Add a timestamp in the markdown.
+        jobs : int
+            The number of processes to load and render the records with. 
+            By default the records are rendered in this process.
+        cache : bool
+            Use the render cache of the registry, so only records that changed since the last export are rendered.
+        query : str
+            Only export the records matching this flag query (see `search()`).
+        federated : bool
+            Also export the records of all registries nested below this one (see `search()`), with their paths relative to this registry.
+        """
+        stream.writelines( self.iter_markdown( include_records, timestamp, jobs, cache, query, federated ) )
+
+    def iter_markdown( self, include_records : bool = True, timestamp : bool = False, jobs : int = None, cache : bool = False, query : str = None, federated : bool = False ):
+        """
+        Generate the markdown representation of the registry piece by piece.
+
+        Parameters
+        ----------
+        include_records : bool
+            Include the records in the markdown.
+        timestamp : bool
+            Add a timestamp in the markdown.
+        jobs : int
+            The number of processes to load and render the records with. 
+            By default the records are rendered in this process. The output is the same either way.
+        cache : bool
+            Use the render cache of the registry, so only records that changed since the last export are rendered.
+        query : str
+            Only export the records matching this flag query (see `search()`).
+        federated : bool
+            Also export the records of all registries nested below this one (see `search()`), with their paths relative to this registry.
+
+        Yields
+        ------
+        str
+            The consecutive pieces of the markdown text.
+        """
         # add basic information and timestamp of manifest creation
-        text = f"# {self.directory}\n\n"
+        yield f"# {self.directory}\n\n"
         if timestamp: 
-            text += f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+            yield f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
         
         # add registry's own comments
-        text += "## Registry comments\n\n"
+        yield "## Registry comments\n\n"
         for timestamp in self.comments:
             comment, user = list( self.comments[timestamp].values() )
-            text += f"{settings.comment_format( comment, user, timestamp)}\n\n"
+            yield f"{settings.comment_format( comment, user, timestamp)}\n\n"
 
         # add all flags and flag groups
-        text += "## Registered flags\n\n"
+        yield "## Registered flags\n\n"
         for i in sorted( self.flags ):
-            text += f"- {i}\n"
-        text += "\n"
+            yield f"- {i}\n"
+        yield "\n"
 
-        text += "### Flag groups\n\n"
-        text += "| Group | Flags |\n"
-        text += "|------|------|\n"
+        yield "### Flag groups\n\n"
+        yield "| Group | Flags |\n"
+        yield "|------|------|\n"
         for label, flags in self.groups.items():
-            text += f"| {label} | {', '.join(flags)} |\n"
+            yield f"| {label} | {', '.join(flags)} |\n"
 
         if include_records:
-            text += "\n"
-            text += "## Records\n\n"
-            if len( self.index.id ) == 0:
-                text += "No records found."
-            else:
-                for record in self.index.id:
-                    record = file.FileRecord( self, id = record )
-                    text += record.to_markdown( comments_header = False )
-
-        if filename is not None:
-            with open( filename, "w" ) as f:
-                f.write( text )
+            selection = self._export_selection( query, federated )
+            yield "\n"
+            yield "## Records\n\n"
+            if all( len( ids ) == 0 for registry, ids in selection ):
+                yield "No records found."
 
-        return text
+            for registry, ids in selection:
+                if len( ids ) == 0:
+                    continue
+                yield from registry._iter_fragments( ids, "md", jobs, cache, self._rebase( registry, "" ) )
 
     def base_has_registry( self ):
         """
@@ -587,6 +1367,516 @@ class Registry(base.BaseRecord):
         """
         return self.metadata["groups"]
 
+    def _yaml_items( self, include_records : bool = True, timestamp : bool = False, jobs : int = None, selection : list = None ):
+        """
+        Generate the top-level `( key, value )` pairs of the yaml representation of the registry (in sorted order).
+        The records (all or the given `( registry, ids )` selection) are generated lazily as a nested iterator of pairs (loaded in `jobs` processes if given).
+        """
+        _dict = dict( self.metadata )
+        _dict["directory"] = self.directory
+        if timestamp:
+            _dict["timestamp"] = datetime.now().strftime( "%Y-%m-%d %H:%M:%S" )
+
+        if include_records:
+            _dict["records"] = self._iter_selected_yaml_records( selection if selection is not None else [ ( self, None ) ], jobs )
+
+        for key in sorted( _dict ):
+            yield key, _dict[key]
+
+    def _iter_yaml_records( self, jobs : int = None, ids : list = None ):
+        """
+        Iterate over the `( relpath, dict )` pairs of the records (all or the given `ids`) in the yaml representation 
+        (loaded in `jobs` processes if given).
+        """
+        # the [3:] is to remove the ../ in front of every relpath
+        if jobs and jobs > 1:
+            return itertools.chain.from_iterable( self._render( self._yaml_ids( ids ), _load_yaml, jobs ) )
+        return ( ( record.relpath[3:], record.to_yaml() ) for record in self._iter_records( self._yaml_ids( ids ) ) )
+
+    def _iter_selected_yaml_records( self, selection : list, jobs : int = None ):
+        """
+        Iterate over the `( relpath, dict )` pairs of the records of a `( registry, ids )` selection of this and nested registries,
+        with the relpaths of nested records relative to this registry.
+        """
+        for registry, ids in selection:
+            for relpath, entry in registry._iter_yaml_records( jobs, ids ):
+                if registry is not self:
+                    relpath = entry["relpath"] = self._rebase( registry, relpath )
+                yield relpath, entry
+
+    def _iter_entries( self, ids : list, jobs : int = None ):
+        """
+        Iterate over the `( id, metadata )` pairs of records (loaded in `jobs` processes if given).
+        """
+        if jobs and jobs > 1:
+            return itertools.chain.from_iterable( self._render( ids, _load_entries, jobs ) )
+        return ( ( record.id, record.metadata ) for record in self._iter_records( ids ) )
+
+    def _yaml_ids( self, ids : list = None ) -> list:
+        """
+        Get the record ids (all or the given ones) in the order of the yaml representation 
+        (i.e. sorted by relpath just like a dumped dictionary would be).
+        """
+        return sorted( self.index.ids if ids is None else ids, key = lambda id: self.index.get_relpath( id )[3:] )
+
+    def _export_ids( self, query : str = None ) -> list:
+        """
+        Get the ids of the records to export, i.e. all records or those matching a flag query.
+        """
+        return self.index.find_query( query ) if query else self.index.ids
+
+    def _search_ids( self, pattern : str = None, flag : str = None, query : str = None ) -> list:
+        """
+        Get the ids of the records matching a filename pattern, flag, and flag query (or all records if none are given).
+        """
+        ids = None
+
+        if pattern:
+            ids = self.index.find( pattern )
+        
+        if flag:
+            # the index keeps track of all flags so only
+            # the matching records have to be loaded.
+            flagged = self.index.find_flag( flag )
+            if ids is None:
+                ids = flagged
+            else:
+                flagged = set( flagged )
+                ids = [ i for i in ids if i in flagged ]
+
+        if query:
+            matching = self.index.find_query( query )
+            if ids is None:
+                ids = matching
+            else:
+                matching = set( matching )
+                ids = [ i for i in ids if i in matching ]
+        
+        return self.index.ids if ids is None else ids
+
+    def _export_selection( self, query : str = None, federated : bool = False ) -> list:
+        """
+        Get the `( registry, ids )` of the records to export from this registry and, if `federated`, from all nested registries.
+        """
+        if federated:
+            return self._federate( lambda registry: ( registry, registry._export_ids( query ) ) )
+        return [ ( self, self._export_ids( query ) ) ]
+
+    def _federate( self, func ) -> list:
+        """
+        Apply a function to this registry and to all nested registries. 
+        The nested registries are loaded and processed concurrently in `settings.federation_jobs` threads.
+        Nested registries that cannot be read are skipped.
+
+        Parameters
+        ----------
+        func : callable
+            The function to apply to each Registry.
+
+        Returns
+        -------
+        list
+            The results of this registry followed by those of the nested registries (in alphabetical order).
+        """
+        def apply( directory ):
+            try:
+                return func( Registry( directory ) )
+            except Exception as e:
+                logger.error( f"Could not read the registry in {directory}: {e}" )
+                return None
+
+        with ThreadPoolExecutor( max_workers = settings.federation_jobs ) as executor:
+            nested = executor.map( apply, self.nested_registries() )
+            results = [ func( self ) ]
+            results.extend( i for i in nested if i is not None )
+        return results
+
+    def _rebase( self, registry, relpath : str ) -> str:
+        """
+        Rewrite a path relative to the base directory of a (nested) registry to be relative to the base directory of this registry.
+        """
+        if registry is self:
+            return relpath
+        prefix = os.path.relpath( os.path.dirname( registry.registry_dir ), os.path.dirname( self.registry_dir ) )
+        return os.path.join( prefix, relpath )
+
+    def _iter_fragments( self, ids : list, format : str, jobs : int = None, cache : bool = False, prefix : str = "" ):
+        """
+        Iterate over the rendered markdown or yaml fragments of records.
+
+        Parameters
+        ----------
+        ids : list
+            The ids of the records.
+        format : str
+            The format to render, either `md` or `yaml`.
+        jobs : int
+            The number of processes to render the records with. 
+            By default the records are rendered in this process.
+        cache : bool
+            Use the render cache, so only records whose stored metadata or relpath changed since 
+            they were last rendered are rendered again (see `filerecords.api.cache`).
+        prefix : str
+            The prefix of the rendered relpaths, i.e. the path of this registry's base directory 
+            relative to that of the exported (federating) registry. 
+            The fragments of each prefix are cached separately.
+
+        Yields
+        ------
+        str
+            The rendered fragment of each record in the order of the ids.
+        """
+        fragments, render = _renderers[ format ]
+        size = settings.export_chunk_size
+
+        if not cache:
+            if jobs and jobs > 1:
+                yield from itertools.chain.from_iterable( self._render( ids, functools.partial( render, prefix = prefix ), jobs ) )
+            else:
+                for start in range( 0, len( ids ), size ):
+                    yield from fragments( self, ids[ start : start + size ], prefix )
+            return
+
+        # the fragments are cached by format and prefix
+        key = f"{format}:{prefix}" if prefix else format
+
+        with render_cache.RenderCache( self.registry_dir ) as renders:
+
+            # a record is rendered again if its stored entry or its relpath changed
+            signatures = {}
+            for start in range( 0, len( ids ), size ):
+                chunk = ids[ start : start + size ]
+                for id, signature in self.backend.entry_signatures( chunk ).items():
+                    signatures[id] = f"{signature}:{self.index.get_relpath( id )}"
+
+            cached = renders.signatures( key )
+            dirty = [ id for id in ids if cached.get( id ) != signatures[id] ]
+
+            rendered = zip( dirty, self._iter_fragments( dirty, format, jobs, prefix = prefix ) )
+            while True:
+                chunk = list( itertools.islice( rendered, size ) )
+                if not chunk:
+                    break
+                renders.put( ( ( id, signatures[id], fragment ) for id, fragment in chunk ), key )
+            renders.prune( self.index.ids )
+
+            for start in range( 0, len( ids ), size ):
+                yield from renders.get( ids[ start : start + size ], key )
+
+    def _render( self, ids : list, render, jobs : int ):
+        """
+        Load and render records in parallel processes. 
+
+        The records are split into chunks of `settings.export_chunk_size` which are rendered by the worker processes.
+        Only a few chunks are processed at a time, and the results are yielded in the order of the chunks.
+
+        Note
+        ----
+        The worker processes load the registry from its backend, so any changes not yet saved are not included.
+
+        Parameters
+        ----------
+        ids : list
+            The ids of the records.
+        render : callable
+            The (module-level) function to render a chunk of record ids with.
+        jobs : int
+            The number of processes.
+
+        Yields
+        ------
+        object
+            The rendered result of each chunk.
+        """
+        size = settings.export_chunk_size
+        chunks = ( ids[ start : start + size ] for start in range( 0, len( ids ), size ) )
+
+        with ProcessPoolExecutor( max_workers = jobs, initializer = _init_export_worker, initargs = ( self.directory, ) ) as executor:
+            pending = collections.deque( executor.submit( render, chunk ) for chunk in itertools.islice( chunks, 2 * jobs ) )
+            while pending:
+                result = pending.popleft().result()
+                for chunk in itertools.islice( chunks, 1 ):
+                    pending.append( executor.submit( render, chunk ) )
+                yield result
+
+    def _iter_records( self, ids : list, chunk_size : int = None ):
+        """
+        Iterate over the FileRecords of multiple records, loading their metadata in chunks.
+
+        Parameters
+        ----------
+        ids : list
+            The ids of the records.
+        chunk_size : int
+            The number of records to load at a time. By default `settings.export_chunk_size` is used.
+
+        Yields
+        ------
+        FileRecord
+            The loaded records.
+        """
+        chunk_size = chunk_size if chunk_size else settings.export_chunk_size
+        for start in range( 0, len( ids ), chunk_size ):
+            yield from self._get_records( ids[ start : start + chunk_size ], preload = True )
+
+    def _get_records( self, ids : list, preload : bool = False ) -> list:
+        """
+        Get the FileRecords of multiple records at once. 
+
+        Parameters
+        ----------
+        ids : list
+            The ids of the records.
+        preload : bool
+            If True, the metadata of all records is loaded from the backend in one go.
+            Otherwise each record loads its metadata when it is first accessed.
+
+        Returns
+        -------
+        list
+            A list of FileRecord objects.
+        """
+        if self._transaction is not None:
+            # records changed within the transaction are not yet written
+            # so the records already in memory have to be used.
+            changed = self._transaction.records
+            pending = [ id for id in ids if str(id) not in changed ]
+        else:
+            changed = {}
+            pending = ids
+
+        if not preload:
+            return [ changed.get( str(id) ) or file.FileRecord( self, id = id ) for id in ids ]
+
+        entries = self.backend.load_entries( pending )
+        return [ changed.get( str(id) ) or file.FileRecord( self, id = id, metadata = entries[ str(id) ] ) for id in ids ]
+
+    def _init_record( self, record ):
+        """
+        Initialize the storage of a new record. 
+        Within a transaction this is deferred until the transaction ends.
+
+        Parameters
+        ----------
+        record : FileRecord
+            The new record.
+        """
+        if self._transaction is not None:
+            self._transaction.new.add( str(record.id) )
+            return
+        self.backend.init_entry( record.id )
+
+    def _save_record( self, record ):
+        """
+        Save a record together with the registry.
+        Within a transaction the record is only marked as changed.
+
+        Parameters
+        ----------
+        record : FileRecord
+            The record to save.
+        """
+        if str(record.id) in self.index:
+            self.index.set_latest( record.id, utils._get_latest( record.metadata ) )
+
+        if self._transaction is not None:
+            self._transaction.records[ str(record.id) ] = record
+            self.save()
+        else:
+            self._write( records = [ record ] )
+
+    def _commit( self ):
+        """
+        Write all changes of the current transaction.
+        """
+        transaction = self._transaction
+        if transaction.dirty:
+            self._write( transaction.records.values(), new = transaction.new, removed = transaction.removed )
+        self._transaction = None
+
+    def _write( self, records = (), new = (), removed = () ):
+        """
+        Write changed records together with the registry index and metadata.
+
+        Other processes may have written the registry since it was loaded, so the changed records are merged with
+        their stored versions while holding their entry locks, and the index and metadata are merged with theirs while 
+        holding the index lock (see `filerecords.api.locks`).
+
+        Parameters
+        ----------
+        records : iterable
+            The changed records.
+        new : iterable
+            The ids of the records that are not stored yet.
+        removed : iterable
+            The ids of the removed records.
+        """
+        records = { str(record.id) : record for record in records }
+        new = set( new )
+        removed = set( removed )
+
+        # a journaled backend only stores the changes (which are taken before merging, since merging includes the changes of others)
+        if self.backend.journaled:
+            deltas = { id : utils._diff_metadata( None if id in new else record._stored, record.metadata ) for id, record in records.items() }
+            metadata_delta = utils._diff_metadata( self._stored, self.metadata )
+
+        with self._locks.entries( itertools.chain( records, removed ) ):
+            self._merge_records( [ record for id, record in records.items() if id not in new ] )
+
+            with self._locks.index():
+                with self.backend.batch():
+                    conflicts = self._merge_registry()
+
+                    # new records whose file was recorded by another process in the meantime
+                    adopted = { id : other for id, other in conflicts.items() if id not in self.index }
+
+                    written = {}
+                    for id, record in records.items():
+                        if id in adopted:
+                            if not self.backend.journaled:
+                                self._remove_entry( id )
+                        elif id not in self.index:
+                            logger.warning( f"The record of {record.relpath[3:]} was removed by another process, its changes are discarded." )
+                        elif self.backend.journaled:
+                            written[id] = record
+                        elif id in new:
+                            self.backend.init_entry( id, record.metadata )
+                            written[id] = record
+                        else:
+                            self.backend.save_entry( id, record.metadata )
+                            written[id] = record
+
+                    if self.backend.journaled:
+                        entries = { id : deltas[id] for id in written }
+                        entries.update( dict.fromkeys( removed ) )
+                        self.backend.append( self.index.changes, entries, metadata_delta )
+                    else:
+                        for id in removed:
+                            self._remove_entry( id )
+                        self.backend.save_index( self.index, self.index.changes )
+                        self.backend.save_metadata( self.metadata )
+
+                self.index.changes = []
+                self._stored = utils._snapshot_metadata( self.metadata )
+                self._signature = self._index_signature()
+
+        self._index_comments( entries = ( ( id, record.metadata ) for id, record in written.items() ), removed = removed )
+
+        for id, other in conflicts.items():
+            if id not in adopted:
+                logger.warning( f"{self.index.get_relpath( other )[3:]} was recorded by another process in the meantime, {self.index.get_relpath( id )[3:]} was not moved there." )
+
+        # the new records are merged into the records of the other process instead (as if they had been loaded from them)
+        for id, other in adopted.items():
+            record = records[id]
+            record.id = other
+            record.metafile = self.backend.entryfile( other )
+            record._stored = {}
+            record._version = None
+        if adopted:
+            self._write( [ records[id] for id in adopted ] )
+
+    def _merge_records( self, records : list ):
+        """
+        Merge changed records with their stored versions (which other processes may have changed since they were loaded).
+        The entry locks of the records must be held.
+
+        Parameters
+        ----------
+        records : list
+            The changed records.
+        """
+        # records whose stored version did not change since they were loaded need no merging
+        records = [ record for record in records if record._version is None or record._version != self.backend.entry_version( record.id ) ]
+        if not records:
+            return
+        ids = [ str(record.id) for record in records ]
+        try:
+            stored = self.backend.load_entries( ids )
+        except FileNotFoundError:
+            # some records were removed by other processes
+            stored = {}
+            for id in ids:
+                with contextlib.suppress( FileNotFoundError ):
+                    stored[id] = self.backend.load_entry( id )
+
+        for id, record in zip( ids, records ):
+            record.metadata = utils._merge_metadata( record._stored, record.metadata, stored.get( id ) )
+            if id in self.index:
+                self.index.set_flags( id, record.flags )
+                self.index.set_latest( id, utils._get_latest( record.metadata ) )
+
+    def _merge_registry( self ) -> dict:
+        """
+        Merge the registry index and metadata with their stored versions (which other processes may have changed since they were loaded).
+        The index lock must be held.
+
+        Returns
+        -------
+        dict
+            The ids of the records that could not be added or moved because their path was recorded by another process in the meantime,
+            mapped to the ids of the other records (see `Index.replay()`).
+        """
+        conflicts = {}
+        if self._index_signature() != self._signature:
+            stored = self.backend.load_index()
+            conflicts = stored.replay( self.index.changes )
+            self.index = stored
+        self.metadata = utils._merge_metadata( self._stored, self.metadata, self.backend.load_metadata() )
+        return conflicts
+
+    def _index_signature( self ) -> tuple:
+        """
+        Get the inode, size, and modification time of the stored index (and journal), which change whenever they are written.
+        """
+        signature = []
+        for filename in ( self.backend.indexfile, self.backend.journalfile ):
+            try:
+                info = os.stat( filename )
+            except ( FileNotFoundError, TypeError ):
+                signature.append( None )
+                continue
+            signature.append( ( info.st_ino, info.st_size, info.st_mtime_ns ) )
+        return tuple( signature )
+
+    def _remove_entry( self, id : str ):
+        """
+        Remove a stored record (if it was not already removed by another process).
+        """
+        with contextlib.suppress( FileNotFoundError ):
+            self.backend.remove_entry( id )
+
+    def _index_comments( self, entries = (), removed = () ):
+        """
+        Update the full-text index of the comments, if it was already built (see `search_comments()`).
+
+        Parameters
+        ----------
+        entries : iterable
+            The `( id, metadata )` of changed records.
+        removed : iterable
+            The ids of removed records.
+        """
+        if not fulltext.CommentIndex.exists( self.registry_dir ):
+            return
+        with fulltext.CommentIndex( self.registry_dir ) as comments:
+            comments.update( entries )
+            comments.remove( removed )
+
+    def _rollback( self ):
+        """
+        Discard all changes of the current transaction.
+        """
+        transaction = self._transaction
+        self._transaction = None
+
+        self.index = transaction.index
+        self.metadata = transaction.metadata
+
+        # the records are re-loaded from the backend when they are accessed again
+        for record in transaction.records.values():
+            record.metadata = None
+
     def _find_registry( self ):
         """
         Finds the local registry associated with the given directory.
@@ -603,13 +1893,126 @@ class Registry(base.BaseRecord):
         
     def _load_registry( self ):
         """
-        Loads the registry data from the indexfile and metafile
+        Loads the registry data from the registry's storage backend
         """
-        self.indexfile = utils.get_indexfile( self.registry_dir )
-        self.metafile = utils.get_metafile( self.registry_dir )
+        self.backend = backends.get_backend( self.registry_dir )
+        self.indexfile = self.backend.indexfile
+        self.metafile = self.backend.metafile
 
-        self.index = utils.load_indexfile( self.indexfile )
-        self.metadata = utils.load_yamlfile( self.metafile )
+        self._locks = locks.RegistryLock( self.registry_dir )
+
+        # the signature is taken first, so changes made while loading are not missed
+        self._signature = self._index_signature()
+        self.index = self.backend.load_index()
+        self.metadata = self.backend.load_metadata()
+        self._stored = utils._snapshot_metadata( self.metadata )
 
     def __repr__( self ):
-        return f"{self.__class__.__name__}(directory = {self.directory}, registry_in = {os.path.dirname( os.path.dirname( self.registry_dir ) ) })"
\ No newline at end of file
+        return f"{self.__class__.__name__}(directory = {self.directory}, registry_in = {os.path.dirname( os.path.dirname( self.registry_dir ) ) })"
+
+
+class _Transaction:
+    """
+    The state of an ongoing registry transaction.
+
+    Parameters
+    ----------
+    registry : Registry
+        The registry of the transaction.
+    """
+    def __init__( self, registry ):
+
+        # the registry state to return to on rollback
+        self.index = registry.index.copy()
+        self.metadata = copy.deepcopy( registry.metadata )
+
+        self.records = {}
+        """The changed records by their ids."""
+        self.new = set()
+        """The ids of records added during the transaction."""
+        self.removed = set()
+        """The ids of previously existing records removed during the transaction."""
+        self.dirty = False
+        """Whether the registry index or metadata have to be saved."""
+
+    def remove( self, id : str ):
+        """
+        Mark a record as removed.
+
+        Parameters
+        ----------
+        id : str
+            The id of the record.
+        """
+        id = str(id)
+        self.records.pop( id, None )
+        if id in self.new:
+            self.new.discard( id )
+        else:
+            self.removed.add( id )
+
+
+_export_registry = None
+"""The registry of an export worker process."""
+
+def _init_export_worker( directory : str ):
+    """
+    Load the registry within an export worker process.
+    """
+    global _export_registry
+    _export_registry = Registry( directory )
+
+def _render_markdown( ids : list, prefix : str = "" ) -> list:
+    """
+    Render a chunk of records to markdown (within an export worker process).
+    """
+    return _markdown_fragments( _export_registry, ids, prefix )
+
+def _load_entries( ids : list ) -> list:
+    """
+    Load a chunk of records as `( id, metadata )` pairs (within an export worker process).
+    """
+    return [ ( record.id, record.metadata ) for record in _export_registry._get_records( ids, preload = True ) ]
+
+def _load_yaml( ids : list ) -> list:
+    """
+    Load a chunk of records as `( relpath, dict )` pairs for the yaml representation (within an export worker process).
+    """
+    return [ ( record.relpath[3:], record.to_yaml() ) for record in _export_registry._get_records( ids, preload = True ) ]
+
+def _render_yaml( ids : list, prefix : str = "" ) -> list:
+    """
+    Render a chunk of records to yaml (within an export worker process).
+    """
+    return _yaml_fragments( _export_registry, ids, prefix )
+
+def _markdown_fragments( registry, ids : list, prefix : str = "" ) -> list:
+    """
+    Render a chunk of records to markdown, one fragment per record (with the `prefix` in front of their paths).
+    """
+    fragments = [ record.to_markdown( comments_header = False ) for record in registry._get_records( ids, preload = True ) ]
+    if prefix:
+        # each fragment starts with a heading of the record's path
+        prefix = prefix.replace( "_", "\\_" )
+        fragments = [ f"### {prefix}{i[ len( '### ' ): ]}" for i in fragments ]
+    return fragments
+
+def _yaml_fragments( registry, ids : list, prefix : str = "" ) -> list:
+    """
+    Render a chunk of records to yaml as entries of the top-level `records` mapping, one fragment per record 
+    (with the `prefix` in front of their paths).
+    """
+    fragments = []
+    for record in registry._get_records( ids, preload = True ):
+        entry = record.to_yaml()
+        entry["relpath"] = prefix + entry["relpath"]
+        stream = io.StringIO()
+        utils.stream_yaml( stream, [ ( "records", iter( [ ( entry["relpath"], entry ) ] ) ) ] )
+
+        # each record is rendered as part of a records mapping 
+        # so the indentation is the same as in the entire export.
+        fragments.append( stream.getvalue()[ len( "records:\n" ): ] )
+    return fragments
+
+_renderers = { "md" : ( _markdown_fragments, _render_markdown ), "yaml" : ( _yaml_fragments, _render_yaml ) }
+"""The functions to render record fragments in this process and in export worker processes, by format."""
@@ -2,6 +2,7 @@
 These are the default settings that control filerecords behavior.
 """
 import logging
+import os
 
 # ----------------------------------------------------------------
 #   General settings
@@ -10,6 +11,42 @@ import logging
 log_level = logging.INFO
 """The default logging level"""
 
+progress_interval = 10000
+"""The number of files after which progress is reported when walking large directory trees."""
+
+screen_jobs = 16
+"""The default number of threads used to check the recorded files when screening a registry."""
+
+federation_jobs = 16
+"""The number of threads used to load and query the nested registries in a federated search."""
+
+record_stats = True
+"""Whether to record the size, modification time and inode of files when they are added or commented. These are used to detect changed files (`records screen`) and to relink moved files (`records relink`)."""
+
+hash_files = False
+"""Whether to compute a content hash of files when they are added or commented (this may take long for large files). Hashes can always be computed later on using `Registry.fingerprint()`."""
+
+hash_jobs = None
+"""The default number of processes used to hash files. If None, all available CPUs are used."""
+
+export_chunk_size = 500
+"""The number of records that are loaded at a time when exporting a registry."""
+
+hash_chunk_size = 16 * 1024 ** 2
+"""The size (in bytes) of the chunks in which files are read when computing their content hash."""
+
+server_socket = os.environ.get( "FILERECORDS_SOCKET", os.path.join( os.environ.get( "XDG_RUNTIME_DIR" ) or f"/tmp/filerecords-{os.getuid()}", "filerecords.sock" ) )
+"""The Unix domain socket of the `records serve` daemon, which is placed in a directory only the user may access (`$XDG_RUNTIME_DIR` or a private directory in `/tmp`). This can also be set using the `FILERECORDS_SOCKET` environment variable."""
+
+server_timeout = 30
+"""The number of seconds a command waits for a response from the `records serve` daemon before running by itself instead."""
+
+journal_size = 1024 ** 2
+"""The size (in bytes) up to which the journal of a registry with the `journal` storage backend grows before it is compacted automatically. For registries whose indexfile is larger than four times this size, the journal grows up to a quarter of the indexfile."""
+
+lock_slots = 4096
+"""The number of entry locks of a registry (see `filerecords.api.locks`). Records whose ids hash to the same lock cannot be written at the same time."""
+
 # ----------------------------------------------------------------
 #   Formatting settings
 # ----------------------------------------------------------------
@@ -29,14 +66,32 @@ indexfile = "INDEXFILE"
 registry_metafile = "METAFILE"
 """The name of the file storing the registry's own metadata - i.e. registry comments and the associated flags and flag groups."""
 
+sqlite_file = "REGISTRY.db"
+"""The name of the database file used by registries with the `sqlite` storage backend."""
+
+render_cache = "RENDERCACHE"
+"""The name of the database file caching the rendered records of exported registries (see `filerecords.api.cache`)."""
+
+journal_file = "JOURNAL"
+"""The name of the append-only file storing the changes made to registries with the `journal` storage backend (see `filerecords.api.journal`)."""
+
+lockfile = "LOCK"
+"""The name of the (empty) file used to lock a registry while it is written (see `filerecords.api.locks`)."""
+
+comment_index = "COMMENTINDEX"
+"""The name of the database file holding the full-text index of the comments of a registry (see `filerecords.api.fulltext`)."""
+
 registry_export_name = "registry"
 """The default name of exported registry file(s) in yaml or markdown format"""
 
+backend = "yaml"
+"""The default storage backend of new registries. This can be either `yaml` (an indexfile and one yaml file per record), `sqlite` (a single database file), or `journal` (the files of `yaml` together with an append-only journal of all changes)."""
+
 # ----------------------------------------------------------------
 #   File architecture
 # ----------------------------------------------------------------
 
-indexfile_header = "id\tfilename\trelpath\n"
+indexfile_header = "id\tfilename\trelpath\tflags\tlatest\n"
 """The header of the indexfile"""
 
 entryfile_template = {
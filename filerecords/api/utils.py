@@ -2,15 +2,26 @@
 Utility functions for filerecords.
 """
 
+from collections.abc import Iterator
+from datetime import datetime
+import contextlib
+import itertools
+import threading
+import tempfile
 import logging
-import subprocess
+import json
+import fnmatch
+import hashlib
+import mmap
+import csv
 import yaml
 from yaml.loader import SafeLoader
+import stat
 import os
 import sys
-import pandas as pd
 
 import filerecords.api.settings as settings
+import filerecords.api.index as index
 
 def log( name : str = "filerecords", level : int = None, outfile : str = None ):
     """
@@ -40,7 +51,7 @@ def log( name : str = "filerecords", level : int = None, outfile : str = None ):
 
 logger = log()
 
-def make_new_registry( directory : str, perms : (int or str) = None ):
+def make_new_registry( directory : str, perms : (int or str) = None, backend : str = None ):
     """
     Make a new registry in a directory.
 
@@ -52,20 +63,31 @@ def make_new_registry( directory : str, perms : (int or str) = None ):
         The permissions to set on the registry directory. This can be either the 
         numeric permissions (e.g. 755) or a string (e.g. "rwxr-xr-x").
         By default the permissions are inherited by the parent directory.
+    backend : str
+        The storage backend to use for the registry (`yaml` or `sqlite`).
+        By default `settings.backend` is used.
     """
+    import filerecords.api.backends as backends
 
     registry_dir = os.path.join( directory, settings.registry_dir )
     if os.path.exists( registry_dir ):
         raise FileExistsError( f"Registry already exists in {directory}" )
     
+    # a new registry may be closer to any of the already looked up directories 
+    _registry_cache.clear()
+
+    backend = backend if backend else settings.backend
+    if backend not in backends.backends:
+        raise ValueError( f"Unknown registry backend '{backend}'. Available backends are: {', '.join(backends.backends)}" )
+
     os.makedirs( registry_dir )
 
-    # add an INDEXFILE to the registry.
-    indexfile = os.path.join( registry_dir, settings.indexfile )
-    os.system( f"echo '{settings.indexfile_header}' > {indexfile}" )
+    # add the INDEXFILE and METAFILE (or their equivalent) to the registry.
+    backends.backends[backend].create( registry_dir )
 
-    # add a METADATA file to the registry.
-    _init_metafile( registry_dir )
+    # the lock file is created right away so it receives the registry permissions
+    # (see filerecords.api.locks, registries of older versions create it on their first write)
+    open( os.path.join( registry_dir, settings.lockfile ), "a" ).close()
 
     # set the permissions 
     if perms is None:
@@ -94,12 +116,50 @@ def get_directory_perms(directory):
     return perms
 
 
+_registry_cache = {}
+"""The registry directories already found for (logical) directory paths during this process."""
+
+def get_logical_path( directory : str = "." ):
+    """
+    Get the absolute path of a directory without resolving symbolic links. 
+    This is the path the shell's `pwd` reports after a `cd` into the directory.
+
+    Parameters
+    ----------
+    directory : str
+        The directory, by default the current working directory.
+
+    Returns
+    -------
+    str
+        The absolute logical path of the directory.
+    """
+    # the shell's $PWD keeps symbolic links, but it is only trustworthy
+    # if it still points to the actual working directory of this process
+    # (it may be outdated or missing, e.g. after os.chdir or when not started from a shell).
+    cwd = os.environ.get( "PWD" )
+    try:
+        if not cwd or not os.path.isabs( cwd ) or not os.path.samestat( os.stat( cwd ), os.stat( "." ) ):
+            cwd = os.getcwd()
+    except OSError:
+        cwd = os.getcwd()
+
+    path = os.path.normpath( os.path.join( cwd, directory ) )
+    if not os.path.isdir( path ):
+        raise NotADirectoryError( f"{directory} is not a directory." )
+    return path
+
 def find_registry( directory :str ):
     """
     Find a registry associated with a source directory. 
     This will repeatedly search the upper level directories
     until a registry is found.
 
+    Note
+    ----
+    Found registries are cached for the remainder of the process
+    so repeatedly looking up the same directories does not walk the directory tree again.
+
     Parameters
     ----------
     directory : str
@@ -109,13 +169,20 @@ def find_registry( directory :str ):
     str or None
         The path to the registry directory or None if no registry was found.
     """
-    # paths = os.path.abspath( directory )
-    paths = subprocess.check_output( f"cd {directory} ; pwd", shell = True ).decode().strip()
+    paths = get_logical_path( directory )
+
+    registry_dir = _registry_cache.get( paths )
+    if registry_dir is not None and os.path.exists( registry_dir ):
+        return registry_dir
+
+    visited = []
     while True:
 
+        visited.append( paths )
         registry_dir = os.path.join( paths, settings.registry_dir )
         if os.path.exists( registry_dir ):
             logger.debug( f"Found registry in { os.path.dirname(registry_dir) }" )
+            _registry_cache.update( { i : registry_dir for i in visited } )
             return registry_dir
 
         paths = os.path.dirname( paths )
@@ -123,6 +190,133 @@ def find_registry( directory :str ):
         if paths == "/":
             return None
 
+def find_nested_registries( directory : str ) -> list:
+    """
+    Find all registries nested below a directory (not including a registry of the directory itself).
+
+    Parameters
+    ----------
+    directory : str
+        The directory to search.
+
+    Returns
+    -------
+    list
+        The paths of the registry directories, in alphabetical order of the directories they belong to.
+    """
+    found = []
+    directories = [ directory ]
+    while directories:
+        current = directories.pop()
+        try:
+            entries = sorted( os.scandir( current ), key = lambda x: x.name )
+        except ( PermissionError, FileNotFoundError ) as e:
+            logger.warning( f"Cannot read {current}: {e}" )
+            continue
+
+        subdirectories = []
+        for entry in entries:
+            if entry.name == settings.registry_dir:
+                if current != directory:
+                    found.append( entry.path )
+                continue
+
+            # symbolic links to directories are not followed to avoid cycles
+            if entry.is_dir( follow_symlinks = False ):
+                subdirectories.append( entry.path )
+
+        # keep the sub-directories in alphabetical order
+        directories.extend( reversed( subdirectories ) )
+
+    return found
+
+def walk_files( directory : str, recursive : bool = True, glob : list = None, exclude : list = None ):
+    """
+    Walk through the files within a directory. 
+    
+    The directory tree is scanned lazily so the files are yielded as they are found.
+    Registry directories are never entered, and neither are any sub-directories that
+    contain a registry of their own (since their files belong to that registry).
+
+    Parameters
+    ----------
+    directory : str
+        The directory to walk through.
+    recursive : bool
+        If True, the files in all sub-directories are also yielded.
+    glob : list
+        Shell-style patterns (e.g. `*.tsv`) of which a file must match at least one.
+        Patterns are matched against the filename and the path relative to `directory`.
+    exclude : list
+        Shell-style patterns of files and directories to skip.
+        These are matched just like the `glob` patterns.
+
+    Yields
+    ------
+    str
+        The path of each file (joined to `directory`).
+    """
+    def matches( path, name, patterns ):
+        return any( fnmatch.fnmatch( name, i ) or fnmatch.fnmatch( path, i ) for i in patterns )
+
+    directories = [ ( directory, "" ) ]
+    while directories:
+        current, prefix = directories.pop()
+        try:
+            entries = sorted( os.scandir( current ), key = lambda x: x.name )
+        except ( PermissionError, FileNotFoundError ) as e:
+            logger.warning( f"Cannot read {current}: {e}" )
+            continue
+
+        subdirectories = []
+        for entry in entries:
+            path = prefix + entry.name
+            if entry.name == settings.registry_dir or ( exclude and matches( path, entry.name, exclude ) ):
+                continue
+
+            if entry.is_dir():
+                # symbolic links to directories are not followed to avoid cycles
+                if recursive and not entry.is_symlink() and not os.path.exists( os.path.join( entry.path, settings.registry_dir ) ):
+                    subdirectories.append( ( entry.path, path + "/" ) )
+
+            elif not glob or matches( path, entry.name, glob ):
+                yield os.path.normpath( entry.path )
+
+        # keep the sub-directories in alphabetical order
+        directories.extend( reversed( subdirectories ) )
+
+def hash_file( filename : str, chunk_size : int = None ):
+    """
+    Compute the BLAKE2 content hash of a file.
+    The file is memory-mapped and hashed chunk by chunk so even very large files are never read into memory at once.
+
+    Parameters
+    ----------
+    filename : str
+        The path to the file.
+    chunk_size : int
+        The size of the chunks in bytes. By default `settings.hash_chunk_size` is used.
+
+    Returns
+    -------
+    str
+        The hexadecimal hash of the file contents.
+    """
+    chunk_size = chunk_size if chunk_size else settings.hash_chunk_size
+    digest = hashlib.blake2b()
+    with open( filename, "rb" ) as f:
+        size = os.fstat( f.fileno() ).st_size
+
+        # empty files cannot be memory-mapped
+        if size == 0:
+            return digest.hexdigest()
+
+        with mmap.mmap( f.fileno(), 0, access = mmap.ACCESS_READ ) as mapped, memoryview( mapped ) as view:
+            for start in range( 0, size, chunk_size ):
+                digest.update( view[ start : start + chunk_size ] )
+
+    return digest.hexdigest()
+
 def get_indexfile( registry_dir : str ):
     """
     Get the indexfile of a registry.
@@ -179,12 +373,221 @@ def load_indexfile( filename : str ):
     
     Returns
     -------
-    pandas.DataFrame
+    Index
         The contents of the registry indexfile.
     """
-    df = pd.read_csv( filename, sep = "\t" )
-    df.index = df["id"].values
-    return df 
+    with open( filename, "r", newline = "" ) as f:
+        reader = csv.reader( f, delimiter = "\t" )
+        header = next( reader, list( index.Index.columns ) )
+        columns = { name : [] for name in header }
+        for row in reader:
+            # skip blank lines (e.g. the trailing one of a new registry)
+            if not row:
+                continue
+            for name, value in zip( header, row ):
+                columns[name].append( value )
+
+    if "flags" in columns and "latest" in columns:
+        flags = [ _decode_flags( i ) for i in columns["flags"] ]
+        latest = [ _decode_latest( i ) for i in columns["latest"] ]
+    else:
+        # indexfiles of older registries do not store the record flags and latest comments yet
+        # so we collect them from the entry files once (they are stored with the next save).
+        registry_dir = os.path.dirname( filename )
+        entries = [ load_yamlfile( os.path.join( registry_dir, id ) ) for id in columns["id"] ]
+        flags = [ i["flags"] for i in entries ]
+        latest = [ _get_latest( i ) for i in entries ]
+
+    return index.Index( columns["id"], columns["filename"], columns["relpath"], flags, latest )
+
+def save_indexfile( filename : str, contents ):
+    """
+    Save a registry indexfile.
+
+    Parameters
+    ----------
+    filename : str
+        The path to the registry indexfile.
+    contents : Index
+        The registry index to save.
+    """
+    rows = ( ( id, name, relpath, _encode_flags( flags ), _encode_latest( latest ) ) for id, name, relpath, flags, latest in contents.rows() )
+    with atomic_write( filename, newline = "" ) as f:
+        writer = csv.writer( f, delimiter = "\t", lineterminator = "\n" )
+        writer.writerow( index.Index.columns )
+        writer.writerows( rows )
+
+def _get_latest( metadata : dict ) -> dict:
+    """
+    Get the latest comment from the metadata of a record (whose comments are in time order).
+    """
+    if not metadata["comments"]:
+        return None
+    last = next( reversed( metadata["comments"] ) )
+    return { last : metadata["comments"][last] }
+
+def _snapshot_metadata( metadata : dict ) -> dict:
+    """
+    Copy the metadata of a record (or registry) as it was loaded, so the changes made to it can be found later on (see `_merge_metadata`).
+    Only the top-level containers (e.g. the comments and flags) are copied since their contents are always replaced rather than changed in place.
+    """
+    return { key : value.copy() if isinstance( value, ( dict, list ) ) else value for key, value in metadata.items() }
+
+def _merge_metadata( base : dict, ours : dict, theirs : dict ) -> dict:
+    """
+    Merge the changes made to the metadata of a record (or registry) with the changes stored by someone else in the meantime.
+
+    Comments and flags (and flag groups) are merged by the entries added or removed on either side,
+    any other values (e.g. the file stats) are taken from our side if we changed them (see `_diff_metadata`).
+
+    Parameters
+    ----------
+    base : dict
+        The metadata as it was loaded (see `_snapshot_metadata`). If None, our metadata is used as it is.
+    ours : dict
+        The metadata with our changes.
+    theirs : dict
+        The metadata as it is stored now.
+
+    Returns
+    -------
+    dict
+        The merged metadata.
+    """
+    if base is None or theirs is None:
+        return ours
+    return _patch_metadata( theirs, _diff_metadata( base, ours ) )
+
+def _diff_metadata( before : dict, after : dict ) -> dict:
+    """
+    Get the changes made to the metadata of a record (or registry).
+
+    Parameters
+    ----------
+    before : dict
+        The metadata before the changes. If None, all of the metadata after the changes is new.
+    after : dict
+        The metadata after the changes.
+
+    Returns
+    -------
+    dict
+        The changes, which may contain the added `comments` (with timestamps as keys) and the timestamps of the removed ones (`uncomment`), 
+        the added and removed `flags` and `unflag`, the changed `groups` and the labels of the removed ones (`ungroup`), 
+        as well as any other values that were `set` or `unset`. Unchanged parts are left out.
+    """
+    before = before if before is not None else {}
+    delta = {}
+    for key in itertools.chain( after, ( i for i in before if i not in after ) ):
+        if key not in after:
+            delta.setdefault( "unset", [] ).append( key )
+
+        elif key == "comments":
+            previous = before.get( key, {} )
+            added = { i : entry for i, entry in after[key].items() if i not in previous }
+            removed = [ i for i in previous if i not in after[key] ]
+            if added:
+                delta["comments"] = added
+            if removed:
+                delta["uncomment"] = removed
+
+        elif key == "flags":
+            previous = before.get( key, [] )
+            added = [ i for i in after[key] if i not in previous ]
+            removed = [ i for i in previous if i not in after[key] ]
+            if added:
+                delta["flags"] = added
+            if removed:
+                delta["unflag"] = removed
+
+        elif key == "groups":
+            previous = before.get( key, {} )
+            changed = { label : flags for label, flags in after[key].items() if previous.get( label ) != flags }
+            removed = [ label for label in previous if label not in after[key] ]
+            if changed:
+                delta["groups"] = changed
+            if removed:
+                delta["ungroup"] = removed
+
+        elif key not in before or after[key] != before[key]:
+            delta.setdefault( "set", {} )[key] = after[key]
+
+    return delta
+
+def _patch_metadata( metadata : dict, delta : dict ) -> dict:
+    """
+    Apply changes to the metadata of a record (or registry). 
+    The changes only add or remove entries (and set values) so applying them again does not change the result.
+
+    Parameters
+    ----------
+    metadata : dict
+        The metadata to change (which is left as it is).
+    delta : dict
+        The changes (see `_diff_metadata`).
+
+    Returns
+    -------
+    dict
+        The changed metadata.
+    """
+    patched = dict( metadata )
+    if "comments" in delta or "uncomment" in delta:
+        removed = set( delta.get( "uncomment", () ) )
+        comments = { i : entry for i, entry in metadata.get( "comments", {} ).items() if i not in removed }
+        comments.update( delta.get( "comments", {} ) )
+        patched["comments"] = { i : comments[i] for i in sorted( comments ) }
+
+    if "flags" in delta or "unflag" in delta:
+        removed = set( delta.get( "unflag", () ) )
+        flags = [ i for i in metadata.get( "flags", [] ) if i not in removed ]
+        flags += [ i for i in delta.get( "flags", () ) if i not in flags ]
+        patched["flags"] = flags
+
+    if "groups" in delta or "ungroup" in delta:
+        removed = set( delta.get( "ungroup", () ) )
+        groups = { label : flags for label, flags in metadata.get( "groups", {} ).items() if label not in removed }
+        groups.update( delta.get( "groups", {} ) )
+        patched["groups"] = groups
+
+    for key in delta.get( "unset", () ):
+        patched.pop( key, None )
+    patched.update( delta.get( "set", {} ) )
+    return patched
+
+def _encode_flags( flags : list ) -> str:
+    """
+    Encode the flags of a record for storing in the index (flags may contain any characters).
+    """
+    if not flags:
+        return ""
+    return json.dumps( list( flags ) )
+
+def _decode_flags( text : str ) -> list:
+    """
+    Decode the flags of a record as stored in the index.
+    """
+    if not text:
+        return []
+    return json.loads( text )
+
+def _encode_latest( latest : dict ) -> str:
+    """
+    Encode the latest comment of a record for storing in the index.
+    """
+    if not latest:
+        return ""
+    timestamp, entry = next( iter( latest.items() ) )
+    return json.dumps( [ timestamp.isoformat(), entry["user"], entry["comment"] ] )
+
+def _decode_latest( text : str ) -> dict:
+    """
+    Decode the latest comment of a record as stored in the index.
+    """
+    if not text:
+        return None
+    timestamp, user, comment = json.loads( text )
+    return { datetime.fromisoformat( timestamp ) : { "comment" : comment, "user" : user } }
 
 def load_yamlfile( filename : str ):
     """
@@ -216,9 +619,179 @@ def save_yamlfile( filename : str, contents : dict ):
     contents : dict
         The contents of the yaml file.
     """
-    with open( filename, "w" ) as f:
+    with atomic_write( filename ) as f:
         yaml.dump( contents, f )
 
+@contextlib.contextmanager
+def atomic_write( filename : str, perms : int = None, **kwargs ):
+    """
+    Write a text file at once. The contents are written to a temporary file 
+    which then replaces the file, so the file is never seen partially written (e.g. by other processes).
+    The permissions of a replaced file are kept.
+
+    Parameters
+    ----------
+    filename : str
+        The path of the file to write.
+    perms : int
+        The permissions of the file. By default the permissions of a replaced file are kept, 
+        and new files receive the usual permissions (as set by the umask).
+    **kwargs
+        Any additional arguments to `open()`, e.g. `newline`.
+
+    Yields
+    ------
+    file
+        The (temporary) file to write to.
+    """
+    directory, name = os.path.split( os.path.abspath( filename ) )
+    descriptor, temp = tempfile.mkstemp( prefix = f".{name}.", suffix = ".tmp", dir = directory )
+    try:
+        with open( descriptor, "w", **kwargs ) as f:
+            yield f
+        if perms is None:
+            perms = _get_file_perms( filename )
+        os.chmod( temp, perms )
+        if _staged.files is not None:
+            _staged.files.append( ( temp, filename ) )
+        else:
+            os.replace( temp, filename )
+    except BaseException:
+        with contextlib.suppress( FileNotFoundError ):
+            os.remove( temp )
+        raise
+
+def remove_file( filename : str ):
+    """
+    Remove a file. Within `staged_writes()` the file is only removed once all staged files were written.
+
+    Parameters
+    ----------
+    filename : str
+        The path of the file to remove.
+    """
+    if _staged.files is not None:
+        _staged.files.append( ( None, filename ) )
+    else:
+        os.remove( filename )
+
+def staged_call( func ):
+    """
+    Call a function. Within `staged_writes()` the function is only called once all files staged before were written
+    (and not at all if the staged writes are discarded).
+
+    Parameters
+    ----------
+    func : callable
+        The function to call (without arguments).
+    """
+    if _staged.files is not None:
+        _staged.files.append( ( func, None ) )
+    else:
+        func()
+
+class _Stage( threading.local ):
+    files = None
+    """The `( temporary file, file )` pairs written within `staged_writes()` (the temporary file is None for removed files, 
+    and the function to call for `staged_call()`)."""
+
+_staged = _Stage()
+
+@contextlib.contextmanager
+def staged_writes():
+    """
+    Write multiple files at once. Within the context the files written using `atomic_write()` (and removed using `remove_file()`) 
+    are only written to temporary files, which replace the files (in the order they were written) once the context ends.
+    Functions passed to `staged_call()` are called in between, in the same order.
+    If an exception occurs within the context, none of the files are replaced or removed and none of the functions are called.
+    Nested contexts are part of the outermost one.
+    """
+    if _staged.files is not None:
+        yield
+        return
+
+    staged = _staged.files = []
+    try:
+        yield
+    except BaseException:
+        _staged.files = None
+        _discard_staged( staged )
+        raise
+
+    _staged.files = None
+    for i, ( temp, filename ) in enumerate( staged ):
+        try:
+            if temp is None:
+                with contextlib.suppress( FileNotFoundError ):
+                    os.remove( filename )
+            elif callable( temp ):
+                temp()
+            else:
+                os.replace( temp, filename )
+        except BaseException:
+            _discard_staged( staged[i:] )
+            raise
+
+def _discard_staged( staged : list ):
+    """
+    Remove the temporary files of staged writes that are not applied.
+    """
+    for temp, filename in staged:
+        if isinstance( temp, str ):
+            with contextlib.suppress( FileNotFoundError ):
+                os.remove( temp )
+
+def stream_yaml( stream, items ):
+    """
+    Dump a (large) mapping to a yaml stream pair by pair, without assembling the mapping in memory first.
+    The output is the same as dumping the entire mapping at once using `save_yamlfile`, given that the keys are in sorted order.
+
+    Parameters
+    ----------
+    stream : file-like
+        The stream to write to.
+    items : iterable
+        The `( key, value )` pairs of the mapping. Values that are iterators of 
+        `( key, value )` pairs themselves are streamed as nested mappings.
+    """
+    dumper = yaml.Dumper( stream, default_flow_style = False )
+    try:
+        dumper.open()
+        dumper.emit( yaml.DocumentStartEvent( explicit = False ) )
+        _emit_yaml_mapping( dumper, items )
+        dumper.emit( yaml.DocumentEndEvent( explicit = False ) )
+        dumper.close()
+    finally:
+        dumper.dispose()
+
+def _emit_yaml_mapping( dumper, items ):
+    """
+    Emit the yaml events of a mapping given as `( key, value )` pairs.
+    """
+    dumper.emit( yaml.MappingStartEvent( anchor = None, tag = None, implicit = True, flow_style = False ) )
+    for key, value in items:
+        _emit_yaml_node( dumper, key )
+        if isinstance( value, Iterator ):
+            _emit_yaml_mapping( dumper, value )
+        else:
+            _emit_yaml_node( dumper, value )
+    dumper.emit( yaml.MappingEndEvent() )
+
+def _emit_yaml_node( dumper, data ):
+    """
+    Emit the yaml events of a single object.
+    """
+    node = dumper.represent_data( data )
+    dumper.anchor_node( node )
+    dumper.serialize_node( node, None, None )
+
+    # forget about the object once it is written so the memory stays bounded
+    dumper.represented_objects = {}
+    dumper.object_keeper = []
+    dumper.alias_key = None
+    dumper.anchors = {}
+    dumper.serialized_nodes = {}
+
 def add_registry_to_gitignore():
     """
     Add the registry directory to a .gitignore file in the current directory.
@@ -227,6 +800,17 @@ def add_registry_to_gitignore():
     with open( gitignore, "a" ) as f:
         f.write( f"\n{settings.registry_dir}" )
 
+def _get_file_perms( filename : str ) -> int:
+    """
+    Get the permissions of a file, or the usual permissions of new files (as set by the umask) if it does not exist.
+    """
+    try:
+        return stat.S_IMODE( os.stat( filename ).st_mode )
+    except FileNotFoundError:
+        umask = os.umask( 0 )
+        os.umask( umask )
+        return 0o666 & ~umask
+
 def _init_metafile( registry_dir : str ):
     """
     Initialize a registry metadata file. 
@@ -243,10 +827,9 @@ def _init_metafile( registry_dir : str ):
         "groups" : {}
     }
     metafile = os.path.join( registry_dir, settings.registry_metafile )
-    with open( metafile, "w" ) as f:
-        yaml.dump( contents, f )
+    save_yamlfile( metafile, contents )
 
-def _init_entryfile( registry_dir : str, id : str ):
+def _init_entryfile( registry_dir : str, id : str, contents : dict = None ):
     """
     Initialize a registry entry file. 
 
@@ -256,10 +839,10 @@ def _init_entryfile( registry_dir : str, id : str ):
         The registry directory.
     id : str
         The id of the entry.
+    contents : dict
+        The initial contents of the entry. By default `settings.entryfile_template` is used.
     """
     entryfile = os.path.join( registry_dir, id )
-    with open( entryfile, "w" ) as f:
-        yaml.dump( settings.entryfile_template, f )
-    
     perms = get_directory_perms(registry_dir)
-    os.system( f"chmod -R {perms} {entryfile}" )
\ No newline at end of file
+    with atomic_write( entryfile, perms = int( str(perms), 8 ) ) as f:
+        yaml.dump( contents if contents is not None else settings.entryfile_template, f )
@@ -2,6 +2,27 @@
 Auxiliary functions for the CLI.
 """
 
+import os
+
+_pool = None
+"""The pool of registries kept in memory while running as `records serve` daemon (None otherwise)."""
+
+def _get_registry():
+    """
+    Get the registry of the current directory. 
+    Within the `records serve` daemon the registry is taken from its pool of loaded registries.
+
+    Returns
+    -------
+    Registry
+        The registry.
+    """
+    if _pool is not None:
+        return _pool.get( "." )
+
+    import filerecords.api as api
+    return api.Registry( "." )
+
 def _prep_groups( groups ):
     """
     Prepare the given flag groups for registry adding.
@@ -39,4 +60,94 @@ def _register_groups( registry, groups ):
     groups = _prep_groups( groups )
     for name, flags in groups.items():
         registry.add_group( name, flags )
-    registry.save()
\ No newline at end of file
+    registry.save()
+
+def _add_target_arguments( parser ):
+    """
+    Add the arguments to select the files of a command by walking directories.
+
+    Parameters
+    ----------
+    parser : argparse.ArgumentParser
+        The parser of the command.
+    """
+    parser.add_argument( "-r", "--recursive", help = "Apply to all files within the given directories and their sub-directories (by default the current directory).", action = "store_true", default = False )
+    parser.add_argument( "--glob", help = "Apply to all files within the given directories (by default the current directory) that match a shell-style pattern such as '*.tsv'. Can be supplied multiple times.", action = "append", default = None )
+    parser.add_argument( "--exclude", help = "Skip files and directories matching a shell-style pattern when walking directories. Can be supplied multiple times.", action = "append", default = None )
+
+def _add_query_argument( parser ):
+    """
+    Add the argument to select records by a flag query.
+
+    Parameters
+    ----------
+    parser : argparse.ArgumentParser
+        The parser of the command.
+    """
+    parser.add_argument( "-q", "--query", help = "A flag query to search for, such as 'results AND NOT tmp OR group:final'. Supports NOT, AND, OR, and parentheses.", default = None )
+
+def _check_query( args ) -> bool:
+    """
+    Check whether the flag query of a command (if any) is valid, and log the error if it is not.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        The command line arguments with `query`.
+
+    Returns
+    -------
+    bool
+        True if there is no query or it is valid.
+    """
+    import filerecords.api.flag_query as flag_query
+    import filerecords.api.utils as utils
+
+    if not args.query:
+        return True
+    try:
+        flag_query.parse( args.query )
+    except ValueError as e:
+        utils.log().error( f"Invalid query: {e}" )
+        return False
+    return True
+
+def _collect_targets( args ):
+    """
+    Collect the files a command applies to. 
+    
+    If neither `--recursive` nor `--glob` were given, the filenames are used as they are.
+    Otherwise any given directories (or the current directory) are walked through
+    and the files found within them are used instead.
+
+    Parameters
+    ----------
+    args : argparse.Namespace
+        The command line arguments with `filename`, `recursive`, `glob` and `exclude`.
+
+    Returns
+    -------
+    list
+        The filenames.
+    """
+    import filerecords.api.utils as utils
+    import filerecords.api.settings as settings
+
+    if not args.recursive and not args.glob:
+        return args.filename
+
+    logger = utils.log()
+
+    filenames = []
+    for target in args.filename or [ "." ]:
+
+        if not os.path.isdir( target ):
+            filenames.append( target )
+            continue
+
+        for filename in utils.walk_files( target, recursive = args.recursive, glob = args.glob, exclude = args.exclude ):
+            filenames.append( filename )
+            if len( filenames ) % settings.progress_interval == 0:
+                logger.info( f"Found {len( filenames )} files so far..." )
+
+    return filenames
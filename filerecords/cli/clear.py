@@ -54,5 +54,5 @@ def clear( args ):
     # remove the old registry
     shutil.rmtree( reg.registry_dir )
 
-    # make a new registry
-    reg.init()
\ No newline at end of file
+    # make a new registry (using the same storage backend)
+    reg.init( backend = reg.backend.name )
\ No newline at end of file
@@ -4,12 +4,17 @@ The `records comment` command can be used to add a comment to a specific file or
 Usage
 -----
 
-    >>> records comment [-c <comment>] [-f <flags>] <filename>
+    >>> records comment [-c <comment>] [-f <flags>] [-r] [--glob <pattern>] [--exclude <pattern>] <filename>
 
     where ``<filename>`` is the path to the file to comment. If left blank the comment is added to the registry itself.
     ``-c <comment>``, adds a comment or description message.  ``-f <flags>``, adds any number of flags. These can include defined flag group labels.
+    ``-r``, comments all files within the given directories (or the current directory) and their sub-directories. 
+    ``--glob <pattern>``, comments only files matching the pattern (e.g. ``'*.tsv'``) within the given directories (or the current directory).
+    ``--exclude <pattern>``, skips files and directories matching the pattern. 
+    ``--glob`` and ``--exclude`` can be supplied multiple times. Registry directories and directories with their own registry are always skipped.
 """
 
+import filerecords.cli.auxiliary as aux
 
 def setup( parent ):
     """
@@ -20,6 +25,7 @@ def setup( parent ):
     parser.add_argument( "filename", nargs = "*", help = "The file to comment. If left blank the comments are applied to the registry itself", default = None )
     parser.add_argument( "-c", "--comment", help = "Add a comment or description.", default = None )
     parser.add_argument( "-f", "--flags", help = "Add flags.", nargs="+", default = None )
+    aux._add_target_arguments( parser )
     parser.set_defaults( func = comment )
 
 def comment( args ):
@@ -33,6 +39,12 @@ def comment( args ):
 
     reg = api.Registry( "." )
 
+    if args.recursive or args.glob:
+        args.filename = aux._collect_targets( args )
+        if not args.filename:
+            print( "No matching files found." )
+            return
+
     # # the add and update functions are expecting to find a string
     # # if noly one value is present...
     # if args.flags and len(args.flags) == 1:
@@ -49,24 +61,32 @@ def comment( args ):
         reg.save()
         
     elif isinstance( args.filename, list ): 
-        for filename in args.filename:
-            args.filename = filename
-            _comment_file( args, reg )
+        _comment_files( args, reg )
     else:
-        _comment_file( args, reg )
+        args.filename = [ args.filename ]
+        _comment_files( args, reg )
         
-def _comment_file(args, reg):
+def _comment_files(args, reg):
     """
     The core function to add comments to files.
     """
-    record = reg.get_record( args.filename )
+    new, recorded = [], []
+    for filename in dict.fromkeys( args.filename ):
+        if reg.get_record( filename ) is None:
+            new.append( filename )
+        else:
+            recorded.append( filename )
 
-    if record is None:
-        reg.add( args.filename, comment = args.comment, flags = args.flags )
-        # logger.info( f"Added {args.filename} to the registry." )
-        print( f"Added {args.filename} to the registry." )
+    # all files are written together at the end
+    with reg.transaction():
+        if new:
+            reg.add_many( new, comment = args.comment, flags = args.flags )
+        if recorded:
+            reg.update_many( recorded, comment = args.comment, flags = args.flags )
 
-    else:
-        reg.update( args.filename, comment = args.comment, flags = args.flags )
-        # logger.info( f"Updated {args.filename}'s records." )
-        print( f"Updated {args.filename}'s records." )
\ No newline at end of file
+    for filename in new:
+        # logger.info( f"Added {filename} to the registry." )
+        print( f"Added {filename} to the registry." )
+    for filename in recorded:
+        # logger.info( f"Updated {filename}'s records." )
+        print( f"Updated {filename}'s records." )
\ No newline at end of file
@@ -0,0 +1,34 @@
+"""
+The `records compact` command folds the journal of a registry into its index, metadata, and record files.
+This only applies to registries using the `journal` storage backend (see `records init -b journal`),
+whose changes are appended to a journal that is otherwise only compacted once it grew large enough.
+
+Usage
+-----
+
+    >>> records compact
+
+    Compacting does not change the contents of the registry, it only makes loading the registry faster.
+"""
+
+def setup( parent ):
+    """
+    Set up the CLI
+    """
+    descr = "Fold the journal of the registry into its other files."
+    parser = parent.add_parser( "compact", description = descr, help=descr )
+    parser.set_defaults( func = compact )
+
+def compact( args ):
+    """
+    The core function to compact the registry.
+    """
+    import filerecords.api as api
+
+    reg = api.Registry( "." )
+
+    if not reg.backend.journaled:
+        print( f"The registry uses the '{reg.backend.name}' backend, which has no journal." )
+        return
+
+    print( "Compacted the registry." if reg.compact() else "The journal of the registry is already empty." )
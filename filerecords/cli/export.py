@@ -1,24 +1,39 @@
 """
 The `records export` command can be used export a YAML or markdown summary (manifest) of all 
-records in the registry.
+records in the registry. For further processing by other tools the records can also be exported
+to JSON Lines (one record per line) or a self-contained SQLite database.
 
 Usage:
 
-    >>> records export <yaml|md|both> -f <filename>
+    >>> records export <yaml|md|both|jsonl|sqlite> -f <filename> [-q <query>] [-j <jobs>] [--no-cache] [--federated]
 
-    where either ``yaml``, ``md``, or ``both`` can be specified to export the records to a yaml or markdown file, or both.
+    where either ``yaml``, ``md``, or ``both`` can be specified to export the records to a yaml or markdown file, or both,
+    and ``jsonl`` or ``sqlite`` to export the records to a JSON Lines file or an SQLite database.
     The ``-f`` option can be used to specify a specific filename to export to. 
-    Note, `.yaml` and `.md` are added to the filename automatically.
+    Note, `.yaml`, `.md`, `.jsonl`, and `.sqlite` are added to the filename automatically. 
+    Use ``-f -`` to write the export to the standard output instead (except for ``sqlite``).
+    The records are written one by one so even very large registries can be exported without holding the entire manifest in memory.
+    The ``-q <query>`` option only exports the records matching a flag query such as ``'results AND NOT tmp'``.
+    The ``--federated`` option also exports the records of all registries nested below the current one (with their paths relative to the current registry).
+    The ``-j <jobs>`` option loads and renders the records in parallel processes (the output stays the same).
+    The rendered ``yaml`` and ``md`` records are cached within the registry, so repeated exports only render the records 
+    that changed since the last export. Use ``--no-cache`` to render all records anew without using the cache.
 """
 
+import filerecords.cli.auxiliary as aux
+
 def setup( parent ):
     """
     Set up the CLI
     """
     descr = "Export the registry to a file manifest."
     parser = parent.add_parser( "export", description = descr, help = descr )
-    parser.add_argument( "format", help = "The export format, which can be either yaml, markdown, or both.", choices = ["md", "yaml", "both"] )
-    parser.add_argument( "-f", "--filename", help = "The filename to export to. If not specified, a default 'registry-{timestamp}' file will be created.", default = None )
+    parser.add_argument( "format", help = "The export format, which can be either yaml, markdown, or both, or jsonl (JSON Lines), or sqlite (an SQLite database).", choices = ["md", "yaml", "both", "jsonl", "sqlite"] )
+    parser.add_argument( "-f", "--filename", help = "The filename to export to. If not specified, a default 'registry-{timestamp}' file will be created. Use '-' to write to the standard output.", default = None )
+    parser.add_argument( "-j", "--jobs", help = "The number of processes to load and render the records with.", type = int, default = None )
+    aux._add_query_argument( parser )
+    parser.add_argument( "--federated", help = "Also include all registries nested below this one.", action = "store_true", default = False )
+    parser.add_argument( "--no-cache", help = "Render all records anew instead of reusing the cached records of previous exports.", dest = "cache", action = "store_false", default = True )
     parser.set_defaults( func = export )
 
 
@@ -29,20 +44,43 @@ def export( args ):
     import filerecords.api as api
     import filerecords.api.settings as settings
     from datetime import datetime
+    import sys
     # from filerecords.api.utils import log
  
     # logger = log()
+    if not aux._check_query( args ):
+        return
     reg = api.Registry( "." )
 
     if args.filename is None:
         timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
         args.filename = f"{settings.registry_export_name}-{timestamp}"
 
+    if args.filename == "-":
+        if args.format == "yaml" or args.format == "both":
+            reg.write_yaml( sys.stdout, timestamp = True, jobs = args.jobs, cache = args.cache, query = args.query, federated = args.federated )
+        if args.format == "md" or args.format == "both":
+            reg.write_markdown( sys.stdout, timestamp = True, jobs = args.jobs, cache = args.cache, query = args.query, federated = args.federated )
+        if args.format == "jsonl":
+            reg.write_jsonl( sys.stdout, jobs = args.jobs, query = args.query, federated = args.federated )
+        if args.format == "sqlite":
+            print( "Cannot write an SQLite database to the standard output, please specify a filename." )
+        return
+
     if args.format == "yaml" or args.format == "both":
-        reg.to_yaml( timestamp = True, filename = args.filename + ".yaml" )
+        with open( args.filename + ".yaml", "w" ) as f:
+            reg.write_yaml( f, timestamp = True, jobs = args.jobs, cache = args.cache, query = args.query, federated = args.federated )
 
     if args.format == "md" or args.format == "both":
-        reg.to_markdown( timestamp = True, filename = args.filename + ".md" )
+        with open( args.filename + ".md", "w" ) as f:
+            reg.write_markdown( f, timestamp = True, jobs = args.jobs, cache = args.cache, query = args.query, federated = args.federated )
+
+    if args.format == "jsonl":
+        with open( args.filename + ".jsonl", "w" ) as f:
+            reg.write_jsonl( f, jobs = args.jobs, query = args.query, federated = args.federated )
+
+    if args.format == "sqlite":
+        reg.to_sqlite( args.filename + ".sqlite", timestamp = True, jobs = args.jobs, query = args.query, federated = args.federated )
 
     # logger.info( f"Exported registry to {args.filename}" )
     print( f"Exported registry to {args.filename}" )
\ No newline at end of file
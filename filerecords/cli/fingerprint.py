@@ -0,0 +1,54 @@
+"""
+The `records fingerprint` command can be used to record the content hashes of the recorded files.
+Only files that were not hashed yet, or whose size, modification time, or inode changed since they were last hashed, are hashed (again).
+
+Usage
+-----
+
+    >>> records fingerprint [-f <flag>] [-e <pattern>] [-q <query>] [-j <jobs>] [--force]
+
+    ``-f <flag>``, ``-e <pattern>``, and ``-q <query>`` (a flag query such as ``'results AND NOT tmp'``) restrict the fingerprinting to matching records.
+    ``-j <jobs>`` sets the number of processes to hash files with. 
+    ``--force`` hashes all files again regardless of their stats.
+"""
+
+import filerecords.cli.auxiliary as aux
+
+def setup( parent ):
+    """
+    Set up the CLI
+    """
+    descr = "Record the content hashes of the recorded files."
+    parser = parent.add_parser( "fingerprint", description = descr, help=descr )
+    parser.add_argument( "-f", "--flag", help = "The flag to search for (or 'group:<label>' for a flag group). To search for multiple flags use a flag query instead, e.g. -q 'a AND (b OR NOT c)'.", default = None )
+    parser.add_argument( "-e", "--pattern", help = "The regular expression to search for.", default = None )
+    parser.add_argument( "-j", "--jobs", help = "The number of processes to hash files with. By default all available CPUs are used.", type = int, default = None )
+    parser.add_argument( "--force", help = "Hash all files again, even if their stats did not change.", action = "store_true", default = False )
+    aux._add_query_argument( parser )
+    parser.set_defaults( func = fingerprint )
+
+def fingerprint( args ):
+    """
+    The core function to fingerprint recorded files.
+    """
+    import filerecords.api as api
+    import os
+
+    if not aux._check_query( args ):
+        return
+    reg = api.Registry( "." )
+
+    results = reg.fingerprint( pattern = args.pattern, flag = args.flag, jobs = args.jobs, force = args.force, query = args.query )
+
+    hashed = 0
+    for record, status in results:
+        filename = os.path.relpath( record.path )
+        if status == "missing":
+            print( f"File {filename} does not exist!" )
+            continue
+
+        hashed += 1
+        if status == "changed":
+            print( f"File {filename} has changed contents!" )
+
+    print( f"Fingerprinted {hashed} files." )
@@ -4,14 +4,17 @@ The `records flag` command can be used to add flags to a specific file or the re
 Usage
 -----
 
-    >>> records flag [-f <flags>] [-g <groupname> : <grouplabels>] <filename>
+    >>> records flag [-f <flags>] [-g <groupname> : <grouplabels>] [-r] [--glob <pattern>] [--exclude <pattern>] <filename>
 
     where ``<filename>`` is the path to the file to comment. If left blank the flag is added to the registry itself.
     ``-f <flags>``, adds any number of flags. These can include defined flag group labels.
     ``-g <groupname> : <grouplabels>``, will define a flag group in the registry. 
     ``-f`` and ``-g`` can be provided at the same time. 
+    ``-r``, ``--glob <pattern>`` and ``--exclude <pattern>`` select the files within directories to flag, just like for ``records comment``.
 """
 
+import filerecords.cli.auxiliary as aux
+
 
 def setup( parent ):
     """
@@ -23,6 +26,8 @@ def setup( parent ):
     parser.add_argument( "-f", "--flags", help = "Add flags.", nargs="+", default = None )
     parser.add_argument( "-g", "--group", help = "Add flag groups to the registry. Flag groups can be specified via '<name> : <flag1> <flag2>...' syntax. Note, this option specifies a single group. It can be supplied multiple times to specify multiple groups in one go.", nargs="+", action = "append", default = None )
 
+    aux._add_target_arguments( parser )
+
     parser.set_defaults( func = flag )
 
 def flag( args ):
@@ -30,7 +35,6 @@ def flag( args ):
     The core function to add comments.
     """
     import filerecords.api as api
-    import filerecords.cli.auxiliary as aux
     # import filerecords.api.utils as utils
 
     # logger = utils.log()
@@ -42,25 +46,38 @@ def flag( args ):
 
     if args.flags:
 
+        if args.recursive or args.glob:
+            args.filename = aux._collect_targets( args )
+            if not args.filename:
+                print( "No matching files found." )
+                return
+
         if not args.filename:
             if args.flags:
                 reg.add_flags( args.flags )
             reg.save()
         
         elif isinstance( args.filename, list ): 
-            for filename in args.filename:
-                args.filename = filename
-                _flag_file( args, reg )
+            _flag_files( args, reg )
 
         else:
-            _flag_file( args, reg )
+            args.filename = [ args.filename ]
+            _flag_files( args, reg )
 
-def _flag_file(args, reg):
+def _flag_files(args, reg):
     """
     The core function to add flags to file records.
     """
-    record = reg.get_record( args.filename )
-    if record is None:
-        reg.add( args.filename, flags = args.flags )
-    else:
-        reg.update( args.filename, flags = args.flags )
\ No newline at end of file
+    new, recorded = [], []
+    for filename in dict.fromkeys( args.filename ):
+        if reg.get_record( filename ) is None:
+            new.append( filename )
+        else:
+            recorded.append( filename )
+
+    # all files are written together at the end
+    with reg.transaction():
+        if new:
+            reg.add_many( new, flags = args.flags )
+        if recorded:
+            reg.update_many( recorded, flags = args.flags )
\ No newline at end of file
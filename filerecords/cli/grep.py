@@ -0,0 +1,54 @@
+"""
+The `records grep` command can be used to find recorded files by the words used in their comments.
+
+Usage
+-----
+
+    >>> records grep [-n <number>] <terms>
+
+    where ``<terms>`` are one or more words that must all appear in a comment of a file. 
+    Words ending with a ``*`` match all words starting with them (e.g. ``'seq*'``).
+    The best matching files are listed first together with their matching comments. 
+    ``-n <number>``, only lists the given number of best matching files.
+
+    Note
+    ----
+    The first search builds a full-text index of all comments, which is kept up to date from then on,
+    so subsequent searches are fast even for very large registries.
+"""
+
+import filerecords.cli.auxiliary as aux
+
+def setup( parent ):
+    """
+    Set up the CLI
+    """
+    descr = "Find file records by the words in their comments."
+    parser = parent.add_parser( "grep", description = descr, help = descr )
+    parser.add_argument( "terms", nargs = "+", help = "The words to search for. Words ending with a '*' match all words starting with them." )
+    parser.add_argument( "-n", "--number", help = "Only list this many of the best matching files.", type = int, default = None )
+    parser.set_defaults( func = grep )
+
+def grep( args ):
+    """
+    The core function to search the comments.
+    """
+    import filerecords.api.settings as settings
+    import filerecords.api.utils as utils
+
+    logger = utils.log()
+    reg = aux._get_registry()
+
+    matches = reg.search_comments( args.terms, limit = args.number )
+
+    if len( matches ) == 0:
+        logger.info( "No records found." )
+        return
+
+    output = ""
+    for record, comments in matches:
+        output += f"{record.relpath[3:]}  ({', '.join(record.flags)})\n"
+        for timestamp, entry in comments.items():
+            output += f"    {settings.comment_format( entry['comment'], entry['user'], timestamp )}\n"
+
+    print( output.rstrip() )
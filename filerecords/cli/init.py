@@ -3,11 +3,13 @@ The `records init` command can be used to initialize a new registry in the curre
 
 Usage:
 
-    >>> records init [-c <comment>] [-g <groupname> : <grouplabels>] [-g <groupname> : <grouplabels>]
+    >>> records init [-c <comment>] [-g <groupname> : <grouplabels>] [-g <groupname> : <grouplabels>] [-b <yaml|sqlite>]
 
     -c <comment> : Adds a comment or description to the registry that is initialized.
     -g <groupname> : Adds a label group to the registry. Label groups can be specified via '<name> : <label1> <label2>...' syntax. 
     Note, this option specifies a single group. It can be supplied multiple times to specify multiple groups in one go.
+    -b <yaml|sqlite|journal> : The storage backend of the registry. `yaml` stores one file per record, `sqlite` stores the entire registry in a single database file (recommended for large registries),
+    `journal` stores the same files as `yaml` but only appends the changes to a journal (recommended for registries that are changed very often, see `records compact`).
 
 Flags and Flag groups
 ---------------------
@@ -27,6 +29,7 @@ def setup( parent ):
     parser.add_argument( "-f", "--flags", help = "Add flags.", nargs="+", default = None)
     parser.add_argument( "-g", "--group", help = "Add flag groups to the registry. Flag groups can be specified via '<name> : <flag1> <flag2>...' syntax. Note, this option specifies a single group. It can be supplied multiple times to specify multiple groups in one go.", nargs="+", action = "append", default = None )
     parser.add_argument ("-i", "--gitignore", help = "Add the registry to .gitignore", action = "store_true" )
+    parser.add_argument( "-b", "--backend", help = "The storage backend of the registry. By default 'yaml' (one file per record) is used, 'sqlite' stores the entire registry in a single database file, 'journal' appends all changes to a journal.", choices = ["yaml", "sqlite", "journal"], default = None )
     parser.set_defaults( func = init )
 
 
@@ -40,7 +43,7 @@ def init( args ):
 
     logger = utils.log()
 
-    reg = api.Registry( "." )
+    reg = api.Registry( ".", backend = args.backend )
 
     if not reg._initialized and reg.base_has_registry():
         logger.info( "A registry already exists in this directory. Skipping initialization. Use the clear command to clear the registry." )
@@ -49,7 +52,7 @@ def init( args ):
     # the init of the Registry should have
     # already taken care of this but just to be sure...
     elif not reg._initialized:
-        reg.init()
+        reg.init( backend = args.backend )
 
     if args.comment:
         reg.add_comment( args.comment )
@@ -6,18 +6,22 @@ using the ``-f`` and ``-e`` flags.
 Usage
 -----
 
-    >>> records list [-f <flag>] [-e <pattern>]
+    >>> records list [-f <flag>] [-e <pattern>] [-q <query>] [--federated]
 
     where ``<flag>``, is a flag to search for and ``<pattern>``, is a regular expression to search for.
     Both ``<flag>`` and ``<pattern>`` *can* be specified at the same time. 
+    ``<query>``, is a flag query combining multiple flags such as ``'results AND NOT tmp OR group:final'``.
+    ``--federated``, also searches all registries nested below the current one (the paths are listed relative to the current registry).
 
     Note
     ----
-    The ``-f`` flag can only be used to search for a single flag. To search for multiple flags at a time, define a flag group first and then search for it's label using 'group:your_group'.
+    The ``-f`` flag searches for a single flag (or a flag group using ``group:<label>``). To search for multiple flags at a time,
+    use a flag query instead, e.g. ``-q 'a AND (b OR NOT c)'`` (see ``filerecords.api.flag_query``).
 
 
 """
 
+import filerecords.cli.auxiliary as aux
 
 def setup( parent ):
     """
@@ -25,21 +29,24 @@ def setup( parent ):
     """
     descr = "List file records."
     parser = parent.add_parser( "list", description = descr, help = descr )
-    parser.add_argument( "-f", "--flag", help = "The flag search for. Note, this may only be a single flag! To search for multiple flags at a time, define a flag group first and then search for it's label using 'group:your_group'.", default = None )
+    parser.add_argument( "-f", "--flag", help = "The flag to search for (or 'group:<label>' for a flag group). To search for multiple flags use a flag query instead, e.g. -q 'a AND (b OR NOT c)'.", default = None )
     parser.add_argument( "-e", "--pattern", help = "The regular expression to search for.", default = None )
+    aux._add_query_argument( parser )
+    parser.add_argument( "--federated", help = "Also include all registries nested below this one.", action = "store_true", default = False )
     parser.set_defaults( func = search )
 
 def search( args ):
     """
     The core function to search for entries.
     """
-    import filerecords.api as api
     import filerecords.api.utils as utils
 
     logger = utils.log()
-    reg = api.Registry( "." )
+    if not aux._check_query( args ):
+        return
+    reg = aux._get_registry()
 
-    records = reg.search( args.pattern, flag = args.flag )
+    records = reg.search( args.pattern, flag = args.flag, query = args.query, federated = args.federated )
 
     if len( records ) == 0:
         logger.info( "No records found." )
@@ -47,6 +54,6 @@ def search( args ):
     
     output = ""
     for record in records:
-        output += f"{record.relpath[3:]}  ({', '.join(record.flags)})\n"
+        output += f"{reg.get_relpath( record )[3:]}  ({', '.join(record.flags)})\n"
 
     print( output.rstrip() )
\ No newline at end of file
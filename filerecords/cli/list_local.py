@@ -5,49 +5,52 @@ The results can be restricted using flags or regex patterns.
 Usage
 -----
 
-    >>> records ls [-f <flag>] [-e <pattern>]
+    >>> records ls [-r] [-f <flag>] [-e <pattern>] [-q <query>]
 
     where ``<flag>``, is a flag to search for and ``<pattern>``, is a regular expression to search for.
     Both ``<flag>`` and ``<pattern>`` *can* be specified at the same time. 
+    ``<query>``, is a flag query combining multiple flags such as ``'results AND NOT tmp OR group:final'``.
+    ``-r``, also lists the files within all sub-directories of the current directory.
 
     Note
     ----
-    The ``-f`` flag can only be used to search for a single flag. To search for multiple flags at a time, define a flag group first and then search for it's label using 'group:your_group'.
+    The ``-f`` flag searches for a single flag (or a flag group using ``group:<label>``). To search for multiple flags at a time,
+    use a flag query instead, e.g. ``-q 'a AND (b OR NOT c)'`` (see ``filerecords.api.flag_query``).
 
 """
 
+import filerecords.cli.auxiliary as aux
+
 def setup( parent ):
     """
     Set up the CLI
     """
     descr = "List files in the current directory that have records."
     parser = parent.add_parser( "ls", description = descr, help = descr )
-    parser.add_argument( "-f", "--flag", help = "The flag search for. Note, this may only be a single flag! To search for multiple flags at a time, define a flag group first and then search for it's label using 'group:your_group'.", default = None )
+    parser.add_argument( "-f", "--flag", help = "The flag to search for (or 'group:<label>' for a flag group). To search for multiple flags use a flag query instead, e.g. -q 'a AND (b OR NOT c)'.", default = None )
     parser.add_argument( "-e", "--pattern", help = "The regular expression to search for.", default = None )
+    parser.add_argument( "-r", "--recursive", help = "Also list the files within all sub-directories.", action = "store_true", default = False )
+    aux._add_query_argument( parser )
     parser.set_defaults( func = search )
 
 def search( args ):
     """
     The core function to search for entries in the local directory.
     """
-    
-    import os, subprocess
-    import filerecords.api as api
     import filerecords.api.utils as utils
 
     logger = utils.log()
+    if not aux._check_query( args ):
+        return
+
+    reg = aux._get_registry()
+
+    if not args.pattern and not args.flag and not args.query:
+        logger.warning( "No search criteria specified, listing all records in the directory." )
 
-    reg = api.Registry( "." )
-        
-    records = reg.search( args.pattern, flag = args.flag )
-
-    # now restrict to those records that are stored in the current directory.
-    # The current directory can either be specified by a path or be the base directory anway
-    # in which case the relpath is empty.
-    current = subprocess.check_output( "pwd", shell = True ).decode() # os.getcwd() keeps resolving symbolic links and without shell the same here...
-    current = os.path.relpath( current.strip(), reg.registry_dir )
-    logger.debug( f"{current=}")
-    records = [ i for i in records if os.path.dirname( i.relpath ) == current ]
+    # only the records within the current directory are looked up
+    # (the registry's directory is the logical path, keeping symbolic links, of the current directory)
+    records = reg.list_dir( ".", recursive = args.recursive, pattern = args.pattern, flag = args.flag, query = args.query )
 
     if len( records ) == 0:
         logger.info( "No records found." )
@@ -0,0 +1,79 @@
+"""
+The `records log` command can be used to list the comments of a given file (or the registry itself) within a time range.
+
+Usage
+-----
+
+    >>> records log [--since <time>] [--until <time>] <filename>
+
+    where ``<filename>`` is the file of interest. If left blank the registry's own comments are listed.
+    ``--since <time>``, only lists comments from this time on. ``--until <time>``, only lists comments up to this time.
+    Times are given as ``YYYY-MM-DD`` or ``YYYY-MM-DD HH:MM:SS``. A date alone as ``--until`` includes the entire day.
+"""
+
+import filerecords.cli.auxiliary as aux
+
+def setup( parent ):
+    """
+    Set up the CLI
+    """
+    descr = "List a file's comments within a time range."
+    parser = parent.add_parser( "log", description = descr, help = descr )
+    parser.add_argument( "filename", nargs = "*", help = "The file whose comments to list. If left blank the registry's own comments are listed.", default = None )
+    parser.add_argument( "--since", help = "Only list comments from this time on (YYYY-MM-DD or YYYY-MM-DD HH:MM:SS).", default = None )
+    parser.add_argument( "--until", help = "Only list comments up to this time (YYYY-MM-DD or YYYY-MM-DD HH:MM:SS).", default = None )
+    parser.set_defaults( func = log )
+
+def log( args ):
+    """
+    The core function to list comments.
+    """
+    import filerecords.api.utils as utils
+
+    logger = utils.log()
+
+    try:
+        since = _parse_time( args.since )
+        until = _parse_time( args.until, end_of_day = True )
+    except ValueError as e:
+        logger.error( f"Invalid time: {e}" )
+        return
+
+    reg = aux._get_registry()
+
+    if not args.filename:
+        _print_log( f"{reg.directory} (registry)", reg.comments_between( since, until ) )
+        return
+
+    for filename in args.filename:
+        record = reg.get_record( filename )
+        if record is None:
+            logger.error( f"No record for {filename}" )
+            continue
+        _print_log( f"{filename} ({', '.join(record.flags)})", record.comments_between( since, until ) )
+
+def _parse_time( time : str, end_of_day : bool = False ):
+    """
+    Parse a time given on the command line.
+    """
+    from datetime import datetime, timedelta
+
+    if time is None:
+        return None
+
+    parsed = datetime.fromisoformat( time )
+
+    # a date alone as upper bound is meant to include the entire day
+    if end_of_day and len( time ) <= len( "YYYY-MM-DD" ):
+        parsed += timedelta( days = 1, microseconds = -1 )
+    return parsed
+
+def _print_log( name, comments ):
+    """
+    Print the comments.
+    """
+    import filerecords.api.settings as settings
+
+    print( name )
+    for timestamp, entry in comments.items():
+        print( settings.comment_format( entry["comment"], entry["user"], timestamp ) )
@@ -10,7 +10,7 @@ Usage
     
 """
 
-
+import filerecords.cli.auxiliary as aux
 
 def setup( parent ):
     """
@@ -25,11 +25,10 @@ def lookup( args ):
     """
     The core function to look up the latest comment.
     """
-    import filerecords.api as api
     import filerecords.api.utils as utils
     
     logger = utils.log()
-    reg = api.Registry( "." )
+    reg = aux._get_registry()
 
     if not args.filename:
         last = reg.lookup_last()
@@ -1,50 +1,80 @@
 """
-This is the main command line interface for `filerecords`. 
+This is the main command line interface for `filerecords`.
+
+The sub-commands are only registered by name here. The module implementing a command
+(and setting up its arguments) is only imported once that command is actually called.
+
+If a `records serve` daemon is running, the read-only commands listed in `served` are sent to 
+the daemon instead, which answers them from registries kept in memory (see `filerecords.cli.serve`).
 """
 
 import argparse
-import filerecords.cli.init as init
-import filerecords.cli.comment as comment
-import filerecords.cli.flag as flag
-import filerecords.cli.move as move
-import filerecords.cli.remove as remove
-import filerecords.cli.undo as undo
-import filerecords.cli.list as list
-import filerecords.cli.list_local as list_local
-import filerecords.cli.lookup as lookup
-import filerecords.cli.read as read 
-import filerecords.cli.clear as clear
-import filerecords.cli.export as export
-import filerecords.cli.destroy as destroy
-import filerecords.cli.screen as screen
+import importlib
+import sys
+
+commands = {
+    "init" : ( "filerecords.cli.init", "Initialize a new registry within the current directory." ),
+    "comment" : ( "filerecords.cli.comment", "Add comments to files or the registry itself." ),
+    "flag" : ( "filerecords.cli.flag", "Add flags to files or the registry itself (can also be done with comment), and define flag groups (this command only)." ),
+    "undo" : ( "filerecords.cli.undo", "Remove flags or the latest comment from a file or directory." ),
+    "lookup" : ( "filerecords.cli.lookup", "Look up a file's latest comment." ),
+    "read" : ( "filerecords.cli.read", "Read a file's records." ),
+    "log" : ( "filerecords.cli.log", "List a file's comments within a time range." ),
+    "mv" : ( "filerecords.cli.move", "Move / rename files or directories in the registry." ),
+    "rm" : ( "filerecords.cli.remove", "Remove files from the registry." ),
+    "list" : ( "filerecords.cli.list", "List file records." ),
+    "grep" : ( "filerecords.cli.grep", "Find file records by the words in their comments." ),
+    "ls" : ( "filerecords.cli.list_local", "List files in the current directory that have records." ),
+    "export" : ( "filerecords.cli.export", "Export the registry to a file manifest." ),
+    "screen" : ( "filerecords.cli.screen", "Screen the recorded files at their recorded locations." ),
+    "fingerprint" : ( "filerecords.cli.fingerprint", "Record the content hashes of the recorded files." ),
+    "relink" : ( "filerecords.cli.relink", "Find moved files and update their records to the new locations." ),
+    "compact" : ( "filerecords.cli.compact", "Fold the journal of the registry into its other files." ),
+    "clear" : ( "filerecords.cli.clear", "Clear the registry." ),
+    "destroy" : ( "filerecords.cli.destroy", "Remove the registry." ),
+    "serve" : ( "filerecords.cli.serve", "Keep registries in memory to answer other records commands faster." ),
+}
+"""The available sub-commands with the module implementing them and a short help message."""
+
+served = ( "lookup", "log", "list", "ls", "grep" )
+"""The (read-only) sub-commands that are sent to a running `records serve` daemon."""
 
 def setup():
     """
     Setup the command line interface.
     """
+    argv = sys.argv[1:]
+    if _get_command( argv ) in served:
+        import filerecords.cli.serve as serve
+        if serve.forward( argv ):
+            return
+
+    run( argv )
+
+def run( argv : list ):
+    """
+    Parse the command line arguments and run the called sub-command.
+
+    Parameters
+    ----------
+    argv : list
+        The command line arguments (without the program name).
+    """
     descr = "filerecords – a command line tool for storing file metadata in a structured way."
     parser = argparse.ArgumentParser( description = descr )
     parser.add_argument("-v", "--version", action="store_true", help="Show version")
     subparsers = parser.add_subparsers(help="Available commands")
 
-    # Add the sub-commands here.
-    init.setup(subparsers)
-    comment.setup(subparsers)
-    flag.setup(subparsers)
-    undo.setup(subparsers)
-    lookup.setup(subparsers)
-    read.setup(subparsers)
-    move.setup(subparsers)
-    remove.setup(subparsers)
-    list.setup(subparsers)
-    list_local.setup(subparsers)
-    export.setup(subparsers)
-    screen.setup(subparsers)
-    clear.setup(subparsers)
-    destroy.setup(subparsers)
-    
-
-    args = parser.parse_args()
+    # Add the sub-commands here. Only the called
+    # command is fully set up, the others are just listed.
+    command = _get_command( argv )
+    for name, ( module, descr ) in commands.items():
+        if name == command:
+            importlib.import_module( module ).setup( subparsers )
+        else:
+            subparsers.add_parser( name, help = descr )
+
+    args = parser.parse_args( argv )
 
     if args.version:
         print("filerecords version 0.0.1")
@@ -52,5 +82,26 @@ def setup():
     else:
         args.func( args )
 
+def _get_command( argv : list ):
+    """
+    Get the name of the sub-command that was called.
+
+    Parameters
+    ----------
+    argv : list
+        The command line arguments (without the program name).
+
+    Returns
+    -------
+    str or None
+        The name of the sub-command or None if no sub-command was called.
+    """
+    # the main parser itself only has flags without values
+    # so the first positional argument is the sub-command.
+    for arg in argv:
+        if not arg.startswith( "-" ):
+            return arg if arg in commands else None
+    return None
+
 if __name__ == "__main__":
-    setup()
\ No newline at end of file
+    setup()
@@ -0,0 +1,40 @@
+"""
+The `records relink` command can be used to find recorded files that were moved without using `records mv`,
+and to update their records to the new locations. 
+
+Usage
+-----
+
+    >>> records relink [-n]
+
+    The files of all records whose file is missing are searched for within the project (the directory containing the registry).
+    Files are matched by their inode and size, or their size and content hash (see `records fingerprint`), 
+    or their size and modification time.
+    ``-n`` only reports the matches without updating the records.
+"""
+
+def setup( parent ):
+    """
+    Set up the CLI
+    """
+    descr = "Find moved files and update their records to the new locations."
+    parser = parent.add_parser( "relink", description = descr, help=descr )
+    parser.add_argument( "-n", "--dry-run", help = "Only report the found files without updating the records.", action = "store_true", default = False )
+    parser.set_defaults( func = relink )
+
+def relink( args ):
+    """
+    The core function to relink moved files.
+    """
+    import filerecords.api as api
+    import os
+
+    reg = api.Registry( "." )
+
+    relinked = reg.relink( dry_run = args.dry_run )
+    for record, previous, new in relinked:
+        previous = os.path.relpath( os.path.join( reg.registry_dir, previous ) )
+        new = os.path.relpath( os.path.join( reg.registry_dir, new ) )
+        print( f"{previous} -> {new}" )
+
+    print( f"Relinked {len( relinked )} files." if not args.dry_run else f"Found {len( relinked )} moved files." )
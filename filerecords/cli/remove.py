@@ -33,9 +33,11 @@ def remove( args ):
     reg = api.Registry( "." )
 
     if isinstance( args.filename, list ):
-        for f in args.filename:
-            reg.remove( f, keep_file = args.keep )
-            print( f"Removed {f} from the registry." )
+        # all records are removed together at the end
+        with reg.transaction():
+            for f in args.filename:
+                reg.remove( f, keep_file = args.keep )
+                print( f"Removed {f} from the registry." )
     else:
         reg.remove( args.filename, keep_file = args.keep )
         print( f"Removed {args.filename} from the registry." )
@@ -1,21 +1,31 @@
 """
-The `records screen` command can be used to check if all recorded files still exist at their recorded locations. 
+The `records screen` command can be used to check if all recorded files still exist at their recorded locations,
+and whether they have changed (in size or modification time) since they were last commented.
 
 Usage
 -----
 
-    >>> records screen
+    >>> records screen [-f <flag>] [-e <pattern>] [-q <query>] [-j <jobs>] [--federated]
 
+    ``-f <flag>``, ``-e <pattern>``, and ``-q <query>`` (a flag query such as ``'results AND NOT tmp'``) restrict the screening to matching records.
+    ``--federated`` also screens the records of all registries nested below the current one.
+    ``-j <jobs>`` sets the number of files that are checked at the same time.
+    The results are reported as soon as they are available.
 """
 
+import filerecords.cli.auxiliary as aux
+
 def setup( parent ):
     """
     Set up the CLI
     """
     descr = "Screen the recorded files at their recorded locations."
     parser = parent.add_parser( "screen", description = descr, help=descr )
-    parser.add_argument( "-f", "--flag", help = "The flag search for. Note, this may only be a single flag! To search for multiple flags at a time, define a flag group first and then search for it's label using 'group:your_group'.", default = None )
+    parser.add_argument( "-f", "--flag", help = "The flag to search for (or 'group:<label>' for a flag group). To search for multiple flags use a flag query instead, e.g. -q 'a AND (b OR NOT c)'.", default = None )
     parser.add_argument( "-e", "--pattern", help = "The regular expression to search for.", default = None )
+    parser.add_argument( "-j", "--jobs", help = "The number of files to check at the same time.", type = int, default = None )
+    aux._add_query_argument( parser )
+    parser.add_argument( "--federated", help = "Also include all registries nested below this one.", action = "store_true", default = False )
     parser.set_defaults( func = screen )
 
 def screen( args ):
@@ -28,10 +38,15 @@ def screen( args ):
     # from filerecords.api.utils import log
         
     # logger = log()
+    if not aux._check_query( args ):
+        return
     reg = api.Registry( "." )
 
-    print( "Screening..." )
-    for record in reg.search( pattern = args.pattern, flag = args.flag ):
-        if not os.path.exists( record.filename ):
-            print( f"File {record.filename} does not exist!" )
-    print( "Screening finished." )
\ No newline at end of file
+    print( "Screening...", flush = True )
+    for record, status in reg.screen( pattern = args.pattern, flag = args.flag, jobs = args.jobs, query = args.query, federated = args.federated ):
+        filename = os.path.relpath( record.path )
+        if status == "missing":
+            print( f"File {filename} does not exist!", flush = True )
+        else:
+            print( f"File {filename} has changed since it was last commented!", flush = True )
+    print( "Screening finished." )
@@ -0,0 +1,223 @@
+"""
+The `records serve` command starts a daemon that keeps registries loaded in memory,
+so other `records` commands can be answered without loading the registry anew every time.
+
+While the daemon is running, the read-only commands (`lookup`, `log`, `list`, `ls`, and `grep`) send their
+arguments to the daemon over a Unix domain socket, and print the output they get back. If no daemon is running
+(or it does not respond) the commands simply run by themselves. All other commands always run by themselves.
+The daemon loads a registry again whenever its index or metadata changed, so changes by other commands are always included.
+
+Usage
+-----
+
+    >>> records serve [<directory> ...]
+
+    where ``<directory>`` are directories whose registries are loaded right away.
+    Any other registries are loaded once they are first accessed.
+    The daemon runs until it is interrupted (e.g. using ``Ctrl+C``), to keep it running in the background use:
+
+    >>> records serve &
+
+    The socket is placed in ``$XDG_RUNTIME_DIR`` (or a private directory in ``/tmp``) by default,
+    a different socket can be used by setting the ``FILERECORDS_SOCKET`` environment variable.
+    Commands are only sent to sockets belonging to the user, so other users cannot intercept them.
+"""
+
+import socketserver
+import socket
+import json
+import stat
+import os
+import sys
+
+import filerecords.api.settings as settings
+
+def setup( parent ):
+    """
+    Set up the CLI
+    """
+    descr = "Keep registries in memory to answer other records commands faster."
+    parser = parent.add_parser( "serve", description = descr, help = descr )
+    parser.add_argument( "directory", nargs = "*", help = "The directories whose registries to load right away.", default = None )
+    parser.set_defaults( func = serve )
+
+def serve( args ):
+    """
+    The core function to run the daemon.
+    """
+    import signal
+    import filerecords.api.pool as pool
+    import filerecords.api.utils as utils
+    import filerecords.cli.auxiliary as aux
+
+    logger = utils.log()
+
+    directory = os.path.dirname( settings.server_socket )
+    os.makedirs( directory, mode = 0o700, exist_ok = True )
+    if os.stat( directory ).st_uid not in ( os.getuid(), 0 ):
+        logger.error( f"The directory {directory} belongs to another user, the daemon cannot be served there." )
+        return
+
+    if os.path.lexists( settings.server_socket ):
+        if not _is_own_socket( settings.server_socket ):
+            logger.error( f"{settings.server_socket} is not a socket of yours, it is not replaced." )
+            return
+        if _is_running():
+            logger.error( f"A records daemon is already running at {settings.server_socket}" )
+            return
+
+        # a socket left behind by a daemon that was killed
+        os.remove( settings.server_socket )
+
+    aux._pool = pool.RegistryPool()
+    for directory in args.directory:
+        if not aux._pool.load( directory ):
+            logger.warning( f"No registry found for {directory}" )
+
+    # only the user may send commands to the daemon
+    umask = os.umask( 0o177 )
+    try:
+        server = socketserver.UnixStreamServer( settings.server_socket, _Handler )
+    finally:
+        os.umask( umask )
+
+    signal.signal( signal.SIGTERM, lambda *args: sys.exit( 0 ) )
+    logger.info( f"Serving {len( aux._pool )} registries at {settings.server_socket}" )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.remove( settings.server_socket )
+        aux._pool = None
+
+def forward( argv : list ) -> bool:
+    """
+    Send a command to the running daemon and print its output.
+
+    Parameters
+    ----------
+    argv : list
+        The command line arguments (without the program name).
+
+    Returns
+    -------
+    bool
+        True if the command was answered by the daemon, False if it has to be run directly
+        (because no daemon is running or it did not respond).
+    """
+    # sockets of other users (e.g. created at the same path first) are never trusted
+    if not _is_own_socket( settings.server_socket ):
+        return False
+
+    request = { "argv" : argv, "cwd" : os.getcwd(), "pwd" : os.environ.get( "PWD" ) }
+    try:
+        with socket.socket( socket.AF_UNIX, socket.SOCK_STREAM ) as connection:
+            connection.settimeout( settings.server_timeout )
+            connection.connect( settings.server_socket )
+            connection.sendall( json.dumps( request ).encode() + b"\n" )
+            with connection.makefile( "rb" ) as stream:
+                response = json.loads( stream.readline() )
+    except ( OSError, ValueError ):
+        return False
+
+    sys.stdout.write( response["stdout"] )
+    sys.stderr.write( response["stderr"] )
+    sys.stdout.flush()
+    if response["status"]:
+        sys.exit( response["status"] )
+    return True
+
+def _is_own_socket( path : str ) -> bool:
+    """
+    Check whether a path is a socket belonging to the user.
+    """
+    try:
+        info = os.lstat( path )
+    except FileNotFoundError:
+        return False
+    return stat.S_ISSOCK( info.st_mode ) and info.st_uid == os.getuid()
+
+def _is_running() -> bool:
+    """
+    Check whether a daemon is listening at the socket.
+    """
+    try:
+        with socket.socket( socket.AF_UNIX, socket.SOCK_STREAM ) as connection:
+            connection.connect( settings.server_socket )
+        return True
+    except OSError:
+        return False
+
+def _run( argv : list, cwd : str, pwd : str = None ) -> dict:
+    """
+    Run a command within the daemon as if it was called in the given working directory.
+
+    Parameters
+    ----------
+    argv : list
+        The command line arguments (without the program name).
+    cwd : str
+        The working directory of the caller.
+    pwd : str
+        The caller's `$PWD` (which keeps symbolic links).
+
+    Returns
+    -------
+    dict
+        The `stdout` and `stderr` of the command, and its exit `status`.
+    """
+    import contextlib
+    import io
+    import logging
+    import traceback
+    import filerecords.cli.main as main
+
+    stdout, stderr = io.StringIO(), io.StringIO()
+    status = 0
+
+    # the logger writes to the stdout it was set up with, so it is redirected separately
+    handlers = [ i for i in logging.getLogger( "filerecords" ).handlers if type( i ) is logging.StreamHandler ]
+    streams = [ i.setStream( stdout ) for i in handlers ]
+    previous = ( os.getcwd(), os.environ.get( "PWD" ) )
+    try:
+        os.chdir( cwd )
+        _set_pwd( pwd )
+        with contextlib.redirect_stdout( stdout ), contextlib.redirect_stderr( stderr ):
+            if main._get_command( argv ) not in main.served:
+                raise ValueError( f"The command {argv} cannot be run by the daemon." )
+            main.run( argv )
+
+    except SystemExit as e:
+        status = e.code if isinstance( e.code, int ) else int( e.code is not None )
+    except Exception:
+        stderr.write( traceback.format_exc() )
+        status = 1
+
+    finally:
+        for handler, stream in zip( handlers, streams ):
+            handler.setStream( stream )
+        os.chdir( previous[0] )
+        _set_pwd( previous[1] )
+
+    return { "stdout" : stdout.getvalue(), "stderr" : stderr.getvalue(), "status" : status }
+
+def _set_pwd( pwd : str ):
+    """
+    Set (or unset) the `$PWD` of the daemon.
+    """
+    if pwd is None:
+        os.environ.pop( "PWD", None )
+    else:
+        os.environ["PWD"] = pwd
+
+
+class _Handler( socketserver.StreamRequestHandler ):
+    """
+    The handler answering the commands sent to the daemon (one per connection).
+    """
+    def handle( self ):
+        request = json.loads( self.rfile.readline() )
+        response = _run( request["argv"], request["cwd"], request.get( "pwd" ) )
+        self.wfile.write( json.dumps( response ).encode() + b"\n" )
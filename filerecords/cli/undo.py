@@ -50,9 +50,11 @@ def undo( args ):
         reg.save()
 
     elif isinstance( args.filename, list ):
-        for filename in args.filename:
-            args.filename = filename
-            _undo_file( args, logger, reg )
+        # all files are written together at the end
+        with reg.transaction():
+            for filename in args.filename:
+                args.filename = filename
+                _undo_file( args, logger, reg )
             
     else:
         _undo_file( args, logger, reg )
@@ -50,10 +50,13 @@ setuptools.setup(
     ],
 
     install_requires=[
-        "pandas",
         "PyYAML",
         ],
 
+    extras_require={
+        "pandas": [ "pandas" ],
+    },
+
     entry_points={
         "console_scripts": [ 
             "filerecords=filerecords.cli:setup",
@@ -64,6 +64,7 @@ def test_comment_firsttime_file():
     regfile = os.listdir( settings.registry_dir )
     regfile.remove( settings.registry_metafile )
     regfile.remove( settings.indexfile )
+    regfile.remove( settings.lockfile )
 
     assert len( regfile ) == 1, f"len(regfile) != 1, {len(regfile)=}"
 
@@ -77,6 +78,163 @@ def test_comment_firsttime_file():
     
     cleanup()
 
+def test_comment_many_files():
+
+    setup()
+
+    cmd = "touch testfile1 testfile2 testfile3 ; records comment -f manyflag -c 'manycomment' testfile1 testfile2 testfile3 testfile1"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+    assert out.returncode == 0, f"{out.returncode=} instead of 0"
+
+    regfiles = os.listdir( settings.registry_dir )
+    regfiles.remove( settings.registry_metafile )
+    regfiles.remove( settings.indexfile )
+    regfiles.remove( settings.lockfile )
+
+    assert len( regfiles ) == 3, f"len(regfiles) != 3, {len(regfiles)=}"
+
+    for regfile in regfiles:
+        with open( os.path.join( settings.registry_dir, regfile ), "r" ) as f:
+            contents = f.read()
+        assert "manycomment" in contents, f"manycomment appears not in {regfile=}"
+        assert "manyflag" in contents, f"manyflag appears not in {regfile=}"
+
+    cleanup()
+
+def test_flag_many_files():
+
+    setup()
+
+    cmd = "touch testfile1 testfile2 testfile3 ; records comment -c 'firstcomment' testfile1 ; records flag testfile1 testfile2 testfile3 -f manyflag"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+    assert out.returncode == 0, f"{out.returncode=} instead of 0"
+
+    cmd = "records list -f manyflag"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+    for filename in ( "testfile1", "testfile2", "testfile3" ):
+        assert filename in out.stdout.decode(), f"{filename} is not flagged"
+
+    cmd = "records lookup testfile1"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+    assert "firstcomment" in out.stdout.decode(), "the comment of the already recorded file was lost"
+
+    cleanup()
+
+def test_comment_recursive():
+
+    setup()
+
+    cmd = "mkdir -p testsubdir/deeper testsubdir/other ; \
+            touch testsubdir/a.txt testsubdir/b.tsv testsubdir/deeper/c.txt testsubdir/skip.txt testsubdir/other/d.txt ; \
+            mkdir testsubdir/other/.registry ; \
+            records comment -c 'walkcomment' -r testsubdir --glob '*.txt' --exclude 'skip*'"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+    assert out.returncode == 0, f"{out.returncode=} instead of 0"
+
+    with open( os.path.join( settings.registry_dir, settings.indexfile ), "r" ) as f:
+        contents = f.read()
+
+    assert "testsubdir/a.txt" in contents, "testsubdir/a.txt was not commented"
+    assert "testsubdir/deeper/c.txt" in contents, "testsubdir/deeper/c.txt was not commented"
+    assert "b.tsv" not in contents, "testsubdir/b.tsv was commented despite not matching the glob"
+    assert "skip.txt" not in contents, "testsubdir/skip.txt was commented despite being excluded"
+    assert "d.txt" not in contents, "testsubdir/other/d.txt was commented despite belonging to another registry"
+
+    cleanup()
+
+def test_transaction_rollback():
+
+    import filerecords.api as api
+
+    setup()
+    os.system( "touch testfile1 testfile2" )
+
+    reg = api.Registry( "." )
+    reg.add( "testfile1", comment = "first" )
+
+    try:
+        with reg.transaction():
+            reg.update( "testfile1", comment = "second", flags = "rolledback" )
+            reg.add( "testfile2", comment = "never" )
+            raise RuntimeError( "abort" )
+    except RuntimeError:
+        pass
+
+    assert reg.get_record( "testfile2" ) is None, "testfile2 was added despite the rollback"
+    assert "rolledback" not in reg.get_record( "testfile1" ).flags, "flag was added despite the rollback"
+
+    reg = api.Registry( "." )
+    assert reg.get_record( "testfile2" ) is None, "testfile2 was saved despite the rollback"
+    assert len( reg.get_record( "testfile1" ).comments ) == 1, "comment was saved despite the rollback"
+
+    cleanup()
+
+def test_transaction_failed_commit():
+
+    import filerecords.api as api
+    import filerecords.api.utils as utils
+
+    setup()
+    os.system( "touch testfile1 testfile2" )
+
+    reg = api.Registry( "." )
+    reg.add( "testfile1", comment = "first" )
+    regfiles = sorted( os.listdir( settings.registry_dir ) )
+
+    # the index is written after the records, so the records are already written when it fails
+    def fail( *args ):
+        raise OSError( "disk full" )
+
+    save_indexfile = utils.save_indexfile
+    utils.save_indexfile = fail
+    try:
+        with reg.transaction():
+            reg.update( "testfile1", comment = "second", flags = "rolledback" )
+            reg.add( "testfile2", comment = "never" )
+    except OSError:
+        pass
+    finally:
+        utils.save_indexfile = save_indexfile
+
+    assert reg.get_record( "testfile2" ) is None, "testfile2 was added despite the rollback"
+    assert sorted( os.listdir( settings.registry_dir ) ) == regfiles, "entry files were written (or left behind) despite the rollback"
+
+    reg = api.Registry( "." )
+    record = reg.get_record( "testfile1" )
+    assert len( record.comments ) == 1, "comment was saved despite the rollback"
+    assert "rolledback" not in record.flags, "flag was saved despite the rollback"
+
+    cleanup()
+
+def test_concurrent_comments():
+
+    import filerecords.api as api
+
+    setup()
+    os.system( "touch testfile_shared " + " ".join( f"testfile{i}" for i in range( 20 ) ) )
+
+    # every job comments its own file and the shared file at the same time
+    jobs = [ subprocess.Popen( f"records comment testfile{i} -c 'comment{i}' ; records comment testfile_shared -c 'shared{i}' -f shared{i}", shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL ) for i in range( 20 ) ]
+    for job in jobs:
+        job.wait()
+
+    reg = api.Registry( "." )
+    assert len( reg.index ) == 21, f"{len(reg.index)=} instead of 21, index rows were lost"
+
+    record = reg.get_record( "testfile_shared" )
+    assert len( record.comments ) == 20, f"{len(record.comments)=} instead of 20, comments were lost"
+    assert sorted( reg.index.get_flags( record.id ) ) == sorted( f"shared{i}" for i in range( 20 ) ), "flags were lost"
+
+    regfiles = os.listdir( settings.registry_dir )
+    assert len( regfiles ) == 24, f"{len(regfiles)=} instead of 24, entries were left behind"
+
+    cleanup()
+
 def test_comment_secondtime_file():
 
     setup()
@@ -89,6 +247,7 @@ def test_comment_secondtime_file():
     regfile = os.listdir( settings.registry_dir )
     regfile.remove( settings.registry_metafile )
     regfile.remove( settings.indexfile )
+    regfile.remove( settings.lockfile )
 
     assert len( regfile ) == 1
 
@@ -121,6 +280,7 @@ def test_comment_from_subdir():
     regfile = os.listdir( settings.registry_dir )
     regfile.remove( settings.registry_metafile )
     regfile.remove( settings.indexfile )
+    regfile.remove( settings.lockfile )
 
     assert len( regfile ) == 2, f"len(regfile) != 2, {len(regfile)=}"
 
@@ -149,6 +309,7 @@ def test_comment_in_subdir():
     regfile = os.listdir( settings.registry_dir )
     regfile.remove( settings.registry_metafile )
     regfile.remove( settings.indexfile )
+    regfile.remove( settings.lockfile )
 
     assert len( regfile ) == 2, f"len(regfile) != 2, {len(regfile)=}"
 
@@ -190,6 +351,7 @@ def test_flag_record():
     regfile = os.listdir( settings.registry_dir )
     regfile.remove( settings.registry_metafile )
     regfile.remove( settings.indexfile )
+    regfile.remove( settings.lockfile )
 
     assert len( regfile ) == 1
 
@@ -203,6 +365,31 @@ def test_flag_record():
 
     cleanup()
 
+def test_flag_with_comma():
+
+    import filerecords.api as api
+
+    setup()
+
+    cmd = "touch testfile testfile2 ; records comment testfile -c 'hi' -f 'a,b' ; records comment testfile2 -c 'hi' -f b"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+    cmd = "records list -f 'a,b'"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+    listed = [ i.split()[0] for i in out.stdout.decode().splitlines() if i.startswith( "testfile" ) ]
+    assert listed == [ "testfile" ], f"{listed=} instead of only testfile for the flag 'a,b'"
+
+    cmd = "records list -f b"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+    listed = [ i.split()[0] for i in out.stdout.decode().splitlines() if i.startswith( "testfile" ) ]
+    assert listed == [ "testfile2" ], f"{listed=} instead of only testfile2, the flag 'a,b' was split"
+
+    reg = api.Registry( "." )
+    record = reg.get_record( "testfile" )
+    assert reg.index.get_flags( record.id ) == [ "a,b" ], f"{reg.index.get_flags( record.id )=} instead of ['a,b']"
+
+    cleanup()
+
 def test_define_group():
 
     setup()
@@ -20,7 +20,7 @@ def setup():
 
 def cleanup():
     cmd = "records destroy -y ; \
-            rm -rf testfile testsubdir *.md *.yaml ; \
+            rm -rf testfile testsubdir *.md *.yaml *.jsonl *.sqlite ; \
             "
     out = subprocess.run( cmd, shell=True, capture_output = True )
 
@@ -93,6 +93,7 @@ def test_export_yml():
     assert "secret_super_testfile" in contents, "secret_super_testfile not in the output"
     assert "great_other_testfile" in contents, "great_other_testfile not in the output"
     assert "upper" in contents, "upper not in the output"
+    assert "inode" not in contents, "the file stats are in the output"
 
     cleanup() 
 
@@ -144,4 +145,155 @@ def test_export_both_with_filename():
 
     assert len(after) == len(before) + 2, "no new files created"
 
-    cleanup() 
\ No newline at end of file
+    cleanup() 
+def test_export_parallel():
+
+    setup()
+
+    cmd = "records export both -f testserial ; records export both -j 2 -f testparallel"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+    for suffix in ( ".md", ".yaml" ):
+        with open( "testserial" + suffix, "r" ) as f:
+            serial = f.read()
+        with open( "testparallel" + suffix, "r" ) as f:
+            parallel = f.read()
+
+        # only the export timestamps may differ
+        serial = [ i for i in serial.splitlines() if "timestamp" not in i and not i[:1].isdigit() ]
+        parallel = [ i for i in parallel.splitlines() if "timestamp" not in i and not i[:1].isdigit() ]
+        assert serial == parallel, f"the parallel {suffix} export differs from the serial one"
+        assert any( "great_other_testfile" in i for i in parallel ), f"great_other_testfile not in the {suffix} output"
+
+    cleanup()
+
+def test_export_jsonl():
+
+    import json
+
+    setup()
+
+    cmd = "records export jsonl -f testexport"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+    with open( "testexport.jsonl", "r" ) as f:
+        records = [ json.loads( i ) for i in f ]
+
+    assert len( records ) == 2, f"{len(records)=} instead of 2"
+    records = { i["relpath"] : i for i in records }
+    assert records["testfile"]["comments"][0]["comment"] == "secret_super_testfile", "secret_super_testfile not in the output"
+    assert records["testsubdir/__testfile"]["flags"] == [ "lower" ], "lower not in the output"
+    assert "stat" not in records["testfile"], "the file stats are in the output"
+
+    cleanup()
+
+def test_export_sqlite():
+
+    import sqlite3
+
+    setup()
+
+    cmd = "records export sqlite -f testexport"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+    connection = sqlite3.connect( "testexport.sqlite" )
+    relpaths = [ i[0] for i in connection.execute( "SELECT relpath FROM records ORDER BY relpath" ) ]
+    comments = [ i[0] for i in connection.execute( "SELECT comment FROM comments ORDER BY comment" ) ]
+    flags = [ i[0] for i in connection.execute( "SELECT flag FROM flags WHERE record != '' ORDER BY flag" ) ]
+    connection.close()
+
+    assert relpaths == [ "testfile", "testsubdir/__testfile" ], f"{relpaths=} are not the recorded files"
+    assert comments == [ "great_other_testfile", "registrycomment", "secret_super_testfile" ], f"{comments=} are not the recorded comments"
+    assert flags == [ "lower", "upper" ], f"{flags=} are not the recorded flags"
+
+    cleanup()
+
+def test_export_stdout():
+
+    setup()
+
+    before = os.listdir()
+    cmd = "records export yaml -f -"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+    after = os.listdir()
+
+    assert len(after) == len(before), "a file was created"
+    assert "secret_super_testfile" in out.stdout.decode(), "secret_super_testfile not in the output"
+    assert "great_other_testfile" in out.stdout.decode(), "great_other_testfile not in the output"
+    assert "Exported registry" not in out.stdout.decode(), "the status message is part of the export"
+
+    cleanup()
+
+def test_export_cache():
+
+    setup()
+
+    cmd = "records export md -f cached ; \
+           records comment testfile -c 'an_updated_testfile' ; \
+           records export md -f updated ; \
+           records export md -f uncached --no-cache ; \
+           "
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+    assert os.path.exists( os.path.join( settings.registry_dir, settings.render_cache ) ), "no render cache was created"
+
+    records = []
+    for filename in ( "cached.md", "updated.md", "uncached.md" ):
+        with open( filename ) as f:
+            records.append( f.read().split( "## Records" )[1] )
+
+    assert "an_updated_testfile" not in records[0], "the new comment is in the first export"
+    assert "an_updated_testfile" in records[1], "the cached export is outdated"
+    assert records[1] == records[2], "the cached and uncached exports differ"
+
+    cleanup()
+
+def test_export_federated_cache():
+
+    import sqlite3
+
+    setup()
+
+    cmd = "cd testsubdir ; touch nested_file ; records init ; records comment nested_file -c 'nested_testfile' -f inner ; cd .. ; \
+           records export yaml -f cached --federated ; records export md -f cached --federated ; \
+           records comment testsubdir/nested_file -c 'an_updated_nested_testfile' ; \
+           records export yaml -f updated --federated ; records export md -f updated --federated ; \
+           records export yaml -f uncached --federated --no-cache ; records export md -f uncached --federated --no-cache ; \
+           "
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+    connection = sqlite3.connect( os.path.join( "testsubdir", settings.registry_dir, settings.render_cache ) )
+    formats = [ i[0] for i in connection.execute( "SELECT DISTINCT format FROM fragments ORDER BY format" ) ]
+    connection.close()
+    assert formats == [ "md:testsubdir/", "yaml:testsubdir/" ], f"{formats=}, the nested registry was not exported using the cache"
+
+    for suffix, start in ( ( "yaml", "records:" ), ( "md", "## Records" ) ):
+        records = []
+        for filename in ( "cached", "updated", "uncached" ):
+            with open( f"{filename}.{suffix}" ) as f:
+                contents = f.read().split( start )[1]
+                records.append( [ i for i in contents.splitlines() if not i.startswith( "timestamp:" ) ] )
+
+        assert "testsubdir/nested" in "".join( records[0] ), f"the nested record is not in the {suffix} output"
+        assert "an_updated_nested_testfile" not in "".join( records[0] ), f"the new comment is in the first {suffix} export"
+        assert "an_updated_nested_testfile" in "".join( records[1] ), f"the cached {suffix} export is outdated"
+        assert records[1] == records[2], f"the cached and uncached {suffix} exports differ"
+
+    cleanup()
+
+def test_render_cache_batches():
+
+    import sqlite3
+    import filerecords.api.cache as cache
+
+    setup()
+
+    ids = [ str(i) for i in range( 2000 ) ]
+    with cache.RenderCache( settings.registry_dir ) as renders:
+        renders.connection.setlimit( sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 999 )
+        renders.put( ( ( id, "signature", f"fragment {id}" ) for id in ids ), "md" )
+        fragments = renders.get( ids, "md" )
+
+    assert fragments == [ f"fragment {id}" for id in ids ], "the cached fragments were not all returned in order"
+
+    cleanup()
@@ -0,0 +1,183 @@
+
+import os
+import filerecords.api.index as index
+
+def make_index():
+    return index.Index( 
+                        [ "a", "b", "c", "d" ], 
+                        [ "f1", "f2", "f3", "f4" ], 
+                        [ "../f1", "../sub/f2", "../sub/deep/f3", "../subway/f4" ], 
+                        [ [ "x" ], [ "x", "y" ], [ "y" ], [] ],
+                    )
+
+def check_consistent( idx ):
+    for id, filename, relpath, flags, latest in idx.rows():
+        assert idx.get_id( relpath ) == id, f"{relpath=} does not map to {id=}"
+        assert idx.get_relpath( id ) == relpath, f"{id=} does not map to {relpath=}"
+        assert idx.get_filename( id ) == filename, f"{id=} does not map to {filename=}"
+        assert idx.get_flags( id ) == flags, f"{id=} does not map to {flags=}"
+        for flag in flags:
+            assert id in idx.find_flag( flag ), f"{id=} not found by its flag {flag}"
+
+def test_add_and_extend():
+
+    idx = make_index()
+    idx.add( "e", "../sub/f5", [ "z" ] )
+    idx.extend( [ "f", "g" ], [ "../f6", "../sub/f7" ], [ [ "x" ], [] ] )
+
+    assert len( idx ) == 7, f"{len(idx)=} instead of 7"
+    assert idx.find_flag( "x" ) == [ "a", "b", "f" ], f"{idx.find_flag( 'x' )=} is wrong"
+    check_consistent( idx )
+
+    for func, args in ( ( idx.add, ( "a", "../new" ) ), ( idx.add, ( "new", "../f1" ) ), ( idx.extend, ( [ "h", "h" ], [ "../h1", "../h2" ] ) ) ):
+        try:
+            func( *args )
+            assert False, f"{args=} were added although they are already recorded"
+        except ( KeyError, FileExistsError ):
+            pass
+    assert len( idx ) == 7, "the index was changed by a failed add"
+
+def test_move():
+
+    idx = make_index()
+    idx.move( "b", "../other/f2b" )
+
+    assert idx.get_id( "../sub/f2" ) is None, "the previous path is still recorded"
+    assert idx.get_filename( "b" ) == "f2b", "the filename was not updated"
+    assert idx.find_dir( "../sub" ) == [], "the record is still found in its previous directory"
+    assert idx.find_dir( "../other" ) == [ "b" ], "the record is not found in its new directory"
+    check_consistent( idx )
+
+    try:
+        idx.move( "a", "../sub/deep/f3" )
+        assert False, "a record was moved onto another record"
+    except FileExistsError:
+        pass
+
+def test_remove():
+
+    idx = make_index()
+    assert idx.find_query( "x OR y" ) == [ "a", "b", "c" ], "the bitmaps are wrong before removing"
+
+    idx.remove( "a" )
+
+    assert "a" not in idx and idx.get_id( "../f1" ) is None, "the record was not removed"
+    assert len( idx ) == 3, f"{len(idx)=} instead of 3"
+    check_consistent( idx )
+
+    # the (cached) bitmaps only changed by the bits of the removed and the moved record
+    assert idx.find_query( "x" ) == idx.find_flag( "x" ) == [ "b" ], f"{idx.find_query( 'x' )=} is wrong after removing"
+    assert sorted( idx.find_query( "y AND NOT x" ) ) == [ "c" ], f"{idx.find_query( 'y AND NOT x' )=} is wrong after removing"
+    assert sorted( idx.find_query( "NOT x" ) ) == [ "c", "d" ], f"{idx.find_query( 'NOT x' )=} is wrong after removing"
+
+    idx.remove( "d" )
+    idx.remove( "b" )
+    assert idx.find_query( "x OR y" ) == [ "c" ], f"{idx.find_query( 'x OR y' )=} is wrong after removing the last rows"
+    check_consistent( idx )
+
+    idx.remove( "c" )
+    assert idx.find_query( "NOT x" ) == [], "records are found in an empty index"
+
+def test_find_dir():
+
+    idx = make_index()
+    assert idx.find_dir( "../sub" ) == [ "b" ], f"{idx.find_dir( '../sub' )=} is wrong"
+    assert idx.find_dir( "../sub", recursive = True ) == [ "b", "c" ], "the sub-directories (but not ../subway) should be included"
+    assert idx.find_dir( ".." ) == [ "a" ], f"{idx.find_dir( '..' )=} is wrong"
+    assert idx.find_dir( "..", recursive = True ) == [ "a", "b", "c", "d" ], "all records should be found"
+
+    idx.remove( "b" )
+    assert idx.find_dir( "../sub" ) == [], "the removed record is still found"
+    assert idx.find_dir( "../sub", recursive = True ) == [ "c" ], "the removed record is still found recursively"
+
+def test_replay():
+
+    stored = make_index()
+    other = stored.copy()
+    other.changes = []
+    stored.changes = []
+
+    # another process recorded a path and removed a record in the meantime
+    stored.add( "x1", "../new1" )
+    stored.remove( "d" )
+
+    other.add( "y1", "../new1" )
+    other.add( "y2", "../new2", [ "x" ] )
+    other.move( "a", "../new2b" )
+    other.move( "c", "../new1b" )
+    other.set_flags( "d", [ "gone" ] )
+    other.remove( "b" )
+
+    conflicts = stored.replay( other.changes )
+
+    assert conflicts == { "y1" : "x1" }, f"{conflicts=} is wrong"
+    assert stored.get_id( "../new1" ) == "x1", "the path recorded in the meantime was overwritten"
+    assert stored.get_relpath( "a" ) == "../new2b", "the move was not replayed"
+    assert "d" not in stored and "b" not in stored, "a removed record was restored"
+    assert sorted( stored.find_flag( "x" ) ) == [ "a", "y2" ], "the flags were not replayed"
+    check_consistent( stored )
+
+    # replaying the same changes again changes nothing
+    assert stored.replay( other.changes ) == { "y1" : "x1" }, "replaying again gave different conflicts"
+    assert len( stored ) == 4, f"{len(stored)=} instead of 4"
+
+def test_indexfile_roundtrip():
+
+    import datetime
+    import tempfile
+    import filerecords.api.utils as utils
+
+    latest = { datetime.datetime( 2022, 8, 1, 12, 30, 15, 123 ) : { "comment" : "tab\tand \"quotes\", commas\nnewline ünïcödé", "user" : "someone" } }
+    idx = index.Index( 
+                        [ "a", "b", "c" ], 
+                        [ "f\tab", "für", "plain" ], 
+                        [ "../dir with space/f\tab", "../ünï/für", "../plain" ], 
+                        [ [ "a,b", "[x]", "é" ], [], [ "\"quoted\"" ] ],
+                        [ latest, None, latest ],
+                    )
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join( directory, "INDEXFILE" )
+        utils.save_indexfile( filename, idx )
+        loaded = utils.load_indexfile( filename )
+
+    assert list( loaded.rows() ) == list( idx.rows() ), f"{list( loaded.rows() )=} differs from the saved index"
+    assert loaded.get_id( "../dir with space/f\tab" ) == "a", "the relpath with a tab was not restored"
+    assert loaded.find_flag( "a,b" ) == [ "a" ], "the flag with a comma was not restored"
+
+def test_to_dataframe():
+
+    import sys
+    import tempfile
+    import filerecords.api as api
+
+    with tempfile.TemporaryDirectory() as directory:
+        open( os.path.join( directory, "testfile" ), "w" ).close()
+        reg = api.Registry( directory )
+        reg.add( os.path.join( directory, "testfile" ), flags = [ "x" ] )
+        record = reg.get_record( os.path.join( directory, "testfile" ) )
+
+        try:
+            import pandas
+        except ImportError:
+            pandas = None
+
+        if pandas is not None:
+            df = reg.to_dataframe()
+            assert list( df.columns ) == [ "id", "filename", "relpath", "flags" ], f"{list( df.columns )=} are wrong"
+            assert df.loc[ str(record.id), "filename" ] == "testfile", "the record is not in the dataframe"
+            assert df.loc[ str(record.id), "flags" ] == [ "x" ], "the flags are not in the dataframe"
+
+        # as if pandas was not installed
+        previous = sys.modules.get( "pandas" )
+        sys.modules["pandas"] = None
+        try:
+            reg.to_dataframe()
+            assert False, "no error was raised without pandas"
+        except ImportError as e:
+            assert "pip install filerecords[pandas]" in str( e ), f"{e=} does not explain how to install pandas"
+        finally:
+            if previous is None:
+                sys.modules.pop( "pandas" )
+            else:
+                sys.modules["pandas"] = previous
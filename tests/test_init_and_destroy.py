@@ -110,13 +110,13 @@ def test_clear():
     cmd = "touch testfile ; records comment testfile -c 'testcomment' -f testing"
     out = subprocess.run( cmd, shell=True, capture_output=True )
     
-    assert len( os.listdir( settings.registry_dir ) ) == 3, f"registry only contains {len( os.listdir( settings.registry_dir ) )} files instead of 3"
+    assert len( os.listdir( settings.registry_dir ) ) == 4, f"registry only contains {len( os.listdir( settings.registry_dir ) )} files instead of 4"
     
     cmd = "records clear -y"
     out = subprocess.run( cmd, shell=True, capture_output=True )
     
     assert os.path.exists( settings.registry_dir ), "registry is being removed!"
-    assert len( os.listdir( settings.registry_dir ) ) == 2, f"registry only contains {len( os.listdir( settings.registry_dir ) )} files instead of 2"
+    assert len( os.listdir( settings.registry_dir ) ) == 3, f"registry only contains {len( os.listdir( settings.registry_dir ) )} files instead of 3"
     
     cleanup()
 
@@ -155,3 +155,86 @@ def test_make_new_in_subdir():
 
     os.system( "rm -rf testsubdir ; rm testfile*" )
     cleanup()
+
+def test_symlinked_directory():
+
+    import tempfile
+
+    setup()
+
+    # a directory outside the registry, linked into the directory of the registry
+    target = tempfile.mkdtemp()
+    os.symlink( target, "testlink" )
+    try:
+        cmd = "cd testlink ; touch testfile_linked ; records comment testfile_linked -c 'linked' -f linkflag ; pwd"
+        out = subprocess.run( cmd, shell=True, capture_output=True )
+
+        assert out.stdout.decode().splitlines()[-1].endswith( "testlink" ), f"{out.stdout.decode()=} is not the logical path"
+        assert not os.path.exists( os.path.join( target, settings.registry_dir ) ), "a new registry was created at the resolved path"
+
+        cmd = "records list -f linkflag"
+        out = subprocess.run( cmd, shell=True, capture_output=True )
+
+        assert "testlink/testfile_linked" in out.stdout.decode(), f"{out.stdout.decode()=} does not contain the logical path"
+
+    finally:
+        os.remove( "testlink" )
+        shutil.rmtree( target )
+    cleanup()
+
+def test_stale_pwd():
+
+    import filerecords.api.utils as utils
+
+    setup()
+    os.system( "touch testfile_stale" )
+
+    # a $PWD pointing somewhere else (e.g. inherited after a chdir) is ignored
+    env = dict( os.environ, PWD = "/" )
+    cmd = "records comment testfile_stale -c 'stale' -f staleflag ; records list -f staleflag"
+    out = subprocess.run( cmd, shell=True, capture_output=True, env = env, cwd = os.getcwd() )
+
+    assert "testfile_stale" in out.stdout.decode(), f"{out.stdout.decode()=} does not contain 'testfile_stale'"
+    assert not os.path.exists( os.path.join( "/", settings.registry_dir ) ), "a registry was created at the stale $PWD"
+
+    previous = os.environ.get( "PWD" )
+    os.environ["PWD"] = "/"
+    try:
+        assert utils.get_logical_path( "." ) == os.getcwd(), "the stale $PWD was used"
+    finally:
+        if previous is None:
+            os.environ.pop( "PWD" )
+        else:
+            os.environ["PWD"] = previous
+
+    os.system( "rm testfile*" )
+    cleanup()
+
+def test_init_in_cached_directory():
+
+    import filerecords.api.utils as utils
+    import filerecords.cli.main as main
+
+    setup()
+    os.makedirs( "testsubdir", exist_ok = True )
+    subdir = os.path.abspath( "testsubdir" )
+
+    previous = ( os.getcwd(), os.environ.get( "PWD" ) )
+    try:
+        # the registry of the sub-directory is cached as the parent registry
+        assert utils.find_registry( subdir ) == os.path.join( previous[0], settings.registry_dir ), "the parent registry was not found"
+
+        os.chdir( subdir )
+        os.environ["PWD"] = subdir
+        main.run( [ "init" ] )
+
+        assert utils.find_registry( subdir ) == os.path.join( subdir, settings.registry_dir ), "the new registry was not seen (the cache was not invalidated)"
+
+    finally:
+        os.chdir( previous[0] )
+        if previous[1] is None:
+            os.environ.pop( "PWD" )
+        else:
+            os.environ["PWD"] = previous[1]
+        shutil.rmtree( "testsubdir" )
+    cleanup()
@@ -0,0 +1,150 @@
+
+import os
+import shutil
+import subprocess
+import filerecords.api.settings as settings
+
+def setup():
+    os.chdir( os.path.dirname( __file__ ) )
+    shutil.rmtree( settings.registry_dir, ignore_errors = True )
+
+    cmd = " mkdir testsubdir ; \
+            touch testsubdir/__testfile ; \
+            touch testfile ; \
+            records init --backend journal ; \
+            records comment -c 'registrycomment' -f registryflag ; \
+            records comment testfile -c 'secret_super_testfile' -f upper ; \
+            records comment testsubdir/__testfile -c 'great_other_testfile' -f lower ; \
+            "
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+def cleanup():
+    cmd = "records destroy -y ; \
+            rm -rf testfile testfile2 testsubdir testfile_shared testfile[0-9]* *.md *.yaml ; \
+            "
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+def test_init_journal():
+
+    setup()
+
+    contents = sorted( os.listdir( settings.registry_dir ) )
+    expected = sorted( [ settings.indexfile, settings.registry_metafile, settings.journal_file, settings.lockfile ] )
+    assert contents == expected, f"{contents=} are not only the registry files, the records were not journaled"
+
+    with open( os.path.join( settings.registry_dir, settings.journal_file ) ) as f:
+        lines = f.readlines()
+    assert len( lines ) == 3, f"{len(lines)=} instead of 3 journal lines"
+
+    cleanup()
+
+def test_journal_list_and_lookup():
+
+    setup()
+
+    cmd = "records mv testfile testfile2 ; records list -f upper"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+    assert "testfile2" in out.stdout.decode(), "testfile2 not in the output"
+    assert "testsubdir/__testfile" not in out.stdout.decode(), "testsubdir/__testfile is also in the output"
+
+    cmd = "records lookup testsubdir/__testfile"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+    assert "great_other_testfile" in out.stdout.decode(), "great_other_testfile not in the output"
+    assert "lower" in out.stdout.decode(), "lower flag not in the output"
+
+    cmd = "records rm -k testfile2 > /dev/null ; records list ; records lookup"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+    assert "testfile2" not in out.stdout.decode(), "testfile2 is still in the output"
+    assert "registrycomment" in out.stdout.decode(), "registrycomment not in the output"
+
+    cleanup()
+
+def test_journal_compact():
+
+    setup()
+
+    cmd = "records comment testfile -c 'after_compaction' ; records rm -k testsubdir/__testfile > /dev/null ; records compact"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+    assert "Compacted" in out.stdout.decode(), "the registry was not compacted"
+
+    assert os.path.getsize( os.path.join( settings.registry_dir, settings.journal_file ) ) == 0, "the journal was not emptied"
+
+    regfiles = os.listdir( settings.registry_dir )
+    assert len( regfiles ) == 5, f"{len(regfiles)=} instead of 5, the records were not written"
+
+    with open( os.path.join( settings.registry_dir, settings.indexfile ) ) as f:
+        contents = f.read()
+    assert "testfile" in contents and "__testfile" not in contents, "the index was not written"
+
+    cmd = "records read testfile ; records lookup"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+    assert "secret_super_testfile" in out.stdout.decode(), "secret_super_testfile not in the output"
+    assert "after_compaction" in out.stdout.decode(), "after_compaction not in the output"
+    assert "registrycomment" in out.stdout.decode(), "registrycomment not in the output"
+
+    cleanup()
+
+def test_journal_concurrent_comments():
+
+    import filerecords.api as api
+
+    setup()
+    os.system( "touch testfile_shared " + " ".join( f"testfile{i}" for i in range( 20 ) ) )
+
+    # the journal is compacted after every few comments while the jobs are running
+    jobs = [ subprocess.Popen( f"records comment testfile{i} -c 'comment{i}' ; records comment testfile_shared -c 'shared{i}' -f shared{i}", shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL ) for i in range( 20 ) ]
+    jobs += [ subprocess.Popen( "records compact", shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL ) for i in range( 5 ) ]
+    for job in jobs:
+        job.wait()
+
+    reg = api.Registry( "." )
+    assert len( reg.index ) == 23, f"{len(reg.index)=} instead of 23, index rows were lost"
+
+    record = reg.get_record( "testfile_shared" )
+    assert len( record.comments ) == 20, f"{len(record.comments)=} instead of 20, comments were lost"
+    assert sorted( reg.index.get_flags( record.id ) ) == sorted( f"shared{i}" for i in range( 20 ) ), "flags were lost"
+
+    cleanup()
+
+def test_journal_failed_commit():
+
+    import filerecords.api as api
+
+    setup()
+    os.system( "touch testfile2" )
+
+    journalfile = os.path.join( settings.registry_dir, settings.journal_file )
+    with open( journalfile ) as f:
+        lines = f.readlines()
+
+    # the batch fails after the changes were handed to the journal
+    reg = api.Registry( "." )
+    append = reg.backend.append
+    def fail( *args ):
+        append( *args )
+        raise OSError( "disk full" )
+    reg.backend.append = fail
+
+    try:
+        with reg.transaction():
+            reg.update( "testfile", comment = "rolledback", flags = "rolledback" )
+            reg.add( "testfile2", comment = "never" )
+    except OSError:
+        pass
+
+    with open( journalfile ) as f:
+        assert f.readlines() == lines, "the journal holds the changes of the failed transaction"
+
+    reg = api.Registry( "." )
+    assert reg.get_record( "testfile2" ) is None, "testfile2 was added despite the rollback"
+    assert "rolledback" not in reg.index.get_flags( reg.get_record( "testfile" ).id ), "the flag was added despite the rollback"
+
+    reg.update( "testfile", comment = "committed" )
+    reg = api.Registry( "." )
+    assert "committed" in str( reg.get_record( "testfile" ).comments ), "the next save was not journaled"
+
+    cleanup()
@@ -166,4 +166,191 @@ def test_screen():
     assert "testfile99" in out.stdout.decode(), "testfile99 is not in the output"
 
     os.remove( "testfile99" )
-    cleanup()
\ No newline at end of file
+    cleanup()
+
+def test_screen_changed():
+
+    setup()
+
+    cmd = "echo 'new contents' >> testsubdir/__testfile ; records screen -j 2"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+    assert "testsubdir/__testfile has changed" in out.stdout.decode(), "testsubdir/__testfile is not reported as changed"
+    assert "testfile1" not in out.stdout.decode(), "testfile1 is in the output"
+
+    cmd = "records comment testsubdir/__testfile -c 'updated' ; records screen"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+    assert "testsubdir/__testfile has changed" not in out.stdout.decode(), "testsubdir/__testfile is still reported as changed after commenting"
+
+    cleanup()
+
+def test_record_stats_disabled():
+
+    import filerecords.api as api
+
+    setup()
+
+    with open( "testsubdir/unstated", "w" ) as f:
+        f.write( "contents" )
+
+    reg = api.Registry( "." )
+    settings.record_stats = False
+    try:
+        reg.add( "testsubdir/unstated", comment = "without stats" )
+        record = reg.get_record( "testsubdir/unstated" )
+        assert "stat" not in record.metadata, "the file stats were recorded although settings.record_stats is disabled"
+    finally:
+        settings.record_stats = True
+
+    record.add_comment( "with stats" )
+    assert "inode" in record.metadata["stat"], "the file stats were not recorded"
+
+    cleanup()
+
+def test_fingerprint():
+
+    setup()
+
+    cmd = "echo 'some contents' > testfile1 ; records fingerprint -j 2"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+    assert "Fingerprinted 2 files" in out.stdout.decode(), f"not all files were fingerprinted {out.stdout.decode()=}"
+
+    cmd = "records fingerprint"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+    assert "Fingerprinted 0 files" in out.stdout.decode(), f"unchanged files were hashed again {out.stdout.decode()=}"
+
+    cmd = "sleep 0.1 ; echo 'other contents' > testfile1 ; records fingerprint"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+    assert "testfile1 has changed contents" in out.stdout.decode(), f"testfile1 is not reported as changed {out.stdout.decode()=}"
+    assert "Fingerprinted 1 files" in out.stdout.decode(), f"not only the changed file was hashed {out.stdout.decode()=}"
+
+    cleanup()
+
+def test_search_flag_old_indexfile():
+
+    setup()
+
+    # registries from older versions do not store the flags in the indexfile
+    indexfile = os.path.join( settings.registry_dir, settings.indexfile )
+    with open( indexfile, "r" ) as f:
+        contents = [ "\t".join( i.split( "\t" )[:3] ) for i in f.read().splitlines() ]
+    with open( indexfile, "w" ) as f:
+        f.write( "\n".join( contents ) + "\n" )
+
+    cmd = "records list -f lower"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+    assert "testsubdir/__testfile" in out.stdout.decode(), "testsubdir/__testfile not in the output"
+    assert "testfile1" not in out.stdout.decode(), "testfile1 is also in the output"
+
+    cleanup()
+
+def test_grep():
+
+    setup()
+
+    cmd = "records comment testfile1 -c 'sequencing run' ; records grep sequencing"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+    assert "testfile1" in out.stdout.decode(), "testfile1 not in the output"
+    assert "sequencing run" in out.stdout.decode(), "the matching comment is not in the output"
+    assert "testsubdir/__testfile" not in out.stdout.decode(), "testsubdir/__testfile is also in the output"
+
+    # the index is updated when comments are added or undone
+    cmd = "records comment testsubdir/__testfile -c 'sequencing again' ; records undo testfile1 ; records grep seq*"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+    assert "testsubdir/__testfile" in out.stdout.decode(), "testsubdir/__testfile not in the output"
+    assert "sequencing run" not in out.stdout.decode(), "the undone comment is still in the output"
+
+    cmd = "records grep testfile"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+    assert "testfile1" in out.stdout.decode(), "testfile1 not in the output"
+    assert "testsubdir/__testfile" in out.stdout.decode(), "testsubdir/__testfile not in the output"
+
+    cleanup()
+
+def test_localdir_recursive_list():
+
+    setup()
+
+    cmd = "records ls -r"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+    assert "testfile1" in out.stdout.decode(), "testfile1 not in the output"
+    assert "testsubdir/__testfile" in out.stdout.decode(), "testsubdir/__testfile not in the output"
+
+    cmd = "cd testsubdir ; records ls -r"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+    assert "testsubdir/__testfile" in out.stdout.decode(), "testsubdir/__testfile not in the output"
+    assert "testfile1" not in out.stdout.decode(), "testfile1 is also in the output"
+
+    cmd = "records ls -r -f lower"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+    assert "testsubdir/__testfile" in out.stdout.decode(), "testsubdir/__testfile not in the output"
+    assert "testfile1" not in out.stdout.decode(), "testfile1 is also in the output"
+
+    cleanup()
+
+def test_query_list():
+
+    setup()
+
+    cmd = "records list -q 'upper OR lower'"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+    assert "testfile1" in out.stdout.decode(), "testfile1 not in the output"
+    assert "testsubdir/__testfile" in out.stdout.decode(), "testsubdir/__testfile not in the output"
+
+    cmd = "records list -q 'NOT upper'"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+    assert "testsubdir/__testfile" in out.stdout.decode(), "testsubdir/__testfile not in the output"
+    assert "testfile1" not in out.stdout.decode(), "testfile1 is also in the output"
+
+    cmd = "records list -q 'upper AND lower'"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+    assert "testfile1" not in out.stdout.decode(), "testfile1 is also in the output"
+    assert "testsubdir/__testfile" not in out.stdout.decode(), "testsubdir/__testfile is also in the output"
+
+    cmd = "records list -q 'upper AND ( lower'"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+    assert "Invalid query" in out.stdout.decode(), "Invalid query not reported"
+
+    cleanup()
+
+def test_federated_list():
+
+    setup()
+
+    cmd = "cd testsubdir ; touch nested ; records init ; records comment nested -c 'nested testfile' -f inner"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+    cmd = "records list -f inner"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+    assert "testsubdir/nested" not in out.stdout.decode(), "testsubdir/nested is in the output without federation"
+
+    cmd = "records list -f inner --federated"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+    assert "testsubdir/nested" in out.stdout.decode(), "testsubdir/nested not in the output"
+    assert "testfile1" not in out.stdout.decode(), "testfile1 is also in the output"
+
+    cmd = "records list --federated"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+    assert "testfile1" in out.stdout.decode(), "testfile1 not in the output"
+    assert "testsubdir/__testfile" in out.stdout.decode(), "testsubdir/__testfile not in the output"
+    assert "testsubdir/nested" in out.stdout.decode(), "testsubdir/nested not in the output"
+
+    cleanup()
@@ -116,4 +116,27 @@ def test_move_in_subdir():
     assert os.path.exists( "testfile" ), "file was not moved since new path does not exists"
     assert  not os.path.exists( "testsubdir/testfile2" ), "file was not moved since old path still exists"
 
-    cleanup()
\ No newline at end of file
+    cleanup()
+
+def test_relink():
+
+    setup()
+
+    cmd = "echo 'contents to hash' > testsubdir/hashed ; \
+            records comment testsubdir/hashed -c 'hashed file' ; \
+            records fingerprint ; \
+            mv testfile testsubdir/moved ; \
+            cp testsubdir/hashed testsubdir/copied ; rm testsubdir/hashed ; \
+            records relink"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+    assert "Relinked 2 files" in out.stdout.decode(), f"not all moved files were relinked {out.stdout.decode()=}"
+
+    with open( os.path.join( settings.registry_dir, settings.indexfile ), "r" ) as f:
+        contents = f.read()
+
+    assert "testsubdir/moved\t" in contents, "the moved file was not relinked by its inode"
+    assert "testsubdir/copied\t" in contents, "the copied file was not relinked by its hash"
+    assert "../testfile\t" not in contents, "the old path is still in the indexfile"
+
+    cleanup()
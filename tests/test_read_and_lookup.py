@@ -2,6 +2,7 @@
 import os
 import shutil
 import subprocess
+import time
 import filerecords.api.settings as settings
 
 def setup():
@@ -92,3 +93,170 @@ def test_lookup_multiple():
     assert "thesubdir" in out.stdout.decode(), "thesubdir not in the output"
 
     cleanup()
+
+def test_lookup_after_undo():
+
+    setup()
+
+    cmd = "records comment testfile -c 'the_second_comment' ; records lookup testfile"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+    assert "the_second_comment" in out.stdout.decode(), "the_second_comment not in the output"
+    assert "secret_super_testfile" not in out.stdout.decode(), "secret_super_testfile is also in the output"
+
+    cmd = "records undo testfile ; records lookup testfile"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+    assert "secret_super_testfile" in out.stdout.decode(), "secret_super_testfile not in the output after undo"
+    assert "the_second_comment" not in out.stdout.decode(), "the_second_comment is still in the output after undo"
+
+    cleanup()
+
+def test_log():
+
+    setup()
+
+    cmd = "records comment testfile -c 'the_second_comment' ; records log testfile --since 2000-01-01"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+    assert "secret_super_testfile" in out.stdout.decode(), "secret_super_testfile not in the output"
+    assert "the_second_comment" in out.stdout.decode(), "the_second_comment not in the output"
+    assert out.stdout.decode().index( "secret_super_testfile" ) < out.stdout.decode().index( "the_second_comment" ), "comments are not in time order"
+
+    cmd = "records log testfile --until 2000-01-01 ; records log --since 2999-01-01"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+    assert "secret_super_testfile" not in out.stdout.decode(), "secret_super_testfile is outside the time range"
+    assert "registrycomment" not in out.stdout.decode(), "registrycomment is outside the time range"
+
+    cleanup()
+
+def test_comments_between():
+
+    import datetime
+    import filerecords.api as api
+
+    setup()
+
+    reg = api.Registry( "." )
+    record = reg.get_record( "testfile" )
+    first = next( iter( record.comments ) )
+
+    # a comment from before the first one (as if the clock was set back)
+    record.comments[ first - datetime.timedelta( days = 1 ) ] = { "comment" : "backdated", "user" : "root" }
+    record.metadata = dict( record.metadata, comments = dict( sorted( record.comments.items() ) ) )
+    record.add_comment( "the_second_comment" )
+    record.add_comment( "the_third_comment" )
+    record.undo_comment()
+
+    assert [ i["comment"] for i in record.comments_between().values() ] == [ "backdated", "secret_super_testfile", "the_second_comment" ], "the comments are not in time order"
+    assert [ i["comment"] for i in record.comments_between( since = first ).values() ] == [ "secret_super_testfile", "the_second_comment" ], "wrong comments since the first one"
+    assert [ i["comment"] for i in record.comments_between( until = first ).values() ] == [ "backdated", "secret_super_testfile" ], "wrong comments until the first one"
+
+    cleanup()
+
+def test_lazy_record():
+
+    import filerecords.api as api
+
+    setup()
+
+    reg = api.Registry( "." )
+    calls = []
+    load_entry = reg.backend.load_entry
+    def counted( id ):
+        calls.append( id )
+        return load_entry( id )
+    reg.backend.load_entry = counted
+
+    record = reg.get_record( "testfile" )
+    assert record.relpath == "../testfile", f"{record.relpath=} is wrong"
+    assert record.flags == [ "upper" ], f"{record.flags=} are wrong"
+    assert "secret_super_testfile" in str( record.lookup_last() ), "the latest comment is not taken from the index"
+    assert record.loaded is False, "the record was loaded for reading its index entry"
+    assert calls == [], f"{calls=}, the backend was read for reading the index entry"
+
+    record.preload()
+    record.preload()
+    assert record.loaded is True, "the record was not loaded by preload()"
+    assert "secret_super_testfile" in str( record.comments ), "the comments were not loaded"
+    assert calls == [ record.id ], f"{calls=}, the record was not loaded exactly once"
+
+    cleanup()
+
+def test_served_lookup():
+
+    setup()
+
+    env = dict( os.environ, FILERECORDS_SOCKET = os.path.join( os.path.dirname( __file__ ), "testsocket" ) )
+    daemon = subprocess.Popen( [ "records", "serve", "." ], env = env, stdout = subprocess.DEVNULL )
+    try:
+        for i in range( 100 ):
+            if os.path.exists( env["FILERECORDS_SOCKET"] ):
+                break
+            time.sleep( 0.1 )
+
+        cmd = f"python -X importtime {shutil.which( 'records' )} lookup testfile"
+        out = subprocess.run( cmd, shell=True, capture_output = True, env = env )
+
+        assert "secret_super_testfile" in out.stdout.decode(), "testfile comment not in the output"
+        assert "filerecords.api.registry" not in out.stderr.decode(), "the lookup was not answered by the daemon"
+
+        cmd = "records comment testfile -c 'newer_testfile_comment' ; records lookup testfile"
+        out = subprocess.run( cmd, shell=True, capture_output = True, env = env )
+
+        assert "newer_testfile_comment" in out.stdout.decode(), "the daemon did not pick up the new comment"
+
+    finally:
+        daemon.terminate()
+        daemon.wait()
+
+    assert not os.path.exists( env["FILERECORDS_SOCKET"] ), "the socket was not removed"
+
+    cleanup()
+
+def test_foreign_socket():
+
+    import socket
+
+    setup()
+
+    env = dict( os.environ, FILERECORDS_SOCKET = os.path.join( os.path.dirname( __file__ ), "testsocket" ) )
+
+    # a socket of another user listening at the path of the daemon
+    foreign = socket.socket( socket.AF_UNIX, socket.SOCK_STREAM )
+    foreign.bind( env["FILERECORDS_SOCKET"] )
+    foreign.listen()
+    foreign.setblocking( False )
+    if os.getuid() == 0:
+        os.chown( env["FILERECORDS_SOCKET"], 65534, 65534 )
+    else:
+        # a regular file is not trusted either
+        foreign.close()
+        os.remove( env["FILERECORDS_SOCKET"] )
+        open( env["FILERECORDS_SOCKET"], "w" ).close()
+
+    try:
+        cmd = "records lookup testfile"
+        out = subprocess.run( cmd, shell=True, capture_output = True, env = env )
+
+        assert "secret_super_testfile" in out.stdout.decode(), "testfile comment not in the output"
+        if os.getuid() == 0:
+            try:
+                foreign.accept()
+                assert False, "the lookup was sent to the foreign socket"
+            except BlockingIOError:
+                pass
+
+        cmd = "records serve"
+        out = subprocess.run( cmd, shell=True, capture_output = True, env = env, timeout = 30 )
+
+        assert "is not a socket of yours" in out.stdout.decode(), "the daemon did not refuse the foreign socket"
+        assert os.path.lexists( env["FILERECORDS_SOCKET"] ), "the foreign socket was removed"
+
+    finally:
+        foreign.close()
+        if os.path.lexists( env["FILERECORDS_SOCKET"] ):
+            os.remove( env["FILERECORDS_SOCKET"] )
+
+    cleanup()
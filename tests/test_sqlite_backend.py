@@ -0,0 +1,118 @@
+
+import os
+import shutil
+import subprocess
+import filerecords.api.settings as settings
+
+def setup():
+    os.chdir( os.path.dirname( __file__ ) )
+    shutil.rmtree( settings.registry_dir, ignore_errors = True )
+
+    cmd = " mkdir testsubdir ; \
+            touch testsubdir/__testfile ; \
+            touch testfile ; \
+            records init --backend sqlite ; \
+            records comment -c 'registrycomment' -f registryflag ; \
+            records comment testfile -c 'secret_super_testfile' -f upper ; \
+            records comment testsubdir/__testfile -c 'great_other_testfile' -f lower ; \
+            "
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+def cleanup():
+    cmd = "records destroy -y ; \
+            rm -rf testfile testfile2 testsubdir *.md *.yaml ; \
+            "
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+def test_init_sqlite():
+
+    setup()
+
+    contents = sorted( os.listdir( settings.registry_dir ) )
+    assert contents == sorted( [ settings.sqlite_file, settings.lockfile ] ), f"{contents=} is not only the database and lock file"
+
+    cleanup()
+
+def test_sqlite_list_and_lookup():
+
+    setup()
+
+    cmd = "records list -f upper"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+    assert "testfile" in out.stdout.decode(), "testfile not in the output"
+    assert "testsubdir/__testfile" not in out.stdout.decode(), "testsubdir/__testfile is also in the output"
+
+    cmd = "records lookup testsubdir/__testfile"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+    assert "great_other_testfile" in out.stdout.decode(), "great_other_testfile not in the output"
+    assert "lower" in out.stdout.decode(), "lower flag not in the output"
+
+    cmd = "records lookup"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+    assert "registrycomment" in out.stdout.decode(), "registrycomment not in the output"
+
+    cleanup()
+
+def test_sqlite_move_and_remove():
+
+    setup()
+
+    cmd = "records mv testfile testfile2 ; records list"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+    assert "testfile2" in out.stdout.decode(), "testfile2 not in the output"
+    assert os.path.exists( "testfile2" ), "file was not moved since new path does not exists"
+
+    cmd = "records rm -k testfile2 > /dev/null ; records list"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+    assert "testfile2" not in out.stdout.decode(), "testfile2 is still in the output"
+    assert "testsubdir/__testfile" in out.stdout.decode(), "testsubdir/__testfile not in the output"
+
+    cleanup()
+
+def test_sqlite_export():
+
+    setup()
+
+    cmd = "records export md -f testexport"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+    with open( "testexport.md", "r" ) as f:
+        contents = f.read()
+
+    assert "registryflag" in contents, "registryflag not in the output"
+    assert "secret_super_testfile" in contents, "secret_super_testfile not in the output"
+    assert "great_other_testfile" in contents, "great_other_testfile not in the output"
+
+    cleanup()
+
+def test_sqlite_save_changed_rows():
+
+    import filerecords.api as api
+
+    setup()
+    os.system( "touch " + " ".join( f"testfile{i}" for i in range( 200 ) ) )
+
+    reg = api.Registry( "." )
+    reg.add_many( [ f"testfile{i}" for i in range( 200 ) ], comment = "many" )
+
+    # only the rows of the changed records are written, not the entire index
+    before = reg.backend.connection.total_changes
+    reg.update( "testfile7", comment = "single" )
+    reg.move( "testfile8", "testfile8b" )
+    reg.remove( "testfile9", keep_file = True )
+    written = reg.backend.connection.total_changes - before
+    assert written < 50, f"{written=} rows were written for changing three records"
+
+    reg = api.Registry( "." )
+    assert len( reg.index ) == 201, f"{len(reg.index)=} instead of 201"
+    assert reg.get_record( "testfile9" ) is None, "the removed record is still stored"
+    assert reg.get_record( "testfile8b" ) is not None, "the moved record is not stored at its new path"
+    assert "single" in str( reg.get_record( "testfile7" ).lookup_last() ), "the latest comment was not stored"
+
+    os.system( "rm -f testfile[0-9]* testfile8b" )
+    cleanup()
@@ -0,0 +1,39 @@
+
+import shutil
+import subprocess
+
+def imported_modules( args ):
+    """
+    Get the modules imported by a records call using python's -X importtime.
+    """
+    cmd = f"python -X importtime {shutil.which( 'records' )} {args}"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+    
+    assert out.returncode == 0, f"{out.returncode=} instead of 0"
+
+    lines = [ i for i in out.stderr.decode().splitlines() if i.startswith( "import time:" ) ]
+    return [ i.split( "|" )[-1].strip() for i in lines ]
+
+def test_help_is_lightweight():
+
+    modules = imported_modules( "--help" )
+
+    assert not [ i for i in modules if i.split( "." )[0] == "pandas" ], "pandas is imported by records --help"
+    assert not [ i for i in modules if i.split( "." )[0] == "yaml" ], "yaml is imported by records --help"
+    assert "filerecords.cli.export" not in modules, "sub-command modules are imported by records --help"
+
+def test_version_is_lightweight():
+
+    modules = imported_modules( "-v" )
+
+    assert not [ i for i in modules if i.split( "." )[0] == "pandas" ], "pandas is imported by records -v"
+    assert not [ i for i in modules if i.split( "." )[0] == "yaml" ], "yaml is imported by records -v"
+    assert "filerecords.api.registry" not in modules, "the registry is imported by records -v"
+
+def test_command_help():
+
+    cmd = "records export --help"
+    out = subprocess.run( cmd, shell=True, capture_output = True )
+
+    assert out.returncode == 0, f"{out.returncode=} instead of 0"
+    assert "--filename" in out.stdout.decode(), "export arguments are missing from the help"